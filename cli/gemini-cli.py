@@ -12,6 +12,7 @@ import sys
 from pathlib import Path
 
 from imagen.backends.gemini import GeminiBackend
+from imagen.sinks import save
 
 
 async def _run_async(args):
@@ -24,7 +25,7 @@ async def _run_async(args):
         negative_prompt=args.negative_prompt,
     )
     out_path = Path(args.output or result.filename)
-    out_path.write_bytes(result.content)
+    await save(out_path, result.content)
     print(str(out_path))
 
 
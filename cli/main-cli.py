@@ -3,29 +3,169 @@
 
 # Usage examples (direct CLI, no MCP):
 #   PYTHONPATH=. python3 cli/main-cli.py "A red square" --backend mock --fmt png --output red.png
+#   PYTHONPATH=. python3 cli/main-cli.py --batch prompts.jsonl --output-dir out/ --concurrency 4
+#   PYTHONPATH=. python3 cli/main-cli.py "A red square" --backend mock --output red.png --rendition webp:256x256
+#   PYTHONPATH=. python3 cli/main-cli.py "A red square" --backend mock --sink object:bucket/ --output renders/red.png
 # Notes:
 #   - Gemini requires GEMINI_API_KEY in your environment.
 #   - Qwen/Hunyuan require optional extras: `pip install -e .[qwen]` / `pip install -e .[hunyuan]`.
+#   - Batch files hold one JSON object per line with "prompt" and optional "size", "seed",
+#     "fmt", "backend", "profile", "negative_prompt", "renditions" and "output". Existing outputs are skipped, so an
+#     interrupted batch can be re-run to resume. Per-item results/timings go to --results.
+#   - Each --rendition FMT[:WxH] is written next to the output as <stem>-<WxH|full>.<fmt>,
+#     encoded from the same generated image.
+#   - --sink dir:PATH|cas:PATH|object:PATH writes a single prompt's outputs to that sink,
+#     with --output naming them inside it; the printed lines are the stored paths or URIs.
 
 import argparse
 import asyncio
+import json
+import sys
+import time
 from pathlib import Path
 
-from imagen.backends import get_backend
+from imagen.backends import available_backends, get_backend
+from imagen.postprocess import parse_renditions
+from imagen.sinks import LocalDirSink, sink_for
+
+
+def _rendition_paths(out_path: Path, renditions) -> list:
+    return [out_path.with_name(out_path.stem + r.suffix) for r in renditions]
 
 
 async def _run_async(args):
-    backend = get_backend(args.backend)
+    backend = get_backend(args.backend, size=args.size, fmt=args.fmt, profile=args.profile)
+    renditions = parse_renditions(args.rendition)
     result = await backend.generate_image(
         prompt=args.prompt,
         size=args.size,
         fmt=args.fmt,
         seed=args.seed,
         negative_prompt=args.negative_prompt,
+        profile=args.profile,
+        renditions=renditions,
     )
     out_path = Path(args.output or result.filename)
-    out_path.write_bytes(result.content)
-    print(str(out_path))
+    paths = [out_path, *_rendition_paths(out_path, renditions)]
+    if args.sink:
+        stored = await sink_for(args.sink).write_result(result, [p.as_posix() for p in paths])
+        for s in stored:
+            print(s.path or s.uri)
+        return
+    await LocalDirSink(out_path.parent).write_result(result, [p.name for p in paths])
+    for path in paths:
+        print(str(path))
+
+
+async def _write_item(record: dict, result, out_path: Path, renditions, t0: float, t1: float) -> dict:
+    try:
+        sink = LocalDirSink(out_path.parent)
+        extra = _rendition_paths(out_path, renditions)
+        await asyncio.gather(*(sink.write(path.name, r.content) for path, r in zip(extra, result.renditions)))
+        # Primary output last: its existence marks the item done when resuming
+        await sink.write(out_path.name, result.content)
+        t2 = time.perf_counter()
+    except Exception as e:
+        record.update(status="error", error=f"{type(e).__name__}: {e}", seconds=round(time.perf_counter() - t0, 4))
+        return record
+    record.update(
+        status="ok",
+        bytes=len(result.content),
+        renditions=[str(path) for path in extra],
+        generate_seconds=round(t1 - t0, 4),
+        write_seconds=round(t2 - t1, 4),
+        seconds=round(t2 - t0, 4),
+    )
+    return record
+
+
+async def _run_item(index: int, spec: dict, args) -> "asyncio.Future[dict]":
+    """Generate one item; returns a future for its record, resolved once its outputs are written.
+
+    Writing runs in the background so the worker can start its next generation.
+    """
+    done: "asyncio.Future[dict]" = asyncio.get_running_loop().create_future()
+    fmt = str(spec.get("fmt", args.fmt)).lower()
+    out_path = Path(spec.get("output") or Path(args.output_dir) / f"{index:05d}.{'jpg' if fmt == 'jpeg' else fmt}")
+    record = {"line": index, "output": str(out_path)}
+    if out_path.exists() and not args.overwrite:
+        record["status"] = "skipped"
+        done.set_result(record)
+        return done
+    backend_name = spec.get("backend", args.backend)
+    size = str(spec.get("size", args.size))
+    profile = spec.get("profile", args.profile)
+    t0 = time.perf_counter()
+    try:
+        renditions = parse_renditions(spec.get("renditions", args.rendition))
+        backend = get_backend(backend_name, size=size, fmt=fmt, profile=profile)
+        record["backend"] = backend.name
+        result = await backend.generate_image(
+            prompt=spec["prompt"],
+            size=size,
+            fmt=fmt,
+            seed=spec.get("seed", args.seed),
+            negative_prompt=spec.get("negative_prompt", args.negative_prompt),
+            profile=profile,
+            renditions=renditions,
+        )
+    except Exception as e:
+        record.update(status="error", error=f"{type(e).__name__}: {e}", seconds=round(time.perf_counter() - t0, 4))
+        done.set_result(record)
+        return done
+    return asyncio.ensure_future(_write_item(record, result, out_path, renditions, t0, time.perf_counter()))
+
+
+async def _run_batch(args) -> int:
+    queue: asyncio.Queue = asyncio.Queue(maxsize=args.concurrency * 2)
+    results = open(args.results, "a", encoding="utf-8") if args.results else sys.stdout
+    failures = 0
+
+    def report(record: dict):
+        nonlocal failures
+        failures += record["status"] == "error"
+        results.write(json.dumps(record) + "\n")
+        results.flush()
+
+    async def worker():
+        # The previous item's write overlaps this worker's next generation
+        pending = None
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            index, spec = item
+            if not isinstance(spec.get("prompt"), str):
+                report({"line": index, "status": "error", "error": "missing 'prompt'"})
+                continue
+            written = await _run_item(index, spec, args)
+            if pending is not None:
+                report(await pending)
+            pending = written
+        if pending is not None:
+            report(await pending)
+
+    workers = [asyncio.create_task(worker()) for _ in range(args.concurrency)]
+    try:
+        # Stream the manifest so large files never sit fully in memory
+        with open(args.batch, encoding="utf-8") as f:
+            for index, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    spec = json.loads(line)
+                except ValueError as e:
+                    report({"line": index, "status": "error", "error": f"invalid JSON: {e}"})
+                    continue
+                await queue.put((index, spec if isinstance(spec, dict) else {}))
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        if results is not sys.stdout:
+            results.close()
+    return failures
 
 
 from typing import Optional, List
@@ -33,14 +173,38 @@ from typing import Optional, List
 
 def main(argv: Optional[List[str]] = None):
     parser = argparse.ArgumentParser(description="Generate an image (no MCP)")
-    parser.add_argument("prompt", help="Text prompt")
+    parser.add_argument("prompt", nargs="?", help="Text prompt (omit with --batch)")
     parser.add_argument("--size", default="1024x1024", help="Size WxH, default 1024x1024")
     parser.add_argument("--fmt", default="png", choices=["png", "jpg", "jpeg", "webp"], help="Image format")
     parser.add_argument("--backend", default=None, help="mock|gemini|qwen|hunyuan|auto (default auto)")
+    parser.add_argument("--profile", default=None, help="Inference profile: draft|standard|final (default standard)")
+    parser.add_argument(
+        "--rendition", action="append", default=[], help="Extra output FMT[:WxH] from the same image (repeatable)"
+    )
     parser.add_argument("--seed", type=int, default=None, help="Optional seed")
     parser.add_argument("--negative-prompt", default=None, help="Optional negative prompt")
-    parser.add_argument("--output", default=None, help="Output file path")
+    parser.add_argument("--output", default=None, help="Output file path (a name inside the sink with --sink)")
+    parser.add_argument("--sink", default=None, help="Write to dir:PATH, cas:PATH or object:PATH instead of a file")
+    parser.add_argument("--batch", default=None, help="JSONL file of prompt specs to generate")
+    parser.add_argument("--output-dir", default=".", help="Batch: directory for items without an 'output'")
+    parser.add_argument("--concurrency", type=int, default=2, help="Batch: max requests in flight")
+    parser.add_argument("--results", default=None, help="Batch: append JSONL results here (default stdout)")
+    parser.add_argument("--overwrite", action="store_true", help="Batch: regenerate outputs that already exist")
+    parser.add_argument("--list-backends", action="store_true", help="Print backend availability as JSON and exit")
     args = parser.parse_args(argv)
+    if args.list_backends:
+        print(json.dumps(available_backends(), indent=2))
+        return
+    if args.batch:
+        if args.sink:
+            parser.error("--sink is not supported with --batch (resuming checks for existing output files)")
+        args.concurrency = max(1, args.concurrency)
+        failures = asyncio.run(_run_batch(args))
+        if failures:
+            raise SystemExit(1)
+        return
+    if not args.prompt:
+        parser.error("a prompt is required unless --batch is given")
     asyncio.run(_run_async(args))
 
 
@@ -14,6 +14,7 @@ import sys
 from pathlib import Path
 
 from imagen.backends.qwen import QwenImageBackend
+from imagen.sinks import save
 
 
 async def _run_async(args):
@@ -26,7 +27,7 @@ async def _run_async(args):
         negative_prompt=args.negative_prompt,
     )
     out_path = Path(args.output or result.filename)
-    out_path.write_bytes(result.content)
+    await save(out_path, result.content)
     print(str(out_path))
 
 
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+
+"""Admission control: bounded per-backend queues with load shedding.
+
+Every interactive request passes through ``admit(backend, timeout)`` before it
+reaches the backend. Each backend allows ``max_in_flight`` requests to run and
+``max_queued`` more to wait in FIFO order; beyond that requests are rejected at
+once with ``Overloaded`` and a ``retry_after`` hint estimated from recent service
+times. Waiting requests are dropped with ``DeadlineExceeded`` as soon as their
+deadline passes, or up front when the estimated wait already exceeds it, so no
+capacity is spent on clients that have given up.
+
+Limits come from ``IMAGE_GEN_<NAME>_MAX_IN_FLIGHT`` and
+``IMAGE_GEN_<NAME>_MAX_QUEUED`` (``<= 0`` means unlimited). Set
+``IMAGE_GEN_ADMISSION=0`` to disable admission control.
+"""
+
+import asyncio
+import math
+import os
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional, Tuple
+
+from .metrics import metrics
+
+# (max_in_flight, max_queued); in-flight covers micro-batches and replicas
+_DEFAULT_LIMITS = {
+    "qwen": (8, 32),
+    "hunyuan": (2, 16),
+    "gemini": (16, 128),
+    "mock": (64, 256),
+}
+_FALLBACK_LIMITS = (16, 64)
+
+ENABLED = os.getenv("IMAGE_GEN_ADMISSION", "1").lower() not in ("0", "false", "no")
+
+
+class AdmissionError(RuntimeError):
+    def __init__(self, backend: str, message: str, retry_after: float):
+        super().__init__(message)
+        self.backend = backend
+        self.retry_after = retry_after
+
+
+class Overloaded(AdmissionError):
+    """The backend's queue is full; retry after ``retry_after`` seconds."""
+
+
+class DeadlineExceeded(AdmissionError):
+    """The request's deadline passed before (or while) it could run."""
+
+
+class AdmissionController:
+    """In-flight limit plus a bounded FIFO of waiters for one backend on one loop."""
+
+    def __init__(self, name: str, max_in_flight: int = 0, max_queued: int = 0):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.in_flight = 0
+        self.rejected = 0
+        self.expired = 0
+        self._waiters: Deque[Tuple[asyncio.Future, Optional[float]]] = deque()
+        # Moving average of seconds per admitted request
+        self._service_time: Optional[float] = None
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def estimated_wait(self) -> float:
+        if self.max_in_flight <= 0 or self._service_time is None:
+            return 0.0
+        ahead = self.queued + max(0, self.in_flight - self.max_in_flight + 1)
+        return self._service_time * ahead / self.max_in_flight
+
+    def retry_after(self) -> float:
+        return float(max(1, math.ceil(self.estimated_wait() or (self._service_time or 1.0))))
+
+    def _reject(self, exc_type: type, reason: str, message: str) -> AdmissionError:
+        if exc_type is Overloaded:
+            self.rejected += 1
+        else:
+            self.expired += 1
+        metrics.inc("imagen_admission_rejected_total", backend=self.name, reason=reason)
+        return exc_type(self.name, message, self.retry_after())
+
+    def _observe(self, seconds: float) -> None:
+        prev = self._service_time
+        self._service_time = seconds if prev is None else 0.8 * prev + 0.2 * seconds
+
+    def _release(self, now: float) -> None:
+        # Hand the slot straight to the next live waiter, so in_flight stays put
+        while self._waiters:
+            fut, deadline = self._waiters.popleft()
+            if fut.done():
+                continue
+            if deadline is not None and deadline <= now:
+                fut.set_exception(self._reject(DeadlineExceeded, "deadline", "Deadline passed while queued"))
+                continue
+            fut.set_result(None)
+            return
+        self.in_flight -= 1
+
+    async def _acquire(self, deadline: Optional[float]) -> None:
+        loop = asyncio.get_running_loop()
+        if deadline is not None and deadline <= loop.time():
+            raise self._reject(DeadlineExceeded, "deadline", "Deadline already passed")
+        if self.max_in_flight <= 0 or (self.in_flight < self.max_in_flight and not self._waiters):
+            self.in_flight += 1
+            return
+        if self.max_queued > 0 and self.queued >= self.max_queued:
+            raise self._reject(Overloaded, "queue_full", f"Backend {self.name!r} is overloaded")
+        if deadline is not None and loop.time() + self.estimated_wait() > deadline:
+            raise self._reject(DeadlineExceeded, "deadline", "Deadline would pass before the request could run")
+        fut = loop.create_future()
+        entry = (fut, deadline)
+        self._waiters.append(entry)
+        try:
+            if deadline is None:
+                await fut
+            else:
+                await asyncio.wait_for(asyncio.shield(fut), deadline - loop.time())
+        except BaseException as e:
+            if fut.done() and not fut.cancelled() and fut.exception() is None:
+                # The slot was handed over just as we gave up; pass it on
+                self._release(loop.time())
+            else:
+                fut.cancel()
+                try:
+                    self._waiters.remove(entry)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject(DeadlineExceeded, "deadline", "Deadline passed while queued") from None
+            raise
+
+    @asynccontextmanager
+    async def slot(self, deadline: Optional[float] = None) -> AsyncIterator[None]:
+        """Hold one in-flight slot; ``deadline`` is in ``loop.time()`` seconds."""
+        await self._acquire(deadline)
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        try:
+            yield
+        finally:
+            now = loop.time()
+            self._observe(now - t0)
+            self._release(now)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "max_in_flight": self.max_in_flight,
+            "max_queued": self.max_queued,
+        }
+
+
+def _limits(name: str) -> Tuple[int, int]:
+    base = name.split("@", 1)[0]
+    key = base.upper().replace("-", "_")
+    default_in_flight, default_queued = _DEFAULT_LIMITS.get(base, _FALLBACK_LIMITS)
+    return (
+        int(os.getenv(f"IMAGE_GEN_{key}_MAX_IN_FLIGHT", str(default_in_flight))),
+        int(os.getenv(f"IMAGE_GEN_{key}_MAX_QUEUED", str(default_queued))),
+    )
+
+
+# Controllers hold loop-bound futures, so each event loop gets its own set
+_controllers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, AdmissionController]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_controller(name: str) -> AdmissionController:
+    per_loop = _controllers.setdefault(asyncio.get_running_loop(), {})
+    controller = per_loop.get(name)
+    if controller is None:
+        controller = per_loop[name] = AdmissionController(name, *_limits(name))
+    return controller
+
+
+def admission_stats() -> Dict[str, Dict[str, float]]:
+    """Per-backend admission state, summed over event loops."""
+    totals: Dict[str, Dict[str, float]] = {}
+    for per_loop in list(_controllers.values()):
+        for name, controller in per_loop.items():
+            acc = totals.setdefault(name, {})
+            for key, value in controller.stats().items():
+                # Limits are per loop; counts add up
+                acc[key] = value if key.startswith("max_") else acc.get(key, 0) + value
+    return totals
+
+
+@asynccontextmanager
+async def admit(backend: str, timeout: Optional[float] = None) -> AsyncIterator[None]:
+    """Admit one request for ``backend``; ``timeout`` (seconds) bounds queueing and running.
+
+    Raises ``Overloaded`` when the backend's queue is full and ``DeadlineExceeded``
+    when the timeout passes, cancelling the generation if it already started.
+    """
+    if not ENABLED:
+        yield
+        return
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout if timeout and timeout > 0 else None
+    controller = get_controller(backend)
+    async with controller.slot(deadline):
+        if deadline is None:
+            yield
+            return
+        try:
+            async with asyncio.timeout_at(deadline):
+                yield
+        except TimeoutError:
+            if loop.time() < deadline:
+                raise  # raised by the backend itself, not our deadline
+            raise controller._reject(DeadlineExceeded, "deadline", "Deadline passed while generating") from None
@@ -1,37 +1,110 @@
 # -*- coding: utf-8 -*-
 
-from .base import ImageBackend, ImageResult
+from .base import Capabilities, ImageBackend, ImageResult
+from .compile import compile_reports
+from .instances import InstanceRegistry, get_registry, warm_up
+from .replicas import ReplicaPool, resolve_devices
+from .residency import ResidencyManager, get_residency
+from .registry import BackendRegistry, BackendSpec, get_backend_registry, register_backend
 from ..config import get_settings
-import importlib
+from ..profiles import get_profile
 
-from typing import Optional
+from typing import Any, Dict, Optional
 
 
-def get_backend(preferred: Optional[str] = None) -> ImageBackend:
+def _resolve(choice: str, size: Optional[str] = None, fmt: Optional[str] = None) -> BackendSpec:
+    """Map a backend name/alias, or "auto", to its spec."""
+    backends = get_backend_registry()
+    if choice == "auto":
+        return backends.route(size=size, fmt=fmt)
+    return backends.lookup(choice)
+
+
+def _builder(spec: BackendSpec):
+    def build(**kwargs) -> ImageBackend:
+        settings = get_settings()
+        devices = resolve_devices(settings.devices) if spec.capabilities.device == "gpu" else []
+        if devices:
+            # One replica per device, dispatched least-loaded
+            backend: ImageBackend = ReplicaPool(lambda device: spec.build(device=device, **kwargs), devices)
+        else:
+            backend = spec.build(**kwargs)
+        if settings.cache_enabled:
+            from ..cache import CachedBackend, get_result_cache
+
+            backend = CachedBackend(backend, get_result_cache(), cache_unseeded=settings.cache_unseeded)
+        if settings.singleflight:
+            from ..singleflight import SingleFlightBackend
+
+            # Outermost, so concurrent cache misses for one key also run once
+            backend = SingleFlightBackend(backend)
+        return backend
+
+    return build
+
+
+def get_backend(
+    preferred: Optional[str] = None,
+    size: Optional[str] = None,
+    fmt: Optional[str] = None,
+    profile: Optional[str] = None,
+) -> ImageBackend:
+    """Return the shared backend instance for ``preferred`` (or the configured default).
+
+    Instances are kept in a process-wide registry, so repeated calls reuse loaded
+    pipelines instead of reloading weights. With "auto", ``size``/``fmt`` steer
+    routing to the fastest available backend that supports them. A ``profile``
+    whose ``model_variant`` differs from the default selects a separate instance
+    with that model loaded; unknown profile names raise ValueError.
+    """
     settings = get_settings()
     choice = (preferred or settings.backend or "auto").lower()
-    if choice == "mock":
-        mod = importlib.import_module("imagen.backends.mock")
-        return mod.MockBackend()
-    if choice in ("gemini", "google", "imagen"):
-        mod = importlib.import_module("imagen.backends.gemini")
-        return mod.GeminiBackend(api_key=settings.gemini_api_key)
-    if choice in ("qwen", "qwen-image", "qwen_image"):
-        mod = importlib.import_module("imagen.backends.qwen")
-        return mod.QwenImageBackend()
-    if choice in ("hunyuan", "hunyuanimage", "hunyuan-image"):
-        mod = importlib.import_module("imagen.backends.hunyuan")
-        return mod.HunyuanBackend()
-    # auto
-    if settings.gemini_api_key:
-        mod = importlib.import_module("imagen.backends.gemini")
-        return mod.GeminiBackend(api_key=settings.gemini_api_key)
-    mod = importlib.import_module("imagen.backends.mock")
-    return mod.MockBackend()
+    spec = _resolve(choice, size=size, fmt=fmt)
+    kwargs = spec.kwargs()
+    inference = get_profile(spec.name, profile)
+    if spec.variant_arg and inference is not None and inference.model_variant:
+        kwargs[spec.variant_arg] = inference.model_variant
+    return get_registry().get(spec.name, _builder(spec), kwargs)
+
+
+def available_backends() -> Dict[str, Dict[str, Any]]:
+    """Report which backends can run here and their capabilities.
+
+    Does not import heavy frameworks (GPU presence is not probed). Pipelines
+    loaded in this process are listed under "resident" with their placement and
+    resident bytes, and compiled ones under "compiled" with compile and warm-up
+    seconds.
+    """
+    described = get_backend_registry().describe()
+    for field, reports in (("resident", get_residency().report()), ("compiled", compile_reports())):
+        for key, info in reports.items():
+            name = key.split(":", 1)[0]
+            if name in described:
+                described[name].setdefault(field, {})[key] = info
+    return described
+
+
+def unload_backend(name: Optional[str] = None) -> int:
+    """Unload shared backend instances (all, or only those for ``name``)."""
+    canonical = _resolve(name.lower()).name if name else None
+    return get_registry().unload(canonical)
 
 __all__ = [
+    "BackendRegistry",
+    "BackendSpec",
+    "Capabilities",
     "ImageBackend",
     "ImageResult",
+    "InstanceRegistry",
+    "ReplicaPool",
+    "ResidencyManager",
     # Concrete backend classes are imported lazily
+    "available_backends",
     "get_backend",
+    "get_backend_registry",
+    "get_registry",
+    "get_residency",
+    "register_backend",
+    "unload_backend",
+    "warm_up",
 ]
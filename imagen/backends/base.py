@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
 
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ..postprocess import Rendition, content_type, render_renditions
+
+# Ordered fastest to slowest; "auto" routing prefers earlier classes
+LATENCY_CLASSES = ("realtime", "fast", "standard", "slow")
 
 
 @dataclass
@@ -10,10 +15,58 @@ class ImageResult:
     content_type: str
     format: str
     filename: str
+    # Seconds spent per stage (load, compose, inference, encode, ...), plus "total"
+    timings: Dict[str, float] = field(default_factory=dict)
+    # Extra outputs requested via ``renditions``, in request order
+    renditions: List["ImageResult"] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class Capabilities:
+    """What a backend can do, used for discovery and "auto" routing."""
+
+    formats: Tuple[str, ...] = ("png", "jpg", "jpeg", "webp")
+    min_size: int = 16
+    max_size: int = 4096
+    batching: bool = False
+    # "cpu", "gpu" (CUDA or MPS) or "remote"
+    device: str = "cpu"
+    latency_class: str = "standard"
+
+    def supports(self, size: Optional[str] = None, fmt: Optional[str] = None) -> bool:
+        if fmt is not None and fmt.lower() not in self.formats:
+            return False
+        if size is not None:
+            try:
+                w_s, h_s = size.lower().split("x", 1)
+                w, h = int(w_s), int(h_s)
+            except ValueError:
+                return True  # backends fall back to their default size
+            if not (self.min_size <= w <= self.max_size and self.min_size <= h <= self.max_size):
+                return False
+        return True
+
+    @property
+    def latency_rank(self) -> int:
+        try:
+            return LATENCY_CLASSES.index(self.latency_class)
+        except ValueError:
+            return len(LATENCY_CLASSES)
+
+
+async def derive_renditions(source: Any, renditions: Sequence[Rendition], filename: str) -> List[ImageResult]:
+    """Build rendition results from ``source`` (PIL image or encoded bytes)."""
+    stem = filename.rsplit(".", 1)[0]
+    contents = await render_renditions(source, renditions)
+    return [
+        ImageResult(content=data, content_type=content_type(r.fmt), format=r.fmt, filename=stem + r.suffix)
+        for r, data in zip(renditions, contents)
+    ]
 
 
 class ImageBackend:
     name: str = "base"
+    capabilities: Capabilities = Capabilities()
 
     async def generate_image(
         self,
@@ -22,5 +75,59 @@ class ImageBackend:
         fmt: str = "png",
         seed: Optional[int] = None,
         negative_prompt: Optional[str] = None,
+        profile: Optional[str] = None,
+        renditions: Optional[Sequence[Rendition]] = None,
     ) -> ImageResult:
+        """Generate one image. ``profile`` names an inference profile (see
+        ``imagen.profiles``); backends without tunable inference ignore it.
+        ``renditions`` adds derivatives of the same image to ``result.renditions``."""
         raise NotImplementedError
+
+    async def load(self) -> None:
+        """Load heavy resources (weights, clients) ahead of the first request.
+
+        Backends without anything to preload keep this no-op default.
+        """
+
+    def unload(self) -> None:
+        """Release heavy resources; they are loaded again lazily on next use."""
+
+    async def health(self) -> bool:
+        """Cheap liveness probe used by replica pools; healthy by default."""
+        return True
+
+
+def model_of(backend: Any) -> Optional[str]:
+    """Model a backend serves (``model_id`` or ``model_name``), if it has one."""
+    return getattr(backend, "model_id", None) or getattr(backend, "model_name", None)
+
+
+class WrappedBackend(ImageBackend):
+    """Base for layers that ``get_backend`` stacks around a backend (result cache,
+    single-flight coalescing).
+
+    Name, capabilities, model, health, resident bytes and lifecycle calls pass
+    through to ``inner``, so callers can treat the stack as the backend itself.
+    """
+
+    def __init__(self, inner: ImageBackend):
+        self.inner = inner
+        self.name = inner.name
+        self.capabilities = inner.capabilities
+
+    @property
+    def model_id(self) -> Optional[str]:
+        return model_of(self.inner)
+
+    @property
+    def resident_bytes(self) -> int:
+        return getattr(self.inner, "resident_bytes", 0)
+
+    async def load(self) -> None:
+        await self.inner.load()
+
+    def unload(self) -> None:
+        self.inner.unload()
+
+    async def health(self) -> bool:
+        return await self.inner.health()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+"""Opt-in ``torch.compile`` of local pipelines plus start-up warm-up runs.
+
+With ``IMAGE_GEN_COMPILE=1`` the denoiser (``transformer``, or ``dit`` for
+upstream Hunyuan) and the VAE decoder are wrapped with ``torch.compile`` right
+after the pipeline is placed. Compilation happens on the first call for each
+input shape, so ``load()`` then runs a short generation for every size in
+``IMAGE_GEN_WARMUP_SIZES`` (default ``1024x1024``) with
+``IMAGE_GEN_WARMUP_STEPS`` steps (default 2) before the backend takes traffic.
+
+Compiled kernels and FX graphs persist in ``IMAGE_GEN_COMPILE_CACHE_DIR``
+(default ``~/.cache/imagen/torch-compile``), so restarts and reloads after idle
+unloading skip most of the work. ``IMAGE_GEN_COMPILE_MODE`` picks the
+``torch.compile`` mode (default ``default``; ``max-autotune`` trades longer
+compiles for faster kernels). Compile and warm-up seconds are recorded per model
+and listed under ``compiled`` in ``available_backends()``. Inductor also runs on
+CPU, so the whole path works without a GPU.
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ..postprocess import parse_size
+
+logger = logging.getLogger(__name__)
+
+_DENOISERS = ("transformer", "dit", "unet")
+
+
+@dataclass(frozen=True)
+class CompileOptions:
+    enabled: bool = False
+    mode: str = "default"
+    cache_dir: str = os.path.join(os.path.expanduser("~"), ".cache", "imagen", "torch-compile")
+    warmup_sizes: Tuple[str, ...] = ("1024x1024",)
+    warmup_steps: int = 2
+
+    @classmethod
+    def from_env(cls) -> "CompileOptions":
+        sizes = os.getenv("IMAGE_GEN_WARMUP_SIZES", "1024x1024")
+        return cls(
+            enabled=os.getenv("IMAGE_GEN_COMPILE", "0").lower() in ("1", "true", "yes"),
+            mode=os.getenv("IMAGE_GEN_COMPILE_MODE", "default"),
+            cache_dir=os.getenv("IMAGE_GEN_COMPILE_CACHE_DIR", cls.cache_dir),
+            warmup_sizes=tuple(s.strip() for s in sizes.split(",") if s.strip()),
+            warmup_steps=int(os.getenv("IMAGE_GEN_WARMUP_STEPS", "2")),
+        )
+
+    def warmup_shapes(self) -> Tuple[Tuple[int, int], ...]:
+        return tuple(parse_size(s) for s in self.warmup_sizes)
+
+
+def _use_cache_dir(cache_dir: str) -> None:
+    # Inductor reads these when it first compiles; set them before torch.compile
+    os.makedirs(cache_dir, exist_ok=True)
+    os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", cache_dir)
+    os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+    os.environ.setdefault("TORCHINDUCTOR_AUTOGRAD_CACHE", "1")
+
+
+def compile_pipeline(pipe: Any, options: CompileOptions, compile_fn: Optional[Callable[..., Any]] = None) -> float:
+    """Wrap the pipeline's denoiser and VAE decoder with ``torch.compile``; returns seconds.
+
+    Only the wrapping is timed here; graphs compile on first use (see ``warm_up``).
+    """
+    _use_cache_dir(options.cache_dir)
+    if compile_fn is None:
+        import torch  # type: ignore
+
+        compile_fn = torch.compile
+    t0 = time.perf_counter()
+    for name in _DENOISERS:
+        module = getattr(pipe, name, None)
+        if module is not None:
+            setattr(pipe, name, compile_fn(module, mode=options.mode))
+            break
+    vae = getattr(pipe, "vae", None)
+    if vae is not None and hasattr(vae, "decode"):
+        vae.decode = compile_fn(vae.decode, mode=options.mode)
+    return time.perf_counter() - t0
+
+
+def warm_up(run: Callable[[int, int, int], Any], options: CompileOptions) -> Dict[str, float]:
+    """Call ``run(width, height, steps)`` once per warm-up size; returns seconds per size."""
+    timings: Dict[str, float] = {}
+    for width, height in options.warmup_shapes():
+        t0 = time.perf_counter()
+        run(width, height, options.warmup_steps)
+        timings[f"{width}x{height}"] = round(time.perf_counter() - t0, 3)
+    return timings
+
+
+_reports: Dict[str, Dict[str, Any]] = {}
+_reports_lock = threading.Lock()
+
+
+def record(key: str, **fields: Any) -> None:
+    """Merge compile/warm-up timings for ``key`` into the process-wide report."""
+    with _reports_lock:
+        _reports.setdefault(key, {}).update(fields)
+
+
+def compile_reports() -> Dict[str, Dict[str, Any]]:
+    with _reports_lock:
+        return {key: dict(report) for key, report in _reports.items()}
+
+
+_options: Optional[CompileOptions] = None
+
+
+def get_compile_options() -> CompileOptions:
+    global _options
+    if _options is None:
+        _options = CompileOptions.from_env()
+    return _options
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+"""LRU cache of text-encoder outputs for local diffusion pipelines.
+
+Agents resubmit the same prompt with different seeds and sizes, and the
+negative prompt is usually a constant, so most text-encoder passes repeat work.
+Local backends encode each distinct text once per model and device through
+``EmbeddingCache.encode`` and pass the cached tensors to the pipeline as
+``prompt_embeds``/``negative_prompt_embeds``. Entries stay on the device and are
+bounded by ``IMAGE_GEN_EMBED_CACHE_BYTES`` (default 256 MiB, 0 disables).
+
+Embeddings are cached per text, not per batch: ``stack_padded`` pads a micro
+batch's per-prompt embeddings to a common sequence length and concatenates them.
+"""
+
+import inspect
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from ..metrics import metrics
+
+# One encoded text: the tensors the pipeline returns, e.g. (embeds, mask)
+Encoded = Tuple[Any, ...]
+
+
+def _nbytes(encoded: Encoded) -> int:
+    return sum(t.numel() * t.element_size() for t in encoded if t is not None)
+
+
+class EmbeddingCache:
+    """Thread-safe LRU of ``(model, text) -> encoded tensors`` bounded by bytes."""
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[Tuple[Hashable, str], Encoded]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key: Tuple[Hashable, str]) -> Optional[Encoded]:
+        with self._lock:
+            encoded = self._items.get(key)
+            if encoded is not None:
+                self._items.move_to_end(key)
+            return encoded
+
+    def _put(self, key: Tuple[Hashable, str], encoded: Encoded) -> None:
+        size = _nbytes(encoded)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= _nbytes(old)
+            self._items[key] = encoded
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._items:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= _nbytes(evicted)
+
+    def encode(
+        self, model: Hashable, texts: Sequence[str], encode: Callable[[List[str]], List[Encoded]]
+    ) -> List[Encoded]:
+        """Encoded tensors for each of ``texts``; ``encode`` runs once for the distinct misses."""
+        found: Dict[str, Encoded] = {}
+        if self.max_bytes > 0:
+            for text in dict.fromkeys(texts):
+                encoded = self._get((model, text))
+                if encoded is not None:
+                    found[text] = encoded
+        missing = [text for text in dict.fromkeys(texts) if text not in found]
+        if missing:
+            for text, encoded in zip(missing, encode(missing)):
+                found[text] = encoded
+                if self.max_bytes > 0:
+                    self._put((model, text), encoded)
+        hits = len(texts) - len(missing)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(missing)
+        if hits:
+            metrics.inc("imagen_embedding_cache_hits_total", hits, model=str(model))
+        if missing:
+            metrics.inc("imagen_embedding_cache_misses_total", len(missing), model=str(model))
+        return [found[text] for text in texts]
+
+    def drop(self, model: Hashable) -> None:
+        """Forget every entry for ``model``, e.g. when its pipeline unloads."""
+        with self._lock:
+            for key in [k for k in self._items if k[0] == model]:
+                self._bytes -= _nbytes(self._items.pop(key))
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._items),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def supports_embeds(pipe: Any) -> bool:
+    """True if ``pipe`` can encode prompts separately and accept ``prompt_embeds``."""
+    if not callable(getattr(pipe, "encode_prompt", None)):
+        return False
+    try:
+        params = inspect.signature(pipe.__call__).parameters
+    except (TypeError, ValueError):
+        return False
+    return "prompt_embeds" in params
+
+
+def stack_padded(tensors: Sequence[Any]) -> Any:
+    """Concatenate (1, seq, ...) tensors along the batch dim, zero-padding ``seq``."""
+    import torch  # type: ignore
+
+    length = max(t.shape[1] for t in tensors)
+    padded = []
+    for t in tensors:
+        if t.shape[1] < length:
+            pad = t.new_zeros((t.shape[0], length - t.shape[1], *t.shape[2:]))
+            t = torch.cat([t, pad], dim=1)
+        padded.append(t)
+    return torch.cat(padded, dim=0)
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache(int(os.getenv("IMAGE_GEN_EMBED_CACHE_BYTES", str(256 * 1024 * 1024))))
+    return _cache
@@ -5,12 +5,19 @@ This backend intentionally keeps the flow minimal and matches Google’s docs:
 - Migration guide: https://ai.google.dev/gemini-api/docs/migrate
 """
 
+import asyncio
 import base64
-import io
+import dataclasses
 import os
-from typing import Optional, Tuple
+import weakref
+from typing import Any, Optional, Sequence, Tuple
 
-from .base import ImageBackend, ImageResult
+from ..metrics import span, track_request
+from ..postprocess import content_type as mime_for, convert_async, normalize_format
+from ..ratelimit import TokenBucket, retry_async
+from .base import ImageBackend, ImageResult, Rendition, derive_renditions
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
 
 
 def _parse_size(size: str) -> Tuple[int, int]:
@@ -24,14 +31,80 @@ def _parse_size(size: str) -> Tuple[int, int]:
         return 1024, 1024
 
 
+def _is_retryable(exc: BaseException) -> bool:
+    code = getattr(exc, "code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS
+    # Transport-level failures (connection resets, timeouts) from httpx/aiohttp
+    return isinstance(exc, (ConnectionError, asyncio.TimeoutError)) or type(exc).__module__.startswith(
+        ("httpx", "aiohttp")
+    )
+
+
+class _LoopState:
+    """Async client and concurrency cap bound to one event loop."""
+
+    def __init__(self, client: Any, max_concurrency: int):
+        self.client = client
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+
 class GeminiBackend(ImageBackend):
+    """Image generation through the Gemini API.
+
+    Holds one long-lived async client (``client.aio``) per event loop so
+    connections are reused across requests. Calls are capped by a semaphore
+    (``GEMINI_MAX_CONCURRENCY``, default 8), rate limited by a token bucket
+    (``GEMINI_RATE_LIMIT`` requests/second, default unlimited), and retried on
+    429/5xx with jittered exponential backoff (``GEMINI_MAX_RETRIES``, default 4).
+    ``GEMINI_BASE_URL`` points the client at another endpoint (e.g. a local stub).
+    """
+
     name = "gemini"
 
-    def __init__(self, model_name: Optional[str] = None, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        rate_limit: Optional[float] = None,
+        max_retries: Optional[int] = None,
+    ):
         # Per docs, use the image preview model by default.
         # https://ai.google.dev/gemini-api/docs/image-generation
         self.model_name = model_name or "gemini-2.5-flash-image-preview"
         self.api_key = api_key
+        self.base_url = base_url or os.getenv("GEMINI_BASE_URL")
+        self.max_concurrency = max_concurrency or int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+        if rate_limit is None:
+            rate_limit = float(os.getenv("GEMINI_RATE_LIMIT", "0"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("GEMINI_MAX_RETRIES", "4"))
+        self._bucket = TokenBucket(rate_limit)
+        self._states: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _state(self, api_key: str) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is None:
+            try:
+                import google.genai as genai  # type: ignore
+                from google.genai import types  # type: ignore
+            except Exception as e:  # pragma: no cover - import-time environment
+                raise RuntimeError(
+                    "google-genai is required for the Gemini backend. Install with: pip install google-genai"
+                ) from e
+            http_options = types.HttpOptions(base_url=self.base_url) if self.base_url else None
+            client = genai.Client(api_key=api_key, http_options=http_options)
+            state = _LoopState(client.aio, self.max_concurrency)
+            self._states[loop] = state
+        return state
+
+    def unload(self) -> None:
+        # Clients are recreated lazily; dropping them releases pooled connections
+        self._states = weakref.WeakKeyDictionary()
 
     async def generate_image(
         self,
@@ -40,33 +113,42 @@ class GeminiBackend(ImageBackend):
         fmt: str = "png",
         seed: Optional[int] = None,
         negative_prompt: Optional[str] = None,
+        profile: Optional[str] = None,
+        renditions: Optional[Sequence[Rendition]] = None,
+    ) -> ImageResult:
+        with track_request(self.name) as timings:
+            result = await self._generate(prompt, size, fmt, seed, negative_prompt, renditions or ())
+        result.timings = timings
+        return result
+
+    async def _generate(
+        self,
+        prompt: str,
+        size: str,
+        fmt: str,
+        seed: Optional[int],
+        negative_prompt: Optional[str],
+        renditions: Sequence[Rendition] = (),
     ) -> ImageResult:
         api_key = self.api_key or os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
         if not api_key:
             raise RuntimeError("No Gemini API key found. Set GEMINI_API_KEY or GOOGLE_API_KEY.")
 
         # Desired output format/mime
-        fmt_l = fmt.lower()
-        desired_mime = f"image/{'jpeg' if fmt_l == 'jpg' else fmt_l}"
+        fmt_l = normalize_format(fmt)
+        desired_mime = mime_for(fmt_l)
 
         # Compose prompt; keep it simple and human-readable
-        width, height = _parse_size(size)
-        full_prompt = prompt
-        if negative_prompt:
-            full_prompt += f"\nNegative prompt: {negative_prompt}"
-        # Encourage target size (the model may not guarantee exact dimensions)
-        full_prompt += f"\nTarget size: {width}x{height}"
-
-        # Use the new google-genai client
-        try:
-            import google.genai as genai  # type: ignore
-            from google.genai import types  # type: ignore
-        except Exception as e:  # pragma: no cover - import-time environment
-            raise RuntimeError(
-                "google-genai is required for the Gemini backend. Install with: pip install google-genai"
-            ) from e
+        with span("compose"):
+            width, height = _parse_size(size)
+            full_prompt = prompt
+            if negative_prompt:
+                full_prompt += f"\nNegative prompt: {negative_prompt}"
+            # Encourage target size (the model may not guarantee exact dimensions)
+            full_prompt += f"\nTarget size: {width}x{height}"
 
-        client = genai.Client(api_key=api_key)
+        state = self._state(api_key)
+        from google.genai import types  # type: ignore
 
         # Ask explicitly for IMAGE output; do not set response_mime_type.
         # The server only allows text mime types there.
@@ -76,12 +158,18 @@ class GeminiBackend(ImageBackend):
             seed=seed,
         )
 
-        # Generate image from text prompt
-        resp = client.models.generate_content(
-            model=self.model_name,
-            contents=full_prompt,
-            config=config,
-        )
+        async def call():
+            await self._bucket.acquire()
+            async with state.semaphore:
+                return await state.client.models.generate_content(
+                    model=self.model_name,
+                    contents=full_prompt,
+                    config=config,
+                )
+
+        # Generate image from text prompt, retrying throttling and server errors
+        with span("inference"):
+            resp = await retry_async(call, _is_retryable, max_retries=self.max_retries)
 
         # Extract first inline image from response
         content_bytes: Optional[bytes] = None
@@ -105,24 +193,26 @@ class GeminiBackend(ImageBackend):
         if not content_bytes:
             raise RuntimeError("Gemini response did not include any inline image data")
 
-        # Best-effort resize/convert to requested format using Pillow.
-        try:
-            from PIL import Image  # type: ignore
-
-            img = Image.open(io.BytesIO(content_bytes))
-            if img.size != (width, height):
-                img = img.resize((width, height))
+        stem = f"gemini_{abs(hash(prompt)) % 1_000_000}"
+        # Renditions without a size match the primary output, not the raw response
+        renditions = [r if r.size else dataclasses.replace(r, size=f"{width}x{height}") for r in renditions]
+        derived = asyncio.ensure_future(derive_renditions(content_bytes, renditions, f"{stem}.{fmt_l}"))
 
-            buf = io.BytesIO()
-            fmt_upper = "JPEG" if fmt_l == "jpg" else fmt_l.upper()
-            img.save(buf, format=fmt_upper)
-            content_bytes = buf.getvalue()
-            content_type = f"image/{'jpeg' if fmt_l == 'jpg' else fmt_l}"
+        # Best-effort resize/convert to requested format; a no-op when the response
+        # already has the requested format and size.
+        try:
+            content_bytes = await convert_async(content_bytes, fmt_l, (width, height))
+            content_type = desired_mime
+        except asyncio.CancelledError:
+            derived.cancel()
+            raise
         except Exception:
             # If Pillow fails, keep original bytes and best-guess content_type
             if not content_type:
                 content_type = desired_mime
 
         ext = "jpg" if (content_type or desired_mime).lower().endswith("jpeg") else (content_type or desired_mime).split("/")[-1]
-        filename = f"gemini_{abs(hash(prompt)) % 1_000_000}.{ext}"
-        return ImageResult(content=content_bytes, content_type=content_type, format=ext, filename=filename)
+        filename = f"{stem}.{ext}"
+        return ImageResult(
+            content=content_bytes, content_type=content_type, format=ext, filename=filename, renditions=await derived
+        )
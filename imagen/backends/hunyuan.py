@@ -1,13 +1,18 @@
 # -*- coding: utf-8 -*-
 
-import io
+import asyncio
 import os
-from typing import Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-import torch  # type: ignore
-from hyimage.diffusion.pipelines.hunyuanimage_pipeline import HunyuanImagePipeline  # type: ignore
-
-from .base import ImageBackend, ImageResult
+from ..executor import run_blocking
+from ..metrics import span, track_request
+from ..postprocess import content_type, encode_async, normalize_format
+from ..profiles import get_profile
+from ..progress import current_control
+from .base import ImageResult, Rendition, derive_renditions
+from .embeddings import get_embedding_cache, supports_embeds
+from .local import LocalPipelineBackend
+from .residency import get_residency
 
 
 def _parse_size(size: str) -> Tuple[int, int]:
@@ -21,19 +26,29 @@ def _parse_size(size: str) -> Tuple[int, int]:
         return 1024, 1024
 
 
-def _select_device_and_dtype() -> tuple[str, str]:
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "false").lower() in ("1", "true", "yes")
+
+
+def _select_device_and_dtype(device: Optional[str] = None) -> tuple[str, str]:
     """Pick best local device and dtype string for Hunyuan.
 
     Returns a tuple of (device, dtype_str) where dtype_str is one of 'bf16', 'fp16', 'fp32'.
+    ``device`` (e.g. "cuda:1") pins the device instead of auto-selecting.
     """
+    import torch  # type: ignore
+
+    kind = device.split(":", 1)[0] if device else None
     # CUDA, prefer bf16 if supported, else fp16
-    if torch.cuda.is_available():
+    if kind == "cuda" or (kind is None and torch.cuda.is_available()):
         bf16_ok = False
         try:
             bf16_ok = bool(getattr(torch.cuda, "is_bf16_supported", lambda: False)())
         except Exception:
             bf16_ok = False
-        return ("cuda", "bf16" if bf16_ok else "fp16")
+        return (device or "cuda", "bf16" if bf16_ok else "fp16")
+    if kind is not None:
+        return (device, "fp16" if kind == "mps" else "fp32")
     # Apple MPS
     if getattr(torch.backends, "mps", None) and torch.backends.mps.is_available():  # type: ignore[attr-defined]
         return ("mps", "fp16")
@@ -41,7 +56,7 @@ def _select_device_and_dtype() -> tuple[str, str]:
     return ("cpu", "fp32")
 
 
-class HunyuanBackend(ImageBackend):
+class HunyuanBackend(LocalPipelineBackend):
     """Local HunyuanImage-2.1 inference via upstream pipeline.
 
     Requirements (not auto-installed):
@@ -53,17 +68,22 @@ class HunyuanBackend(ImageBackend):
         containing `vae`, `text_encoder`, and `dit` subfolders as per upstream docs.
         Alternatively set `HUNYUAN_MODEL_ROOT` (this backend will map it to the expected env).
 
-    This backend runs fully locally and selects CUDA → MPS → CPU automatically.
+    This backend runs fully locally and selects CUDA → MPS → CPU automatically;
+    the residency manager offloads to CPU when the weights do not fit the device.
+
+    Reprompting, refinement, steps and guidance follow the request's inference
+    profile (``imagen.profiles``); ``HUNYUAN_USE_REPROMPT``/``HUNYUAN_USE_REFINER``
+    are read once at construction and apply when the profile leaves them unset.
     """
 
     name = "hunyuan"
 
-    def __init__(self, model_name: Optional[str] = None):
+    def __init__(self, model_name: Optional[str] = None, device: Optional[str] = None):
         # 'hunyuanimage-v2.1' or 'hunyuanimage-v2.1-distilled'
         self.model_name = model_name or os.getenv("HUNYUAN_MODEL_NAME", "hunyuanimage-v2.1")
-        self._pipe = None
-        self._device = None
-        self._dtype = None
+        super().__init__(device)
+        self.use_reprompt = _env_flag("HUNYUAN_USE_REPROMPT")
+        self.use_refiner = _env_flag("HUNYUAN_USE_REFINER")
 
     def _ensure_env(self):
         # Allow users to set a generic root, map it to upstream env var name
@@ -71,13 +91,14 @@ class HunyuanBackend(ImageBackend):
         if root and not os.getenv("HUNYUANIMAGE_V2_1_MODEL_ROOT"):
             os.environ["HUNYUANIMAGE_V2_1_MODEL_ROOT"] = root
 
-    def _ensure_pipe(self):
-        if self._pipe is not None:
-            return
+    def _load_pipe_inner(self):
         self._ensure_env()
-        device, dtype_str = _select_device_and_dtype()
+        device, dtype_str = _select_device_and_dtype(self.device)
         self._device, self._dtype = device, dtype_str
 
+        # Imported here so that merely importing this module does not pull in torch
+        from hyimage.diffusion.pipelines.hunyuanimage_pipeline import HunyuanImagePipeline  # type: ignore
+
         # Construct pipeline with local weights; dtype/device are strings in this pipeline
         pipe = HunyuanImagePipeline.from_pretrained(
             model_name=self.model_name,
@@ -85,16 +106,51 @@ class HunyuanBackend(ImageBackend):
             device=device,
         )
 
+        residency = get_residency()
         try:
-            pipe = pipe.to(device)
+            residency.place(self._residency_key, pipe, device, self.unload, executor=self._executor)
         except Exception:
             # If move fails, fallback to CPU
-            device = "cpu"
-            pipe = pipe.to(device)
-            self._device, self._dtype = device, "fp32"
+            residency.release(self._residency_key)
+            self._device, self._dtype = "cpu", "fp32"
+            residency.place(self._residency_key, pipe, "cpu", self.unload, executor=self._executor)
+        self._compile(pipe)
 
         self._pipe = pipe
 
+    def _text_inputs(self, prompt: str, negative_prompt: str, use_reprompt: bool) -> Dict[str, Any]:
+        """Prompt arguments, from cached text embeddings when the pipeline supports them."""
+        # Reprompting rewrites the text inside the pipeline, so embeddings cannot be reused
+        if use_reprompt or not supports_embeds(self._pipe):
+            return {"prompt": prompt, "negative_prompt": negative_prompt}
+
+        def encode(texts: List[str]) -> List[Tuple[Any, ...]]:
+            encoded = [self._pipe.encode_prompt(text) for text in texts]
+            return [e if isinstance(e, tuple) else (e,) for e in encoded]
+
+        positive, negative = get_embedding_cache().encode(self._residency_key, [prompt, negative_prompt], encode)
+        call = {"prompt_embeds": positive[0], "negative_prompt_embeds": negative[0]}
+        if len(positive) > 1:
+            call.update(prompt_embeds_mask=positive[1], negative_prompt_embeds_mask=negative[1])
+        return call
+
+    def _infer(self, prompt: str, negative_prompt: str, **kwargs):
+        with get_residency().use(self._residency_key):
+            text = self._text_inputs(prompt, negative_prompt, kwargs.get("use_reprompt", False))
+            return self._pipe(**text, **kwargs)
+
+    def _warm_up_once(self, width: int, height: int, steps: int) -> None:
+        self._infer(
+            prompt="warm-up",
+            negative_prompt="",
+            width=width,
+            height=height,
+            seed=0,
+            use_reprompt=False,
+            use_refiner=False,
+            num_inference_steps=steps,
+        )
+
     async def generate_image(
         self,
         prompt: str,
@@ -102,33 +158,60 @@ class HunyuanBackend(ImageBackend):
         fmt: str = "png",
         seed: Optional[int] = None,
         negative_prompt: Optional[str] = None,
+        profile: Optional[str] = None,
+        renditions: Optional[Sequence[Rendition]] = None,
     ) -> ImageResult:
-        self._ensure_pipe()
-        assert self._pipe is not None
-
-        width, height = _parse_size(size)
-        use_reprompt = os.getenv("HUNYUAN_USE_REPROMPT", "false").lower() in ("1", "true", "yes")
-        use_refiner = os.getenv("HUNYUAN_USE_REFINER", "false").lower() in ("1", "true", "yes")
-
-        image = self._pipe(
-            prompt=prompt,
-            negative_prompt=negative_prompt or "",
-            width=width,
-            height=height,
-            use_reprompt=use_reprompt,
-            use_refiner=use_refiner,
-            seed=seed,
+        inference = get_profile(self.name, profile)
+        control = current_control()
+        with track_request(self.name) as timings:
+            await run_blocking(self._executor, self._ensure_pipe)
+            assert self._pipe is not None
+            # The upstream pipeline has no per-step callback, so progress is coarse
+            # and cancellation only takes effect before inference starts.
+            if control is not None:
+                control.check()
+                control.report(0, 1)
+
+            with span("compose"):
+                width, height = _parse_size(size)
+                call = dict(use_reprompt=self.use_reprompt, use_refiner=self.use_refiner)
+                if inference is not None:
+                    if inference.use_reprompt is not None:
+                        call["use_reprompt"] = inference.use_reprompt
+                    if inference.use_refiner is not None:
+                        call["use_refiner"] = inference.use_refiner
+                    if inference.steps is not None:
+                        call["num_inference_steps"] = inference.steps
+                    if inference.guidance is not None:
+                        call["guidance_scale"] = inference.guidance
+
+            with span("inference"):
+                image = await run_blocking(
+                    self._executor,
+                    self._infer,
+                    prompt=prompt,
+                    negative_prompt=negative_prompt or "",
+                    width=width,
+                    height=height,
+                    seed=seed,
+                    **call,
+                )
+            if control is not None:
+                control.report(1, 1)
+
+            fmt_lower = normalize_format(fmt)
+            filename = f"hunyuan_{abs(hash(prompt)) % 1_000_000}.{fmt_lower}"
+            with span("encode"):
+                # The primary output and any renditions encode in parallel from one image
+                content, derived = await asyncio.gather(
+                    encode_async(image, fmt), derive_renditions(image, renditions or (), filename)
+                )
+
+        return ImageResult(
+            content=content,
+            content_type=content_type(fmt),
+            format=fmt_lower,
+            filename=filename,
+            timings=timings,
+            renditions=derived,
         )
-
-        buffer = io.BytesIO()
-        fmt_upper = fmt.upper()
-        if fmt_upper == "JPG":
-            fmt_upper = "JPEG"
-        image.save(buffer, format=fmt_upper)
-        content = buffer.getvalue()
-
-        fmt_lower = fmt.lower()
-        content_type = f"image/{'jpeg' if fmt_lower == 'jpg' else fmt_lower}"
-        filename = f"hunyuan_{abs(hash(prompt)) % 1_000_000}.{fmt_lower}"
-
-        return ImageResult(content=content, content_type=content_type, format=fmt_lower, filename=filename)
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+"""Process-wide registry of live backend instances.
+
+Local diffusion backends hold multi-GB pipelines, so building a fresh instance per
+request reloads weights every time. The registry keeps one instance per
+(backend name, constructor args) key for the lifetime of the process, and only
+frees weights on explicit unload or idle-timeout eviction. An instance counts as
+idle only once no generation is running on it.
+"""
+
+import asyncio
+import functools
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..executor import run_blocking
+from .base import ImageBackend
+
+logger = logging.getLogger(__name__)
+
+InstanceKey = Tuple[str, Tuple[Tuple[str, Any], ...]]
+
+
+def make_key(name: str, kwargs: Optional[Dict[str, Any]] = None) -> InstanceKey:
+    return name, tuple(sorted((kwargs or {}).items()))
+
+
+@dataclass
+class _Entry:
+    backend: ImageBackend
+    last_used: float = field(default_factory=time.monotonic)
+    in_flight: int = 0
+
+
+class InstanceRegistry:
+    """Thread-safe map of backend instances keyed by name and constructor args."""
+
+    def __init__(self, idle_timeout: float = 0.0):
+        # idle_timeout <= 0 disables eviction
+        self.idle_timeout = idle_timeout
+        self._entries: Dict[InstanceKey, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        name: str,
+        factory: Callable[..., ImageBackend],
+        kwargs: Optional[Dict[str, Any]] = None,
+    ) -> ImageBackend:
+        key = make_key(name, kwargs)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _Entry(backend=factory(**(kwargs or {})))
+                self._track(entry)
+                self._entries[key] = entry
+            entry.last_used = time.monotonic()
+            return entry.backend
+
+    def _track(self, entry: _Entry) -> None:
+        """Count generations running on the instance, so eviction skips it meanwhile."""
+        generate = entry.backend.generate_image
+
+        @functools.wraps(generate)
+        async def tracked(*args: Any, **kwargs: Any) -> Any:
+            with self._lock:
+                entry.in_flight += 1
+            try:
+                return await generate(*args, **kwargs)
+            finally:
+                with self._lock:
+                    entry.in_flight -= 1
+                    entry.last_used = time.monotonic()
+
+        entry.backend.generate_image = tracked  # type: ignore[method-assign]
+
+    def keys(self) -> List[InstanceKey]:
+        with self._lock:
+            return list(self._entries)
+
+    def unload(self, name: Optional[str] = None) -> int:
+        """Unload and forget instances (all of them, or those for ``name``).
+
+        Returns the number of instances removed.
+        """
+        with self._lock:
+            keys = [k for k in self._entries if name is None or k[0] == name]
+            entries = [self._entries.pop(k) for k in keys]
+        for entry in entries:
+            _safe_unload(entry.backend)
+        return len(entries)
+
+    async def evict_idle(self, now: Optional[float] = None) -> int:
+        """Unload instances idle for longer than ``idle_timeout`` seconds.
+
+        Unloading (gc, freeing device memory) runs on the backend's executor.
+        """
+        if self.idle_timeout <= 0:
+            return 0
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            keys = [
+                k
+                for k, e in self._entries.items()
+                if not e.in_flight and now - e.last_used > self.idle_timeout
+            ]
+            entries = [self._entries.pop(k) for k in keys]
+        for key, entry in zip(keys, entries):
+            logger.info("Evicting idle backend %s", key[0])
+            await run_blocking(entry.backend.name, _safe_unload, entry.backend)
+        return len(entries)
+
+    async def run_health_checks(self, interval: float = 30.0) -> None:
+        """Periodically health-check live instances that support it (replica pools)."""
+        if interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(interval)
+            with self._lock:
+                backends = [e.backend for e in self._entries.values()]
+            for backend in backends:
+                # Unwrap caching layers to reach a pool
+                while not hasattr(backend, "check_health") and hasattr(backend, "inner"):
+                    backend = backend.inner  # type: ignore[attr-defined]
+                check = getattr(backend, "check_health", None)
+                if check is None:
+                    continue
+                try:
+                    await check()
+                except Exception:
+                    logger.exception("Health check failed for %s", getattr(backend, "name", "?"))
+
+    async def run_idle_evictor(self, interval: Optional[float] = None) -> None:
+        """Periodically evict idle instances; run as a background task."""
+        if self.idle_timeout <= 0:
+            return
+        interval = interval or max(1.0, self.idle_timeout / 4)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.evict_idle()
+            except Exception:
+                logger.exception("Idle backend eviction failed")
+
+
+def _safe_unload(backend: ImageBackend) -> None:
+    try:
+        backend.unload()
+    except Exception:
+        logger.exception("Failed to unload backend %s", getattr(backend, "name", "?"))
+
+
+_registry: Optional[InstanceRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> InstanceRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                from ..config import get_settings
+
+                _registry = InstanceRegistry(idle_timeout=get_settings().idle_timeout)
+    return _registry
+
+
+async def warm_up(names: Iterable[str]) -> List[ImageBackend]:
+    """Instantiate and load the given backends so the first request is fast."""
+    from . import get_backend
+
+    backends = []
+    for name in names:
+        name = name.strip()
+        if not name:
+            continue
+        backend = get_backend(name)
+        t0 = time.perf_counter()
+        await backend.load()
+        logger.info("Warmed up backend %s in %.2fs", backend.name, time.perf_counter() - t0)
+        backends.append(backend)
+    return backends
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""Shared lifecycle for backends that run a diffusion pipeline in-process.
+
+``LocalPipelineBackend`` owns the pipeline slot: lazy, lock-guarded loading on
+the backend executor, optional compilation and warm-up, residency bookkeeping,
+unloading and the CUDA health probe. Subclasses build the pipeline in
+``_load_pipe_inner`` and run one warm-up generation in ``_warm_up_once``.
+"""
+
+import logging
+import threading
+from typing import Any, Optional
+
+from ..executor import run_blocking
+from ..metrics import span
+from .base import ImageBackend, model_of
+from .compile import compile_pipeline, get_compile_options, record, warm_up
+from .embeddings import get_embedding_cache
+from .residency import get_residency
+
+logger = logging.getLogger(__name__)
+
+
+class LocalPipelineBackend(ImageBackend):
+    def __init__(self, device: Optional[str] = None):
+        # Pin to one device (e.g. "cuda:1"); pinned instances get their own executor
+        self.device = device
+        self._executor = f"{self.name}@{device}" if device else self.name
+        self._pipe: Any = None
+        self._device: Optional[str] = None
+        self._dtype: Any = None
+        self._load_lock = threading.Lock()
+        self._warmed = False
+
+    @property
+    def _residency_key(self) -> str:
+        return f"{self.name}:{model_of(self)}@{self._device}"
+
+    def _ensure_pipe(self) -> None:
+        if self._pipe is not None:
+            return
+        with self._load_lock:
+            if self._pipe is None:
+                self._load_pipe()
+
+    def _load_pipe(self) -> None:
+        with span("load"):
+            self._load_pipe_inner()
+
+    def _load_pipe_inner(self) -> None:
+        """Build the pipeline, place it via the residency manager and set ``_pipe``."""
+        raise NotImplementedError
+
+    def _compile(self, pipe: Any) -> None:
+        options = get_compile_options()
+        if not options.enabled:
+            return
+        with span("compile"):
+            seconds = compile_pipeline(pipe, options)
+        record(self._residency_key, mode=options.mode, compile_seconds=round(seconds, 3))
+
+    def _warm_up_once(self, width: int, height: int, steps: int) -> None:
+        """Run one short generation at the given size."""
+        raise NotImplementedError
+
+    def _warm_up(self) -> None:
+        """Run one short generation per warm-up size so graphs compile before traffic."""
+        with span("warmup"):
+            timings = warm_up(self._warm_up_once, get_compile_options())
+        record(self._residency_key, warmup_seconds=timings)
+        logger.info("Warmed up %s: %s", self._residency_key, timings)
+        self._warmed = True
+
+    async def load(self) -> None:
+        await run_blocking(self._executor, self._ensure_pipe)
+        if get_compile_options().enabled and not self._warmed:
+            await run_blocking(self._executor, self._warm_up)
+
+    def unload(self) -> None:
+        if self._pipe is None:
+            return
+        get_residency().release(self._residency_key)
+        get_embedding_cache().drop(self._residency_key)
+        self._pipe = None
+        self._warmed = False
+        import gc
+
+        gc.collect()
+        if self._device and self._device.startswith("cuda"):
+            import torch  # type: ignore
+
+            torch.cuda.empty_cache()
+
+    async def health(self) -> bool:
+        if self._pipe is None or not (self._device or "").startswith("cuda"):
+            return True
+        import torch  # type: ignore
+
+        try:
+            # Surfaces sticky CUDA errors (e.g. a lost or faulted device)
+            await run_blocking(self._executor, torch.cuda.synchronize, self._device)
+        except Exception:
+            return False
+        return True
@@ -1,18 +1,160 @@
 # -*- coding: utf-8 -*-
 
-import io
+"""Offline mock backend, also usable as a load generator.
+
+By default it draws the prompt onto a seeded background colour. For capacity
+testing of the server, scheduler and caching layers it can imitate a real
+backend (constructor arguments, or the env vars in brackets):
+
+- ``latency`` (``IMAGE_GEN_MOCK_LATENCY``): ``fixed:MS``, ``normal:MEAN,STD`` or
+  ``longtail:MEDIAN[,SIGMA]`` (log-normal); simulated with ``asyncio.sleep``, so
+  thousands of requests can be in flight without threads
+- ``concurrency`` (``IMAGE_GEN_MOCK_CONCURRENCY``): requests served at once,
+  like a GPU running one batch at a time; 0 means unlimited
+- ``failure_rate`` (``IMAGE_GEN_MOCK_FAILURE_RATE``): fraction of requests that
+  fail with ``MockFailure`` after their latency
+- ``memory_mb`` (``IMAGE_GEN_MOCK_MEMORY_MB``): bytes held while loaded, as
+  weights would be
+- ``render`` (``IMAGE_GEN_MOCK_RENDER``): ``text`` (default), ``canvas`` (a
+  small palette of flat canvases per size whose encoded bytes are cached, up to
+  ``CANVAS_CACHE_BYTES``; the fastest) or ``numpy`` (vectorized seeded
+  gradients; needs NumPy, otherwise falls back to ``canvas``)
+"""
+
+import asyncio
+import math
 import os
 import random
-from typing import Optional
-from datetime import datetime
+import threading
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional, Sequence, Tuple
+
 from PIL import Image, ImageDraw, ImageFont
 
-from .base import ImageBackend, ImageResult
+from ..executor import run_blocking
+from ..metrics import span, track_request
+from ..postprocess import content_type, encode_async, encode_image, normalize_format
+from ..progress import current_control
+from .base import ImageBackend, ImageResult, Rendition, derive_renditions
+
+RENDER_MODES = ("text", "canvas", "numpy")
+# Canvas mode picks one of this many background colours per seed
+_PALETTE_SIZE = 16
+# Encoded canvases are kept up to this many bytes; the images themselves are not,
+# so sweeping sizes does not inflate the memory of the process under test
+CANVAS_CACHE_BYTES = 16 * 1024 * 1024
+
+CanvasKey = Tuple[Tuple[int, int], int, str]
+
+
+class MockFailure(RuntimeError):
+    """Injected failure (see ``failure_rate``)."""
+
+
+@dataclass(frozen=True)
+class Latency:
+    """Simulated service time distribution, in milliseconds."""
+
+    kind: str = "fixed"
+    mean: float = 0.0
+    spread: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: Optional[str]) -> "Latency":
+        """Accept ``"50"``, ``"fixed:50"``, ``"normal:50,10"`` or ``"longtail:50[,1.0]"``."""
+        if not spec:
+            return cls()
+        kind, _, args = spec.partition(":")
+        if not args:
+            kind, args = "fixed", kind
+        try:
+            values = [float(v) for v in args.split(",")]
+        except ValueError:
+            raise ValueError(f"Invalid mock latency: {spec!r}") from None
+        if kind == "fixed" and len(values) == 1:
+            return cls("fixed", values[0])
+        if kind == "normal" and len(values) == 2:
+            return cls("normal", values[0], values[1])
+        if kind == "longtail" and len(values) in (1, 2):
+            return cls("longtail", values[0], values[1] if len(values) == 2 else 1.0)
+        raise ValueError(f"Invalid mock latency: {spec!r}")
+
+    def sample(self, rng: random.Random) -> float:
+        """One service time in seconds."""
+        if self.kind == "normal":
+            ms = rng.gauss(self.mean, self.spread)
+        elif self.kind == "longtail":
+            ms = self.mean * math.exp(rng.gauss(0.0, self.spread)) if self.mean > 0 else 0.0
+        else:
+            ms = self.mean
+        return max(0.0, ms) / 1000.0
 
 
 class MockBackend(ImageBackend):
     name = "mock"
 
+    def __init__(
+        self,
+        latency: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        failure_rate: Optional[float] = None,
+        memory_mb: Optional[float] = None,
+        render: Optional[str] = None,
+    ):
+        self.latency = Latency.parse(latency if latency is not None else os.getenv("IMAGE_GEN_MOCK_LATENCY"))
+        if concurrency is None:
+            concurrency = int(os.getenv("IMAGE_GEN_MOCK_CONCURRENCY", "0"))
+        self.concurrency = concurrency
+        if failure_rate is None:
+            failure_rate = float(os.getenv("IMAGE_GEN_MOCK_FAILURE_RATE", "0"))
+        self.failure_rate = failure_rate
+        if memory_mb is None:
+            memory_mb = float(os.getenv("IMAGE_GEN_MOCK_MEMORY_MB", "0"))
+        self.memory_bytes = int(memory_mb * 1024 * 1024)
+        render = (render or os.getenv("IMAGE_GEN_MOCK_RENDER", "text")).lower()
+        if render not in RENDER_MODES:
+            raise ValueError(f"Unknown mock render mode {render!r} (expected one of {', '.join(RENDER_MODES)})")
+        if render == "numpy" and not _has_numpy():
+            render = "canvas"
+        self.render = render
+        self._weights: Optional[bytearray] = None
+        self._rng = random.Random()
+        # Semaphores are bound to the loop they are first used on
+        self._slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    async def load(self) -> None:
+        if self.memory_bytes and self._weights is None:
+            # bytearray() zero-fills, so the pages are really committed
+            self._weights = bytearray(self.memory_bytes)
+
+    def unload(self) -> None:
+        self._weights = None
+
+    @property
+    def resident_bytes(self) -> int:
+        return len(self._weights) if self._weights is not None else 0
+
+    def _slot(self) -> Optional[asyncio.Semaphore]:
+        if self.concurrency <= 0:
+            return None
+        loop = asyncio.get_running_loop()
+        slot = self._slots.get(loop)
+        if slot is None:
+            slot = self._slots[loop] = asyncio.Semaphore(self.concurrency)
+        return slot
+
+    async def _simulate(self) -> None:
+        await self.load()
+        delay = self.latency.sample(self._rng)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.failure_rate > 0 and self._rng.random() < self.failure_rate:
+            raise MockFailure("Injected mock failure")
+
     async def generate_image(
         self,
         prompt: str,
@@ -20,44 +162,146 @@ class MockBackend(ImageBackend):
         fmt: str = "png",
         seed: Optional[int] = None,
         negative_prompt: Optional[str] = None,
+        profile: Optional[str] = None,
+        renditions: Optional[Sequence[Rendition]] = None,
     ) -> ImageResult:
-        w, h = _parse_size(size)
-        rng = random.Random(seed)
-        bg_color = (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255))
+        ext = normalize_format(fmt)
+        filename = f"mock_{abs(hash(prompt)) % 1_000_000}.{ext}"
+        control = current_control()
+        with track_request(self.name) as timings:
+            if control is not None:
+                control.check()
+            with span("inference"):
+                slot = self._slot()
+                if slot is None:
+                    await self._simulate()
+                else:
+                    async with slot:
+                        await self._simulate()
+                size_wh = _parse_size(size)
+                canvas: CanvasKey = (size_wh, _palette_index(seed), ext)
+                if self.render == "text":
+                    image = await run_blocking(self.name, _render_text, prompt, size_wh, seed)
+                elif self.render == "numpy":
+                    image = await run_blocking(self.name, _render_gradient, size_wh, seed)
+                elif renditions:
+                    image = await run_blocking(self.name, _canvas, size_wh, canvas[1])
+                else:
+                    image = None  # the cached encoded canvas is all that is needed
+            if control is not None:
+                control.report(1, 1)
+            with span("encode"):
+                if self.render == "canvas":
+                    primary = self._canvas_bytes(canvas)
+                else:
+                    primary = encode_async(image, fmt)
+                content, derived = await asyncio.gather(primary, derive_renditions(image, renditions or (), filename))
+        return ImageResult(
+            content=content,
+            content_type=content_type(fmt),
+            format=fmt.lower(),
+            filename=filename,
+            timings=timings,
+            renditions=derived,
+        )
 
-        img = Image.new("RGB", (w, h), bg_color)
-        draw = ImageDraw.Draw(img)
 
-        # Try to load a default font
-        try:
-            font = ImageFont.load_default()
-        except Exception:
-            font = None
-
-        lines = [
-            "Mock Backend",
-            prompt[:60] + ("..." if len(prompt) > 60 else ""),
-            datetime.utcnow().isoformat(timespec="seconds") + "Z",
-        ]
-
-        y = 10
-        for line in lines:
-            draw.text((10, y), line, fill=(255, 255, 255), font=font, stroke_width=2, stroke_fill=(0, 0, 0))
-            y += 20
-
-        out = io.BytesIO()
-        fmt_upper = fmt.upper()
-        if fmt_upper == "JPG":
-            fmt_upper = "JPEG"
-        img.save(out, format=fmt_upper)
-        content = out.getvalue()
-        ext = fmt.lower() if fmt.lower() != "jpeg" else "jpg"
-        filename = f"mock_{abs(hash(prompt)) % 1_000_000}.{ext}"
-        content_type = f"image/{'jpeg' if fmt_lower(fmt)=='jpg' else fmt.lower()}"
-        return ImageResult(content=content, content_type=content_type, format=fmt.lower(), filename=filename)
+    async def _canvas_bytes(self, key: CanvasKey) -> bytes:
+        data = _canvas_cache_get(key)
+        if data is None:
+            data = await run_blocking(self.name, _encode_canvas, key)
+        return data
 
 
-def _parse_size(size: str) -> tuple[int, int]:
+def _has_numpy() -> bool:
+    try:
+        import numpy  # type: ignore  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _seed_color(seed: Optional[int]) -> Tuple[int, int, int]:
+    rng = random.Random(seed)
+    return rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)
+
+
+def _palette_index(seed: Optional[int]) -> int:
+    return random.Random(seed).randrange(_PALETTE_SIZE)
+
+
+def _render_text(prompt: str, size: Tuple[int, int], seed: Optional[int]) -> Any:
+    img = Image.new("RGB", size, _seed_color(seed))
+    draw = ImageDraw.Draw(img)
+
+    # Try to load a default font
+    try:
+        font = ImageFont.load_default()
+    except Exception:
+        font = None
+
+    lines = [
+        "Mock Backend",
+        prompt[:60] + ("..." if len(prompt) > 60 else ""),
+        f"seed {seed}" if seed is not None else "unseeded",
+    ]
+
+    y = 10
+    for line in lines:
+        draw.text((10, y), line, fill=(255, 255, 255), font=font, stroke_width=2, stroke_fill=(0, 0, 0))
+        y += 20
+    return img
+
+
+def _render_gradient(size: Tuple[int, int], seed: Optional[int]) -> Any:
+    import numpy as np  # type: ignore
+
+    w, h = size
+    start = np.array(_seed_color(seed), dtype=np.float32)
+    end = 255.0 - start
+    ramp = np.linspace(0.0, 1.0, w, dtype=np.float32)[:, None]
+    row = (start + (end - start) * ramp).astype(np.uint8)
+    return Image.fromarray(np.ascontiguousarray(np.broadcast_to(row, (h, w, 3))), "RGB")
+
+
+def _canvas(size: Tuple[int, int], index: int) -> Any:
+    color = _seed_color(index)
+    img = Image.new("RGB", size, color)
+    ImageDraw.Draw(img).text((10, 10), "Mock Backend", fill=(255, 255, 255))
+    return img
+
+
+_canvas_cache: "OrderedDict[CanvasKey, bytes]" = OrderedDict()
+_canvas_cache_bytes = 0
+_canvas_cache_lock = threading.Lock()
+
+
+def _canvas_cache_get(key: CanvasKey) -> Optional[bytes]:
+    with _canvas_cache_lock:
+        data = _canvas_cache.get(key)
+        if data is not None:
+            _canvas_cache.move_to_end(key)
+        return data
+
+
+def _encode_canvas(key: CanvasKey) -> bytes:
+    """Render and encode a canvas, keeping the bytes in the LRU cache."""
+    global _canvas_cache_bytes
+    size, index, fmt = key
+    data = encode_image(_canvas(size, index), fmt)
+    if len(data) > CANVAS_CACHE_BYTES:
+        return data
+    with _canvas_cache_lock:
+        old = _canvas_cache.pop(key, None)
+        _canvas_cache_bytes += len(data) - (len(old) if old is not None else 0)
+        _canvas_cache[key] = data
+        while _canvas_cache_bytes > CANVAS_CACHE_BYTES:
+            _, evicted = _canvas_cache.popitem(last=False)
+            _canvas_cache_bytes -= len(evicted)
+    return data
+
+
+def _parse_size(size: str) -> Tuple[int, int]:
     try:
         w_s, h_s = size.lower().split("x", 1)
         w, h = int(w_s), int(h_s)
@@ -66,8 +310,3 @@ def _parse_size(size: str) -> tuple[int, int]:
         return w, h
     except Exception:
         return 1024, 1024
-
-
-def fmt_lower(fmt: str) -> str:
-    f = fmt.lower()
-    return "jpg" if f == "jpeg" else f
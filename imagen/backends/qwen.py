@@ -1,12 +1,20 @@
 # -*- coding: utf-8 -*-
 
+import asyncio
 import io
-from typing import Optional, Tuple
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-import torch  # type: ignore
-from diffusers import DiffusionPipeline  # type: ignore
-
-from .base import ImageBackend, ImageResult
+from ..batching import MicroBatcher
+from ..executor import run_blocking
+from ..metrics import span, track_request
+from ..postprocess import content_type, encode_async, normalize_format
+from ..profiles import InferenceProfile, get_profile
+from ..progress import GenerationCancelled, GenerationControl, current_control
+from .base import ImageResult, Rendition, derive_renditions
+from .embeddings import get_embedding_cache, stack_padded, supports_embeds
+from .local import LocalPipelineBackend
+from .residency import get_residency
 
 
 def _parse_size(size: str) -> Tuple[int, int]:
@@ -20,11 +28,52 @@ def _parse_size(size: str) -> Tuple[int, int]:
         return 1024, 1024
 
 
-def _select_device() -> tuple[str, torch.dtype]:
+POSITIVE_MAGIC = {
+    "en": ", Ultra HD, 4K, cinematic composition.", # for english prompt
+    "zh": ", 超清，4K，电影级构图." # for chinese prompt
+}
+
+# Used when a profile leaves steps/guidance unset
+DEFAULT_STEPS = 50
+DEFAULT_CFG = 4.0
+
+# (width, height, num_inference_steps, true_cfg_scale, scheduler)
+BatchKey = Tuple[int, int, int, float, Optional[str]]
+# (prompt, negative_prompt, seed, control)
+BatchItem = Tuple[str, str, Optional[int], GenerationControl]
+
+
+def _latent_preview(latents: Any, index: int, width: int, height: int) -> Optional[bytes]:
+    """Cheap RGB preview from packed Qwen latents, without running the VAE.
+
+    Latents are packed as (batch, (h/16)*(w/16), 16*2*2); the first three latent
+    channels, averaged over each 2x2 patch, give a rough 1/16-scale thumbnail.
+    """
+    try:
+        from PIL import Image  # type: ignore
+
+        h, w = height // 16, width // 16
+        x = latents[index].float().reshape(h, w, 16, 2, 2)[:, :, :3].mean(dim=(3, 4))
+        x = (x - x.min()) / (x.max() - x.min() + 1e-6)
+        pixels = (x * 255).byte().cpu().numpy()
+        buf = io.BytesIO()
+        Image.fromarray(pixels, "RGB").save(buf, format="PNG")
+        return buf.getvalue()
+    except Exception:
+        return None
+
+
+def _select_device(device: Optional[str] = None) -> Tuple[str, Any]:
     """Select the best available torch device and dtype.
 
-    Prefers CUDA, then MPS, then CPU. Uses float16 for GPU/MPS, float32 for CPU.
+    Prefers CUDA, then MPS, then CPU, unless ``device`` (e.g. "cuda:1") is given.
+    Uses float16 for GPU/MPS, float32 for CPU.
     """
+    import torch  # type: ignore
+
+    if device:
+        gpu = device.split(":", 1)[0] in ("cuda", "mps")
+        return device, torch.float16 if gpu else torch.float32
     if torch.cuda.is_available():
         return "cuda", torch.float16
     # mps may exist on macOS
@@ -33,36 +82,64 @@ def _select_device() -> tuple[str, torch.dtype]:
     return "cpu", torch.float32
 
 
-class QwenImageBackend(ImageBackend):
+class QwenImageBackend(LocalPipelineBackend):
     """Text-to-image using Qwen/Qwen-Image via diffusers.
 
-    This backend loads the Hugging Face diffusers pipeline lazily on first use.
-    It attempts to use CUDA or MPS if available, otherwise CPU.
+    This backend loads the Hugging Face diffusers pipeline lazily on first use;
+    torch and diffusers are only imported at that point, so importing this module
+    (or listing backends) stays cheap.
+    It attempts to use CUDA or MPS if available, otherwise CPU; the residency
+    manager (``imagen.backends.residency``) decides whether the weights fit on the
+    device or need CPU offload.
+
+    Steps, cfg and scheduler come from the request's inference profile
+    (``imagen.profiles``). Concurrent requests with the same size and profile
+    settings are micro-batched into one pipeline call. Tune with
+    ``max_batch_size``/``batch_window_ms`` or the env vars
+    ``QWEN_MAX_BATCH_SIZE`` (default 4; 1 disables batching) and
+    ``QWEN_BATCH_WINDOW_MS`` (default 20).
+
+    Pass ``device`` (e.g. "cuda:1") to pin the pipeline to one device; each pinned
+    instance gets its own executor so replicas on different GPUs run in parallel.
     """
 
     name = "qwen"
 
-    def __init__(self, model_id: str = "Qwen/Qwen-Image"):
+    def __init__(
+        self,
+        model_id: str = "Qwen/Qwen-Image",
+        max_batch_size: Optional[int] = None,
+        batch_window_ms: Optional[float] = None,
+        device: Optional[str] = None,
+    ):
+        super().__init__(device)
         self.model_id = model_id
-        self._pipe = None
-        self._device = None
-        self._dtype = None
-
-    def _ensure_pipe(self):
-        if self._pipe is not None:
-            return
-        device, dtype = _select_device()
+        # Scheduler loaded with the pipeline, and alternatives built from its config
+        self._schedulers: Dict[Optional[str], Any] = {}
+        if max_batch_size is None:
+            max_batch_size = int(os.getenv("QWEN_MAX_BATCH_SIZE", "4"))
+        if batch_window_ms is None:
+            batch_window_ms = float(os.getenv("QWEN_BATCH_WINDOW_MS", "20"))
+        self._batcher: MicroBatcher[BatchKey, BatchItem, object] = MicroBatcher(
+            self._run_batch, max_batch_size=max_batch_size, window=batch_window_ms / 1000.0
+        )
+
+    def _load_pipe_inner(self):
+        device, dtype = _select_device(self.device)
         self._device, self._dtype = device, dtype
 
         # Load pipeline; prefer fp16 on GPU/MPS. Keep CPU in fp32.
         kwargs = {"use_safetensors": True}
-        if self._device in {"cuda", "mps"}:
+        if self._device.split(":", 1)[0] in {"cuda", "mps"}:
             kwargs["torch_dtype"] = dtype
 
+        from diffusers import DiffusionPipeline  # type: ignore
+
         pipe = DiffusionPipeline.from_pretrained(self.model_id, **kwargs)
 
-        # Move to device and enable common memory optimizations
-        pipe = pipe.to(self._device)
+        # Move to the device, or offload if it does not fit; then enable common
+        # memory optimizations
+        get_residency().place(self._residency_key, pipe, self._device, self.unload, executor=self._executor)
         if hasattr(pipe, "enable_attention_slicing"):
             pipe.enable_attention_slicing()
         if hasattr(pipe, "enable_xformers_memory_efficient_attention"):
@@ -70,9 +147,121 @@ class QwenImageBackend(ImageBackend):
                 pipe.enable_xformers_memory_efficient_attention()
             except Exception:
                 pass
+        self._compile(pipe)
 
         self._pipe = pipe
 
+    def _warm_up_once(self, width: int, height: int, steps: int) -> None:
+        self._infer_batch((width, height, steps, DEFAULT_CFG, None), [("warm-up", " ", 0, GenerationControl())])
+
+    def unload(self) -> None:
+        # Alternative schedulers reference the pipeline's config; drop them first
+        self._schedulers.clear()
+        super().unload()
+
+    async def _run_batch(self, key: BatchKey, items: List[BatchItem]) -> List[object]:
+        # Run pipeline on the backend executor so the event loop stays responsive
+        return await run_blocking(self._executor, self._infer_batch, key, items)
+
+    def _use_scheduler(self, name: Optional[str]) -> None:
+        """Swap the pipeline scheduler; batches run one at a time on the executor."""
+        if None not in self._schedulers:
+            self._schedulers[None] = self._pipe.scheduler
+        scheduler = self._schedulers.get(name)
+        if scheduler is None:
+            import diffusers  # type: ignore
+
+            cls = getattr(diffusers, name, None)
+            if cls is None:
+                raise ValueError(f"Unknown diffusers scheduler {name!r}")
+            scheduler = cls.from_config(self._schedulers[None].config)
+            self._schedulers[name] = scheduler
+        self._pipe.scheduler = scheduler
+
+    def _encode(self, texts: List[str]) -> List[Tuple[Any, Any]]:
+        """Per-text (embeds, mask), trimmed to each text's length."""
+        import torch  # type: ignore
+
+        device = getattr(self._pipe, "_execution_device", self._device)
+        embeds, mask = self._pipe.encode_prompt(texts, device=device)
+        if mask is None:
+            mask = embeds.new_ones(embeds.shape[:2], dtype=torch.long)
+        encoded = []
+        for i in range(len(texts)):
+            n = int(mask[i].sum())
+            # Clone so the cache does not keep the whole padded batch alive
+            encoded.append((embeds[i : i + 1, :n].clone(), mask[i : i + 1, :n].clone()))
+        return encoded
+
+    def _text_inputs(self, prompts: List[str], negatives: List[str], use_negative: bool) -> Dict[str, Any]:
+        """Prompt arguments for the pipeline, from cached text embeddings when supported.
+
+        Each distinct text is encoded once per model; a batch stacks the cached
+        per-text embeddings, padded to the longest.
+        """
+        if not supports_embeds(self._pipe):
+            return {"prompt": prompts, "negative_prompt": negatives}
+        cache = get_embedding_cache()
+        # Without true CFG the pipeline ignores the negative prompt
+        texts = prompts + negatives if use_negative else prompts
+        encoded = cache.encode(self._residency_key, texts, self._encode)
+        positive = encoded[: len(prompts)]
+        call = {
+            "prompt_embeds": stack_padded([e for e, _ in positive]),
+            "prompt_embeds_mask": stack_padded([m for _, m in positive]),
+        }
+        if use_negative:
+            negative = encoded[len(prompts) :]
+            call["negative_prompt_embeds"] = stack_padded([e for e, _ in negative])
+            call["negative_prompt_embeds_mask"] = stack_padded([m for _, m in negative])
+        return call
+
+    def _infer_batch(self, key: BatchKey, items: List[BatchItem]) -> List[object]:
+        import torch  # type: ignore
+
+        width, height, steps, cfg, scheduler = key
+        self._use_scheduler(scheduler)
+        controls = [c for _, _, _, c in items]
+        # For CUDA we can use a CUDA generator; for MPS, CPU generator is typically safer
+        gen_device = self._device if (self._device or "").startswith("cuda") else "cpu"
+        generators = []
+        for _, _, seed, _ in items:
+            generator = torch.Generator(device=gen_device)
+            if seed is not None:
+                generator.manual_seed(seed)
+            else:
+                generator.seed()
+            generators.append(generator)
+
+        def on_step_end(pipe, step, timestep, callback_kwargs):
+            done = step + 1
+            latents = callback_kwargs.get("latents")
+            for i, control in enumerate(controls):
+                preview = None
+                if latents is not None and control.wants_preview(done, steps):
+                    preview = _latent_preview(latents, i, width, height)
+                control.report(done, steps, preview)
+            # The batch is shared: only stop once every request in it is cancelled
+            if all(c.cancelled for c in controls):
+                pipe._interrupt = True
+            return callback_kwargs
+
+        with get_residency().use(self._residency_key):
+            text = self._text_inputs([p for p, _, _, _ in items], [n for _, n, _, _ in items], cfg > 1)
+            out = self._pipe(
+                **text,
+                width=width,
+                height=height,
+                num_inference_steps=steps,
+                true_cfg_scale=cfg,
+                generator=generators,
+                callback_on_step_end=on_step_end,
+                callback_on_step_end_tensor_inputs=["latents"],
+            )
+        if all(c.cancelled for c in controls):
+            raise GenerationCancelled("Generation was cancelled")
+        return list(out.images)
+
     async def generate_image(
         self,
         prompt: str,
@@ -80,49 +269,53 @@ class QwenImageBackend(ImageBackend):
         fmt: str = "png",
         seed: Optional[int] = None,
         negative_prompt: Optional[str] = None,
+        profile: Optional[str] = None,
+        renditions: Optional[Sequence[Rendition]] = None,
     ) -> ImageResult:
-        self._ensure_pipe()
-        assert self._pipe is not None
+        # Profiles defined only for other backends fall back to the defaults
+        inference = get_profile(self.name, profile) or InferenceProfile("default")
+        control = current_control() or GenerationControl()
+        with track_request(self.name) as timings:
+            await run_blocking(self._executor, self._ensure_pipe)
+            assert self._pipe is not None
+            control.check()
 
-        import torch  # type: ignore
+            with span("compose"):
+                width, height = _parse_size(size)
+                key: BatchKey = (
+                    width,
+                    height,
+                    inference.steps or DEFAULT_STEPS,
+                    inference.guidance if inference.guidance is not None else DEFAULT_CFG,
+                    inference.scheduler,
+                )
+                item: BatchItem = (
+                    prompt + POSITIVE_MAGIC["en"],
+                    " " if not negative_prompt else negative_prompt,
+                    seed,
+                    control,
+                )
+            with span("inference"):
+                try:
+                    image = await self._batcher.submit(key, item)
+                except asyncio.CancelledError:
+                    # Let the worker thread stop between steps instead of finishing
+                    control.cancel()
+                    raise
 
-        width, height = _parse_size(size)
+            fmt_lower = normalize_format(fmt)
+            filename = f"qwen_{abs(hash(prompt)) % 1_000_000}.{fmt_lower}"
+            with span("encode"):
+                # The primary output and any renditions encode in parallel from one image
+                content, derived = await asyncio.gather(
+                    encode_async(image, fmt), derive_renditions(image, renditions or (), filename)
+                )
 
-        # For CUDA we can use a CUDA generator; for MPS, CPU generator is typically safer
-        generator = None
-        if seed is not None:
-            gen_device = "cuda" if self._device == "cuda" else "cpu"
-            generator = torch.Generator(device=gen_device).manual_seed(seed)
-
-        positive_magic = {
-            "en": ", Ultra HD, 4K, cinematic composition.", # for english prompt
-            "zh": ", 超清，4K，电影级构图." # for chinese prompt
-        }
-
-        # Run pipeline
-        out = self._pipe(
-            prompt=prompt + positive_magic["en"],
-            negative_prompt=" " if not negative_prompt else negative_prompt,
-            width=width,
-            height=height,
-            num_inference_steps=50,
-            true_cfg_scale=4.0,
-            generator=generator,
+        return ImageResult(
+            content=content,
+            content_type=content_type(fmt),
+            format=fmt_lower,
+            filename=filename,
+            timings=timings,
+            renditions=derived,
         )
-
-        image = out.images[0]
-        
-        image.save("test.png")
-        
-        buffer = io.BytesIO()
-        fmt_upper = fmt.upper()
-        if fmt_upper == "JPG":
-            fmt_upper = "JPEG"
-        image.save(buffer, format=fmt_upper)
-        content = buffer.getvalue()
-
-        fmt_lower = fmt.lower()
-        content_type = f"image/{'jpeg' if fmt_lower == 'jpg' else fmt_lower}"
-        filename = f"qwen_{abs(hash(prompt)) % 1_000_000}.{fmt_lower}"
-
-        return ImageResult(content=content, content_type=content_type, format=fmt_lower, filename=filename)
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+
+"""Backend discovery: built-in specs, entry-point plugins and "auto" routing.
+
+Third-party packages register backends under the ``imagen.backends`` entry-point
+group, e.g. in ``pyproject.toml``::
+
+    [project.entry-points."imagen.backends"]
+    fastengine = "fastengine.imagen:FastEngineBackend"
+
+The target may be a ``BackendSpec`` or an ``ImageBackend`` subclass, in which
+case its ``name`` and ``capabilities`` class attributes describe it.
+"""
+
+import functools
+import importlib
+import importlib.metadata
+import importlib.util
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from ..profiles import profile_names
+from .base import Capabilities, ImageBackend
+
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "imagen.backends"
+
+
+@dataclass
+class BackendSpec:
+    """How to build a backend and what it can do.
+
+    ``factory`` is a ``"module:Class"`` path (imported lazily) or a callable.
+    ``options`` returns constructor kwargs at build time (e.g. API keys from
+    settings). ``requires`` lists modules probed with ``find_spec`` for
+    availability. Backends with ``auto=False`` are only chosen by "auto" as a
+    last resort. ``variant_arg`` names the constructor kwarg that receives an
+    inference profile's ``model_variant``.
+    """
+
+    name: str
+    factory: Union[str, Callable[..., ImageBackend]]
+    capabilities: Capabilities = field(default_factory=Capabilities)
+    aliases: Tuple[str, ...] = ()
+    requires: Tuple[str, ...] = ()
+    options: Optional[Callable[[], Dict[str, Any]]] = None
+    check: Optional[Callable[[], Optional[str]]] = None
+    auto: bool = True
+    variant_arg: Optional[str] = None
+
+    def build(self, **kwargs: Any) -> ImageBackend:
+        factory = self.factory
+        if isinstance(factory, str):
+            module, _, attr = factory.partition(":")
+            factory = getattr(importlib.import_module(module), attr)
+        return factory(**kwargs)
+
+    def kwargs(self) -> Dict[str, Any]:
+        return self.options() if self.options else {}
+
+    def unavailable_reason(self, probe_devices: bool = True) -> Optional[str]:
+        """None if the backend can run here, else a short reason.
+
+        ``probe_devices=False`` skips the GPU check, which has to import torch.
+        """
+        missing = [m for m in self.requires if not _has_module(m)]
+        if missing:
+            return "missing modules: " + ", ".join(missing)
+        if probe_devices and self.capabilities.device == "gpu" and not _gpu_available():
+            return "no CUDA/MPS device"
+        if self.check is not None:
+            return self.check()
+        return None
+
+
+def _has_module(name: str) -> bool:
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+@functools.lru_cache(maxsize=None)
+def _gpu_available() -> bool:
+    # Only reached for GPU backends whose deps are installed, so importing torch is fine
+    try:
+        import torch  # type: ignore
+    except Exception:
+        return False
+    if torch.cuda.is_available():
+        return True
+    mps = getattr(torch.backends, "mps", None)
+    return bool(mps and mps.is_available())
+
+
+def _gemini_options() -> Dict[str, Any]:
+    from ..config import get_settings
+
+    return {"api_key": get_settings().gemini_api_key}
+
+
+def _gemini_check() -> Optional[str]:
+    import os
+
+    from ..config import get_settings
+
+    if get_settings().gemini_api_key or os.getenv("GOOGLE_API_KEY"):
+        return None
+    return "GEMINI_API_KEY not set"
+
+
+BUILTIN_SPECS = [
+    BackendSpec(
+        name="mock",
+        factory="imagen.backends.mock:MockBackend",
+        capabilities=Capabilities(device="cpu", latency_class="realtime"),
+        requires=("PIL",),
+        auto=False,
+    ),
+    BackendSpec(
+        name="gemini",
+        factory="imagen.backends.gemini:GeminiBackend",
+        aliases=("google", "imagen"),
+        capabilities=Capabilities(device="remote", latency_class="standard"),
+        requires=("google.genai", "PIL"),
+        options=_gemini_options,
+        check=_gemini_check,
+    ),
+    BackendSpec(
+        name="qwen",
+        factory="imagen.backends.qwen:QwenImageBackend",
+        aliases=("qwen-image", "qwen_image"),
+        capabilities=Capabilities(batching=True, device="gpu", latency_class="slow"),
+        requires=("torch", "diffusers"),
+        variant_arg="model_id",
+    ),
+    BackendSpec(
+        name="hunyuan",
+        factory="imagen.backends.hunyuan:HunyuanBackend",
+        aliases=("hunyuanimage", "hunyuan-image"),
+        capabilities=Capabilities(device="gpu", latency_class="slow"),
+        requires=("torch", "hyimage"),
+        variant_arg="model_name",
+    ),
+]
+
+
+class BackendRegistry:
+    """Name/alias lookup over backend specs plus capability-based routing."""
+
+    def __init__(self, specs: Optional[List[BackendSpec]] = None, load_entry_points: bool = True):
+        self._specs: Dict[str, BackendSpec] = {}
+        self._aliases: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._entry_points_loaded = not load_entry_points
+        for spec in specs or []:
+            self.register(spec)
+
+    def register(self, spec: BackendSpec, replace: bool = False) -> None:
+        name = spec.name.lower()
+        with self._lock:
+            if name in self._specs and not replace:
+                raise ValueError(f"Backend {name!r} is already registered")
+            self._specs[name] = spec
+            for alias in (name, *spec.aliases):
+                self._aliases[alias.lower()] = name
+
+    def _load_entry_points(self) -> None:
+        if self._entry_points_loaded:
+            return
+        self._entry_points_loaded = True
+        for ep in importlib.metadata.entry_points(group=ENTRY_POINT_GROUP):
+            try:
+                target = ep.load()
+                if isinstance(target, BackendSpec):
+                    spec = target
+                elif isinstance(target, type) and issubclass(target, ImageBackend):
+                    # Only a name the plugin class sets itself; inherited ones ("base",
+                    # or the backend it extends) would shadow that backend
+                    name = vars(target).get("name") or ep.name
+                    spec = BackendSpec(name=name, factory=target, capabilities=target.capabilities)
+                else:
+                    raise TypeError(f"expected BackendSpec or ImageBackend subclass, got {target!r}")
+                self.register(spec)
+            except Exception:
+                logger.exception("Failed to load backend plugin %r", ep.name)
+
+    def specs(self) -> List[BackendSpec]:
+        self._load_entry_points()
+        with self._lock:
+            return list(self._specs.values())
+
+    def lookup(self, name: str) -> BackendSpec:
+        self._load_entry_points()
+        with self._lock:
+            canonical = self._aliases.get(name.lower())
+            if canonical is None:
+                known = ", ".join(sorted(self._specs))
+                raise ValueError(f"Unknown backend {name!r} (known: {known}, auto)")
+            return self._specs[canonical]
+
+    def route(self, size: Optional[str] = None, fmt: Optional[str] = None) -> BackendSpec:
+        """Pick the fastest available backend that supports ``size`` and ``fmt``."""
+        candidates = [
+            s for s in self.specs() if s.capabilities.supports(size, fmt) and s.unavailable_reason() is None
+        ]
+        preferred = [s for s in candidates if s.auto] or candidates
+        if not preferred:
+            raise RuntimeError(f"No available backend supports size={size!r} fmt={fmt!r}")
+        # min() keeps registration order among equally fast backends
+        return min(preferred, key=lambda s: s.capabilities.latency_rank)
+
+    def describe(self, probe_devices: bool = False) -> Dict[str, Dict[str, Any]]:
+        report: Dict[str, Dict[str, Any]] = {}
+        for spec in self.specs():
+            reason = spec.unavailable_reason(probe_devices=probe_devices)
+            caps = spec.capabilities
+            report[spec.name] = {
+                "available": reason is None,
+                "reason": reason,
+                "aliases": list(spec.aliases),
+                "formats": list(caps.formats),
+                "max_size": caps.max_size,
+                "batching": caps.batching,
+                "device": caps.device,
+                "latency_class": caps.latency_class,
+                "profiles": profile_names(spec.name),
+            }
+        return report
+
+
+_backends: Optional[BackendRegistry] = None
+_backends_lock = threading.Lock()
+
+
+def get_backend_registry() -> BackendRegistry:
+    global _backends
+    if _backends is None:
+        with _backends_lock:
+            if _backends is None:
+                _backends = BackendRegistry(BUILTIN_SPECS)
+    return _backends
+
+
+def register_backend(spec: BackendSpec, replace: bool = False) -> None:
+    """Register a backend programmatically (alternative to entry points)."""
+    get_backend_registry().register(spec, replace=replace)
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+"""Replica pool: one backend instance per device, least-loaded dispatch.
+
+On a multi-GPU node each device gets its own pipeline replica (and executor), and
+requests go to the healthy replica with the fewest requests in flight. Replicas
+that fail repeatedly or fail a health check are restarted (unloaded and rebuilt)
+once their in-flight requests have finished; meanwhile new requests go elsewhere.
+Only backend faults count as failures; cancelled, rejected and invalid requests
+do not.
+
+Any ``ImageBackend`` factory works, so the pool can be exercised on CPU-only
+machines with the mock backend or "cpu" pseudo-devices.
+"""
+
+import asyncio
+import itertools
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from ..admission import AdmissionError
+from ..progress import GenerationCancelled
+from .base import ImageBackend, ImageResult, model_of
+
+logger = logging.getLogger(__name__)
+
+# Failures caused by the request rather than the replica: cancellation, admission
+# and deadline rejections, and invalid arguments (bad size, unknown scheduler)
+_REQUEST_ERRORS = (GenerationCancelled, AdmissionError, ValueError)
+
+
+@dataclass
+class Replica:
+    device: str
+    backend: ImageBackend
+    in_flight: int = 0
+    served: int = 0
+    consecutive_failures: int = 0
+    restarts: int = 0
+
+
+class ReplicaPool(ImageBackend):
+    def __init__(
+        self,
+        factory: Callable[[str], ImageBackend],
+        devices: Sequence[str],
+        max_failures: int = 3,
+    ):
+        if not devices:
+            raise ValueError("ReplicaPool needs at least one device")
+        self.factory = factory
+        self.max_failures = max(1, max_failures)
+        self.replicas: List[Replica] = [Replica(device=d, backend=factory(d)) for d in devices]
+        first = self.replicas[0].backend
+        self.name = first.name
+        self.capabilities = first.capabilities
+        self._tiebreak = itertools.count()
+
+    @property
+    def model_id(self) -> Optional[str]:
+        # Every replica is built by the same factory, so they serve the same model
+        return model_of(self.replicas[0].backend)
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(getattr(r.backend, "resident_bytes", 0) for r in self.replicas)
+
+    def _pick(self) -> Replica:
+        # Least in-flight first; rotate among ties so idle replicas share the load
+        offset = next(self._tiebreak)
+        n = len(self.replicas)
+        order = [self.replicas[(offset + i) % n] for i in range(n)]
+        # Replicas waiting to restart drain first, unless every replica is
+        return min(order, key=lambda r: (self._draining(r), r.in_flight))
+
+    def _draining(self, replica: Replica) -> bool:
+        return replica.consecutive_failures >= self.max_failures
+
+    def restart(self, replica: Replica) -> None:
+        logger.warning("Restarting %s replica on %s", self.name, replica.device)
+        try:
+            replica.backend.unload()
+        except Exception:
+            logger.exception("Error unloading %s replica on %s", self.name, replica.device)
+        replica.backend = self.factory(replica.device)
+        replica.consecutive_failures = 0
+        replica.restarts += 1
+
+    async def generate_image(
+        self,
+        prompt: str,
+        size: str = "1024x1024",
+        fmt: str = "png",
+        seed: Optional[int] = None,
+        negative_prompt: Optional[str] = None,
+        **kwargs: Any,
+    ) -> ImageResult:
+        replica = self._pick()
+        backend = replica.backend
+        replica.in_flight += 1
+        try:
+            result = await backend.generate_image(
+                prompt=prompt, size=size, fmt=fmt, seed=seed, negative_prompt=negative_prompt, **kwargs
+            )
+        except _REQUEST_ERRORS:
+            raise
+        except Exception:
+            replica.consecutive_failures += 1
+            raise
+        finally:
+            replica.in_flight -= 1
+            # Restart only the live instance, and only once nothing else runs on
+            # it; otherwise the last request to finish restarts it
+            if self._draining(replica) and replica.backend is backend and replica.in_flight == 0:
+                self.restart(replica)
+        replica.consecutive_failures = 0
+        replica.served += 1
+        return result
+
+    async def check_health(self) -> Dict[str, bool]:
+        """Probe every replica and restart the unhealthy ones."""
+        results = await asyncio.gather(*(r.backend.health() for r in self.replicas), return_exceptions=True)
+        report = {}
+        for replica, ok in zip(self.replicas, results):
+            healthy = ok is True
+            report[replica.device] = healthy
+            if not healthy and replica.in_flight == 0:
+                self.restart(replica)
+        return report
+
+    async def run_health_checks(self, interval: float = 30.0) -> None:
+        """Periodically call ``check_health``; run as a background task."""
+        while True:
+            await asyncio.sleep(interval)
+            await self.check_health()
+
+    async def load(self) -> None:
+        await asyncio.gather(*(r.backend.load() for r in self.replicas))
+
+    def unload(self) -> None:
+        for replica in self.replicas:
+            replica.backend.unload()
+
+    async def health(self) -> bool:
+        return any((await self.check_health()).values())
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "device": r.device,
+                "in_flight": r.in_flight,
+                "served": r.served,
+                "consecutive_failures": r.consecutive_failures,
+                "restarts": r.restarts,
+            }
+            for r in self.replicas
+        ]
+
+
+def resolve_devices(value: str) -> List[str]:
+    """Parse a device list such as "cuda:0,cuda:1", "cpu,cpu" or "auto".
+
+    "auto" expands to every visible CUDA device (empty if there are none).
+    """
+    value = value.strip()
+    if not value:
+        return []
+    if value.lower() == "auto":
+        try:
+            import torch  # type: ignore
+        except Exception:
+            return []
+        return [f"cuda:{i}" for i in range(torch.cuda.device_count())]
+    return [d.strip() for d in value.split(",") if d.strip()]
@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+
+"""Memory-aware placement of local diffusion pipelines.
+
+Local backends hand each freshly loaded pipeline to the ``ResidencyManager``
+instead of moving it to the device unconditionally. The manager compares the
+pipeline's weight size with free device memory and picks a placement:
+
+- ``device``: everything on the accelerator (enough headroom)
+- ``model_offload``: components move to the device one at a time
+  (``enable_model_cpu_offload``)
+- ``sequential_offload``: submodules stream to the device layer by layer
+  (``enable_sequential_cpu_offload``); slowest, smallest footprint
+- ``cpu``: CPU-only device, or parked on the host after idling
+
+Before falling back to offload it parks least-recently-used idle pipelines on
+the same device in host memory. A parked pipeline goes through the same
+decision when it is used again, so it may come back offloaded. VAE tiling is
+enabled whenever a pipeline does not fit entirely. Idle pipelines are parked in
+host memory after ``IMAGE_GEN_IDLE_OFFLOAD`` seconds. Parking needs host RAM
+for the weights (with the same headroom); when it is short, the pipeline is
+unloaded instead and its weights reload from disk on next use. Unloading idle
+backends entirely is left to the instance registry (``IMAGE_GEN_IDLE_TIMEOUT``).
+``IMAGE_GEN_OFFLOAD``
+(``auto``|``none``|``model``|``sequential``) forces a placement policy and
+``IMAGE_GEN_MEMORY_HEADROOM`` (fraction of device memory, default 0.1) sets how
+much to keep free. ``report()`` lists resident bytes per model.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from ..executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# Weights plus activations/scratch needed to run fully on the device
+_ACTIVATION_FACTOR = 1.2
+
+MemoryProbe = Callable[[str], Optional[Tuple[int, int]]]
+HostProbe = Callable[[], Optional[Tuple[int, int]]]
+
+
+def device_memory(device: str) -> Optional[Tuple[int, int]]:
+    """(free, total) bytes for a CUDA device, or None when unknown (CPU, MPS)."""
+    if not device.startswith("cuda"):
+        return None
+    import torch  # type: ignore
+
+    free, total = torch.cuda.mem_get_info(torch.device(device))
+    return int(free), int(total)
+
+
+def host_memory() -> Optional[Tuple[int, int]]:
+    """(available, total) bytes of host RAM, or None when unknown."""
+    try:
+        with open("/proc/meminfo", encoding="ascii") as f:
+            info = {k: int(v.split()[0]) * 1024 for k, _, v in (line.partition(":") for line in f)}
+        return info["MemAvailable"], info["MemTotal"]
+    except (OSError, KeyError, ValueError):
+        pass
+    try:
+        page = os.sysconf("SC_PAGE_SIZE")
+        return os.sysconf("SC_AVPHYS_PAGES") * page, os.sysconf("SC_PHYS_PAGES") * page
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def _modules(pipe: Any) -> List[Any]:
+    components = getattr(pipe, "components", None)
+    values = components.values() if isinstance(components, dict) else vars(pipe).values()
+    seen, modules = set(), []
+    for value in values:
+        if callable(getattr(value, "parameters", None)) and id(value) not in seen:
+            seen.add(id(value))
+            modules.append(value)
+    return modules
+
+
+def module_bytes(module: Any) -> Tuple[int, int]:
+    """(total, already on an accelerator) bytes of a module's parameters and buffers."""
+    total = accelerated = 0
+    for tensors in (getattr(module, "parameters", None), getattr(module, "buffers", None)):
+        if not callable(tensors):
+            continue
+        for t in tensors():
+            n = t.numel() * t.element_size()
+            total += n
+            if getattr(getattr(t, "device", None), "type", "cpu") != "cpu":
+                accelerated += n
+    return total, accelerated
+
+
+def pipeline_bytes(pipe: Any) -> Tuple[int, int, int]:
+    """(total, largest component, already on an accelerator) weight bytes of a pipeline."""
+    sizes = [module_bytes(m) for m in _modules(pipe)] or [(0, 0)]
+    return sum(t for t, _ in sizes), max(t for t, _ in sizes), sum(a for _, a in sizes)
+
+
+@dataclass
+class Resident:
+    key: str
+    pipe: Any
+    device: str
+    placement: str
+    bytes: int
+    largest: int
+    executor: str
+    unload: Callable[[], None]
+    # Where the pipeline should be while in use; ``placement`` differs once parked
+    target: str = "device"
+    vae_tiling: bool = False
+    busy: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+    @property
+    def device_bytes(self) -> int:
+        if self.placement == "device":
+            return self.bytes
+        if self.placement == "model_offload":
+            return self.largest
+        return 0
+
+
+def _apply(pipe: Any, placement: str, device: str) -> str:
+    """Apply ``placement`` to ``pipe``; returns what was actually applied."""
+    if placement == "model_offload" and hasattr(pipe, "enable_model_cpu_offload"):
+        pipe.enable_model_cpu_offload(device=device)
+        return placement
+    if placement == "sequential_offload" and hasattr(pipe, "enable_sequential_cpu_offload"):
+        pipe.enable_sequential_cpu_offload(device=device)
+        return placement
+    if placement == "cpu":
+        pipe.to("cpu")
+        return placement
+    pipe.to(device)
+    return "device"
+
+
+def _enable_vae_tiling(pipe: Any) -> bool:
+    if hasattr(pipe, "enable_vae_tiling"):
+        pipe.enable_vae_tiling()
+        return True
+    vae = getattr(pipe, "vae", None)
+    if vae is not None and hasattr(vae, "enable_tiling"):
+        vae.enable_tiling()
+        return True
+    return False
+
+
+class ResidencyManager:
+    """Decides where each loaded pipeline lives and parks or unloads idle ones."""
+
+    def __init__(
+        self,
+        policy: str = "auto",
+        headroom: float = 0.1,
+        idle_offload: float = 0.0,
+        memory_probe: Optional[MemoryProbe] = None,
+        host_probe: Optional[HostProbe] = None,
+    ):
+        self.policy = policy
+        self.headroom = headroom
+        self.idle_offload = idle_offload
+        self.memory_probe = memory_probe or device_memory
+        self.host_probe = host_probe or host_memory
+        self._residents: Dict[str, Resident] = {}
+        # Guards the bookkeeping only; weight moves take the device's move lock
+        self._lock = threading.RLock()
+        self._move_locks: Dict[str, threading.Lock] = {}
+
+    # Placement -------------------------------------------------------------------
+
+    def _move_lock(self, device: str) -> threading.Lock:
+        """Serializes placement decisions and weight moves on one device."""
+        with self._lock:
+            return self._move_locks.setdefault(device, threading.Lock())
+
+    def _choose(self, device: str, total: int, largest: int, loaded: int, pipe: Any) -> str:
+        """Pick a placement, parking idle pipelines if needed; hold the move lock."""
+        if not device.startswith(("cuda", "mps")):
+            return "cpu"
+        if self.policy == "none":
+            return "device"
+        if self.policy == "model":
+            return "model_offload"
+        if self.policy == "sequential":
+            return "sequential_offload"
+        memory = self.memory_probe(device)
+        if memory is None:
+            return "device"
+        free, capacity = memory
+        # Pipelines that load straight onto the device already occupy part of it
+        free += loaded
+        reserve = int(self.headroom * capacity)
+        if total * _ACTIVATION_FACTOR + reserve <= free:
+            return "device"
+        free += self._park_lru(device, int(total * _ACTIVATION_FACTOR + reserve - free))
+        if total * _ACTIVATION_FACTOR + reserve <= free:
+            return "device"
+        if hasattr(pipe, "enable_model_cpu_offload") and largest * _ACTIVATION_FACTOR + reserve <= free:
+            return "model_offload"
+        if hasattr(pipe, "enable_sequential_cpu_offload"):
+            return "sequential_offload"
+        return "device"
+
+    def place(
+        self,
+        key: str,
+        pipe: Any,
+        device: str,
+        unload: Callable[[], None],
+        executor: str = "io",
+    ) -> str:
+        """Put a freshly loaded pipeline where it fits; returns the placement."""
+        total, largest, loaded = pipeline_bytes(pipe)
+        with self._move_lock(device):
+            placement = self._choose(device, total, largest, loaded, pipe)
+            applied = _apply(pipe, placement, device)
+            tiling = applied in ("model_offload", "sequential_offload") and _enable_vae_tiling(pipe)
+            with self._lock:
+                self._residents[key] = Resident(
+                    key, pipe, device, applied, total, largest, executor, unload, target=applied, vae_tiling=tiling
+                )
+        logger.info("Placed %s on %s as %s (%.2f GB)", key, device, applied, total / 1e9)
+        return applied
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._residents.pop(key, None)
+
+    @contextmanager
+    def use(self, key: str) -> Iterator[None]:
+        """Mark a pipeline busy for one inference, restoring it to the device if parked.
+
+        Call from the backend's executor thread; busy pipelines are never parked.
+        """
+        with self._lock:
+            resident = self._residents.get(key)
+            if resident is not None:
+                resident.busy += 1
+        try:
+            if resident is not None and resident.placement != resident.target:
+                self._restore(resident)
+            yield
+        finally:
+            if resident is not None:
+                with self._lock:
+                    resident.busy -= 1
+                    resident.last_used = time.monotonic()
+
+    def _restore(self, resident: Resident) -> None:
+        """Bring a parked pipeline back, making room like a fresh placement would."""
+        with self._move_lock(resident.device):
+            with self._lock:
+                if resident.placement == resident.target:
+                    return  # restored by a concurrent use()
+            placement = self._choose(resident.device, resident.bytes, resident.largest, 0, resident.pipe)
+            applied = _apply(resident.pipe, placement, resident.device)
+            tiling = applied in ("model_offload", "sequential_offload") and _enable_vae_tiling(resident.pipe)
+            with self._lock:
+                resident.placement = resident.target = applied
+                resident.vae_tiling = resident.vae_tiling or tiling
+        logger.info("Restored %s on %s as %s", resident.key, resident.device, applied)
+
+    # Eviction --------------------------------------------------------------------
+
+    @staticmethod
+    def _claim(resident: Resident) -> int:
+        """Mark an idle pipeline as parked before moving it; call with ``_lock`` held.
+
+        A ``use()`` that arrives during the move sees it parked and waits for the
+        move lock to restore it.
+        """
+        freed = resident.device_bytes
+        resident.placement = "cpu"
+        return freed
+
+    def _host_fits(self, nbytes: int) -> bool:
+        memory = self.host_probe()
+        if memory is None:
+            return True
+        available, total = memory
+        return nbytes + int(self.headroom * total) <= available
+
+    def _park(self, resident: Resident, freed: int) -> None:
+        """Move a claimed pipeline to host memory, or unload it if host RAM is short."""
+        if self._host_fits(resident.bytes):
+            _apply(resident.pipe, "cpu", resident.device)
+            logger.info("Parked %s in host memory (%.2f GB freed on %s)", resident.key, freed / 1e9, resident.device)
+            return
+        logger.info("Unloading %s: not enough host memory to park it", resident.key)
+        try:
+            resident.unload()
+        finally:
+            self.release(resident.key)
+
+    def _park_lru(self, device: str, needed: int) -> int:
+        """Park idle device-resident pipelines on ``device``, oldest first; hold the move lock."""
+        parked: List[Tuple[Resident, int]] = []
+        with self._lock:
+            candidates = sorted(
+                (r for r in self._residents.values() if r.device == device and r.placement == "device" and not r.busy),
+                key=lambda r: r.last_used,
+            )
+            freed = 0
+            for resident in candidates:
+                if freed >= needed:
+                    break
+                parked.append((resident, self._claim(resident)))
+                freed += parked[-1][1]
+        for resident, size in parked:
+            self._park(resident, size)
+        if freed:
+            self._empty_cache(device)
+        return freed
+
+    @staticmethod
+    def _empty_cache(device: str) -> None:
+        # Nothing can be cached on the device if torch was never imported
+        torch = sys.modules.get("torch")
+        if torch is not None and device.startswith("cuda"):
+            torch.cuda.empty_cache()
+
+    def _idle(self, now: float) -> List[Resident]:
+        if self.idle_offload <= 0:
+            return []
+        with self._lock:
+            return [
+                r
+                for r in self._residents.values()
+                if not r.busy and r.placement == "device" and now - r.last_used > self.idle_offload
+            ]
+
+    async def evict_idle(self, now: Optional[float] = None) -> int:
+        """Park idle pipelines on their backend's executor."""
+        to_park = self._idle(time.monotonic() if now is None else now)
+
+        def park(resident: Resident) -> None:
+            with self._move_lock(resident.device):
+                with self._lock:
+                    if resident.busy or resident.placement != "device":
+                        return
+                    freed = self._claim(resident)
+                self._park(resident, freed)
+                self._empty_cache(resident.device)
+
+        for resident in to_park:
+            await run_blocking(resident.executor, park, resident)
+        return len(to_park)
+
+    async def run_idle_evictor(self, interval: Optional[float] = None) -> None:
+        if self.idle_offload <= 0:
+            return
+        interval = interval or max(1.0, self.idle_offload / 4)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.evict_idle()
+            except Exception:
+                logger.exception("Idle pipeline eviction failed")
+
+    # Reporting -------------------------------------------------------------------
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        """Resident bytes and placement per model."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                r.key: {
+                    "device": r.device,
+                    "placement": r.placement,
+                    "bytes": r.bytes,
+                    "device_bytes": r.device_bytes,
+                    "host_bytes": r.bytes - r.device_bytes,
+                    "vae_tiling": r.vae_tiling,
+                    "busy": r.busy,
+                    "idle_seconds": round(now - r.last_used, 1),
+                }
+                for r in self._residents.values()
+            }
+
+
+_manager: Optional[ResidencyManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_residency() -> ResidencyManager:
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                from ..config import get_settings
+
+                settings = get_settings()
+                _manager = ResidencyManager(
+                    policy=settings.offload,
+                    headroom=settings.memory_headroom,
+                    idle_offload=settings.idle_offload,
+                )
+    return _manager
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""Micro-batching of concurrent requests into single batched calls.
+
+Requests that share a compatibility key (e.g. width, height, steps, cfg) and arrive
+within a short window are grouped and run together, then each caller gets back its
+own result. This trades a few milliseconds of queueing for much higher per-image
+throughput on GPUs.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, Hashable, List, Set, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+I = TypeVar("I")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[K, I, R]):
+    """Collect items per key for up to ``window`` seconds or ``max_batch_size`` items.
+
+    ``run_batch(key, items)`` must return one result per item, in order.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[K, List[I]], Awaitable[List[R]]],
+        max_batch_size: int = 4,
+        window: float = 0.02,
+    ):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.window = max(0.0, window)
+        self._pending: Dict[K, List[Tuple[I, "asyncio.Future[R]"]]] = {}
+        self._timers: Dict[K, asyncio.TimerHandle] = {}
+        # The loop only keeps weak references to tasks; hold running batches here
+        self._tasks: Set["asyncio.Task[None]"] = set()
+
+    async def submit(self, key: K, item: I) -> R:
+        loop = asyncio.get_running_loop()
+        fut: "asyncio.Future[R]" = loop.create_future()
+        batch = self._pending.setdefault(key, [])
+        batch.append((item, fut))
+        if len(batch) >= self.max_batch_size or self.window == 0:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+        return await fut
+
+    def _flush(self, key: K) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, None)
+        if not batch:
+            return
+        # Callers that went away before the batch started do not take a slot
+        batch = [(item, fut) for item, fut in batch if not fut.done()]
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run(key, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: K, batch: List[Tuple[I, "asyncio.Future[R]"]]) -> None:
+        try:
+            results = await self.run_batch(key, [item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"Batch returned {len(results)} results for {len(batch)} requests")
+        except asyncio.CancelledError:
+            for _, fut in batch:
+                fut.cancel()
+            raise
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark harness for image backends.
+
+Drives any backend (mock by default, so it runs without a GPU or network) and
+reports cold start, latency percentiles, throughput at several concurrency levels,
+peak RSS and a per-stage time breakdown (from ``ImageResult.timings`` plus the
+transport serialization) as JSON.
+
+    PYTHONPATH=. python3 -m imagen.bench --backend mock --requests 50 --concurrency 1,4,16 --output bench.json
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import math
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from .backends import get_backend, unload_backend
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of ``values`` (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def peak_rss_bytes() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _summarize(latencies: List[float]) -> Dict[str, float]:
+    return {
+        "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies) if latencies else 0.0,
+    }
+
+
+def _transport(result) -> float:
+    """Time the MCP-style base64 + JSON serialization of a result."""
+    t0 = time.perf_counter()
+    json.dumps({"content_type": result.content_type, "base64": base64.b64encode(result.content).decode("ascii")})
+    return time.perf_counter() - t0
+
+
+async def _run_level(
+    backend, requests: int, concurrency: int, params: Dict[str, Any], first_seed: Optional[int] = None
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    stages: Dict[str, List[float]] = {"generate": [], "transport": []}
+    errors = 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        nonlocal errors
+        async with sem:
+            seed = None if first_seed is None else first_seed + i
+            t0 = time.perf_counter()
+            try:
+                result = await backend.generate_image(
+                    prompt=params["prompt"],
+                    size=params["size"],
+                    fmt=params["fmt"],
+                    seed=seed,
+                    profile=params.get("profile"),
+                )
+            except Exception:
+                errors += 1
+                return
+            t1 = time.perf_counter()
+            transport = _transport(result)
+            stages["generate"].append(t1 - t0)
+            stages["transport"].append(transport)
+            # Backend-reported stages (load, compose, inference, encode, ...)
+            for stage, seconds in result.timings.items():
+                if stage != "total":
+                    stages.setdefault(stage, []).append(seconds)
+            latencies.append(t1 - t0 + transport)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    wall = time.perf_counter() - t0
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "wall_seconds": wall,
+        "images_per_sec": len(latencies) / wall if wall > 0 else 0.0,
+        "latency_seconds": _summarize(latencies),
+        "stages_seconds": {name: _summarize(vals) for name, vals in stages.items()},
+    }
+
+
+IMPORT_MODULES = [
+    "imagen",
+    "imagen.mcp",
+    "imagen.http_server",
+    "imagen.backends.mock",
+    "imagen.backends.gemini",
+    "imagen.backends.qwen",
+    "imagen.backends.hunyuan",
+]
+
+_IMPORT_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import {module}
+dt = time.perf_counter() - t0
+heavy = sorted(m for m in ("torch", "diffusers", "hyimage", "transformers") if m in sys.modules)
+print(json.dumps({{"seconds": dt, "heavy_modules": heavy}}))
+"""
+
+
+def import_times(modules: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Measure cold import time of each module in a fresh interpreter.
+
+    Also reports which heavy ML frameworks the import pulled in; server startup
+    should not load any of them.
+    """
+    report: Dict[str, Any] = {}
+    for module in modules or IMPORT_MODULES:
+        proc = subprocess.run(
+            [sys.executable, "-c", _IMPORT_PROBE.format(module=module)],
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            report[module] = {"error": proc.stderr.strip().splitlines()[-1:]}
+        else:
+            report[module] = json.loads(proc.stdout.strip().splitlines()[-1])
+    return report
+
+
+async def run_benchmark(
+    backend: str = "mock",
+    requests: int = 20,
+    concurrency: Optional[List[int]] = None,
+    size: str = "512x512",
+    fmt: str = "png",
+    prompt: str = "A benchmark image of a lighthouse at dusk",
+    seed: Optional[int] = 0,
+    profile: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Run the benchmark and return a JSON-serializable report."""
+    params = {"prompt": prompt, "size": size, "fmt": fmt, "seed": seed, "profile": profile}
+    # Cold start: fresh instance, load, and first request
+    unload_backend(backend)
+    t0 = time.perf_counter()
+    b = get_backend(backend, profile=profile)
+    await b.load()
+    t_loaded = time.perf_counter()
+    await b.generate_image(prompt=prompt, size=size, fmt=fmt, seed=seed, profile=profile)
+    t_first = time.perf_counter()
+
+    # Every request gets its own seed, so the result cache and single-flight
+    # coalescing never turn a later level into a measure of cache hits
+    levels = []
+    for n, c in enumerate(concurrency or [1]):
+        first_seed = None if seed is None else seed + 1 + n * requests
+        levels.append(await _run_level(b, requests, c, params, first_seed))
+    return {
+        "backend": b.name,
+        "params": params,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cold_start_seconds": {"load": t_loaded - t0, "first_request": t_first - t_loaded, "total": t_first - t0},
+        "levels": levels,
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark an image backend")
+    parser.add_argument("--backend", default="mock", help="Backend to benchmark (default mock)")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per concurrency level")
+    parser.add_argument("--concurrency", default="1,4", help="Comma-separated concurrency levels")
+    parser.add_argument("--size", default="512x512", help="Image size WxH")
+    parser.add_argument("--fmt", default="png", choices=["png", "jpg", "jpeg", "webp"], help="Image format")
+    parser.add_argument("--seed", type=int, default=0, help="Base seed (each request gets a distinct seed from here)")
+    parser.add_argument("--profile", default=None, help="Inference profile (draft|standard|final)")
+    parser.add_argument("--output", default=None, help="Write JSON report here (default stdout)")
+    parser.add_argument("--import-time", action="store_true", help="Only measure module import times")
+    args = parser.parse_args(argv)
+    if args.import_time:
+        report = {"import_times": import_times()}
+    else:
+        report = asyncio.run(
+            run_benchmark(
+                backend=args.backend,
+                requests=args.requests,
+                concurrency=[int(c) for c in args.concurrency.split(",") if c.strip()],
+                size=args.size,
+                fmt=args.fmt,
+                seed=args.seed,
+                profile=args.profile,
+            )
+        )
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
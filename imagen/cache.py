@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+
+"""Content-addressed cache of generated images.
+
+Results are keyed by a stable SHA-256 of the full request (backend, model, prompt,
+negative prompt, size, seed, format and any extra options). Options left at their
+defaults (None, empty renditions, the default profile) do not change the key, so
+every transport maps one request to one key. Two tiers:
+
+- memory: LRU bounded by total bytes
+- disk (optional): ``<dir>/<key[:2]>/<key>`` with a ``.json`` metadata sidecar
+
+Unseeded requests are not reproducible, so they bypass the cache unless
+``cache_unseeded`` is set.
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .backends.base import ImageBackend, ImageResult, WrappedBackend
+from .executor import run_blocking
+from .metrics import metrics
+from .profiles import get_profile
+
+
+def request_key(
+    backend: str,
+    model: Optional[str],
+    prompt: str,
+    negative_prompt: Optional[str],
+    size: str,
+    seed: Optional[int],
+    fmt: str,
+    **options: Any,
+) -> str:
+    """Stable hex digest identifying a generation request."""
+    options = _normalize_options(backend, options)
+    payload = {
+        "backend": backend,
+        "model": model,
+        "prompt": prompt,
+        "negative_prompt": negative_prompt or "",
+        "size": size.lower(),
+        "seed": seed,
+        "fmt": "jpg" if fmt.lower() == "jpeg" else fmt.lower(),
+        "options": options,
+    }
+    blob = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=repr)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _normalize_options(backend: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop options that only restate a default, and resolve the profile name."""
+    normalized = {
+        name: value
+        for name, value in options.items()
+        if value is not None and not (isinstance(value, (str, list, tuple, dict)) and not value)
+    }
+    normalized.pop("profile", None)
+    # Backends without profiles ignore them, so they never affect the key
+    profile = get_profile(backend, options.get("profile"))
+    if profile is not None:
+        normalized["profile"] = profile.name
+    return normalized
+
+
+def _result_bytes(result: ImageResult) -> int:
+    return len(result.content) + sum(len(r.content) for r in result.renditions)
+
+
+class ResultCache:
+    """Two-tier (memory LRU + disk) cache of ``ImageResult`` objects."""
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, directory: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.directory = Path(directory) if directory else None
+        self._items: "OrderedDict[str, ImageResult]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+    # Memory tier -----------------------------------------------------------------
+
+    def _get_memory(self, key: str) -> Optional[ImageResult]:
+        with self._lock:
+            result = self._items.get(key)
+            if result is not None:
+                self._items.move_to_end(key)
+            return result
+
+    def _put_memory(self, key: str, result: ImageResult) -> None:
+        size = _result_bytes(result)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= _result_bytes(old)
+            self._items[key] = result
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._items:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= _result_bytes(evicted)
+
+    # Disk tier -------------------------------------------------------------------
+
+    def _path(self, key: str) -> Path:
+        assert self.directory is not None
+        return self.directory / key[:2] / key
+
+    def _read_disk(self, key: str) -> Optional[ImageResult]:
+        path = self._path(key)
+        try:
+            meta = json.loads(path.with_suffix(".json").read_text("utf-8"))
+            content = path.read_bytes()
+            renditions = [
+                ImageResult(content=path.with_name(f"{key}.{i}").read_bytes(), **info)
+                for i, info in enumerate(meta.pop("renditions", []))
+            ]
+        except (OSError, ValueError):
+            return None
+        return ImageResult(content=content, renditions=renditions, **meta)
+
+    def _write_disk(self, key: str, result: ImageResult) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta: Dict[str, Any] = _describe(result)
+        meta["renditions"] = [_describe(r) for r in result.renditions]
+        # Write content first so a sidecar always points at complete files
+        _atomic_write(path, result.content)
+        for i, rendition in enumerate(result.renditions):
+            _atomic_write(path.with_name(f"{key}.{i}"), rendition.content)
+        _atomic_write(path.with_suffix(".json"), json.dumps(meta).encode("utf-8"))
+
+    # Public API ------------------------------------------------------------------
+
+    async def get(self, key: str) -> Optional[ImageResult]:
+        result = self._get_memory(key)
+        if result is None and self.directory is not None:
+            result = await run_blocking("cache", self._read_disk, key)
+            if result is not None:
+                self.disk_hits += 1
+                self._put_memory(key, result)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    async def put(self, key: str, result: ImageResult) -> None:
+        self._put_memory(key, result)
+        if self.directory is not None:
+            await run_blocking("cache", self._write_disk, key, result)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries, size = len(self._items), self._bytes
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+
+def _describe(result: ImageResult) -> Dict[str, Any]:
+    return {"content_type": result.content_type, "format": result.format, "filename": result.filename}
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class CachedBackend(WrappedBackend):
+    """Wrap a backend so repeated seeded requests are served from a ``ResultCache``."""
+
+    def __init__(self, inner: ImageBackend, cache: ResultCache, cache_unseeded: bool = False):
+        super().__init__(inner)
+        self.cache = cache
+        self.cache_unseeded = cache_unseeded
+
+    async def generate_image(
+        self,
+        prompt: str,
+        size: str = "1024x1024",
+        fmt: str = "png",
+        seed: Optional[int] = None,
+        negative_prompt: Optional[str] = None,
+        **kwargs: Any,
+    ) -> ImageResult:
+        call = dict(prompt=prompt, size=size, fmt=fmt, seed=seed, negative_prompt=negative_prompt, **kwargs)
+        if seed is None and not self.cache_unseeded:
+            return await self.inner.generate_image(**call)
+        key = request_key(self.name, self.model_id, prompt, negative_prompt, size, seed, fmt, **kwargs)
+        t0 = time.perf_counter()
+        result = await self.cache.get(key)
+        if result is not None:
+            metrics.inc("imagen_cache_hits_total", backend=self.name)
+            return dataclasses.replace(result, timings={"cache": time.perf_counter() - t0})
+        metrics.inc("imagen_cache_misses_total", backend=self.name)
+        result = await self.inner.generate_image(**call)
+        await self.cache.put(key, result)
+        return result
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Process-wide cache configured from settings."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                from .config import get_settings
+
+                settings = get_settings()
+                _cache = ResultCache(max_bytes=settings.cache_max_bytes, directory=settings.cache_dir or None)
+    return _cache
@@ -11,6 +11,39 @@ class Settings:
     port: int = int(os.getenv("IMAGE_GEN_PORT", "8080"))
     backend: str = os.getenv("IMAGE_GEN_BACKEND", os.getenv("BACKEND", "auto"))
     gemini_api_key: Optional[str] = os.getenv("GEMINI_API_KEY")
+    # Comma-separated backends to load at server start, e.g. "qwen,mock"
+    warmup: str = os.getenv("IMAGE_GEN_WARMUP", "")
+    # Seconds a backend may sit unused before its weights are unloaded (0 = never)
+    idle_timeout: float = float(os.getenv("IMAGE_GEN_IDLE_TIMEOUT", "0"))
+    # Where the MCP "file"/"chunked" return modes write images (default: system temp dir)
+    output_dir: str = os.getenv("IMAGE_GEN_OUTPUT_DIR", "")
+    # Devices for local GPU backends, one pipeline replica each: "cuda:0,cuda:1" or "auto"
+    devices: str = os.getenv("IMAGE_GEN_DEVICES", "")
+    # Seconds between replica health checks
+    health_interval: float = float(os.getenv("IMAGE_GEN_HEALTH_INTERVAL", "30"))
+    # Seconds between metrics summary log lines (0 = off)
+    metrics_log_interval: float = float(os.getenv("IMAGE_GEN_METRICS_LOG_INTERVAL", "0"))
+    # Result cache for repeated seeded requests (off by default)
+    cache_enabled: bool = os.getenv("IMAGE_GEN_CACHE", "false").lower() in ("1", "true", "yes")
+    cache_dir: str = os.getenv("IMAGE_GEN_CACHE_DIR", "")
+    cache_max_bytes: int = int(os.getenv("IMAGE_GEN_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    cache_unseeded: bool = os.getenv("IMAGE_GEN_CACHE_UNSEEDED", "false").lower() in ("1", "true", "yes")
+    # Default seconds a request may queue and run before it is dropped (0 = no limit)
+    request_timeout: float = float(os.getenv("IMAGE_GEN_REQUEST_TIMEOUT", "0"))
+    # Run identical concurrent seeded requests once and share the result
+    singleflight: bool = os.getenv("IMAGE_GEN_SINGLEFLIGHT", "true").lower() in ("1", "true", "yes")
+    # Job queue database (default: jobs.sqlite3 in the output dir), worker count and
+    # seconds finished jobs and their images are kept (0 = forever)
+    jobs_db: str = os.getenv("IMAGE_GEN_JOBS_DB", "")
+    job_workers: int = int(os.getenv("IMAGE_GEN_JOB_WORKERS", "2"))
+    job_ttl: float = float(os.getenv("IMAGE_GEN_JOB_TTL", str(24 * 3600)))
+    # Pipeline placement: "auto" (by free device memory), "none", "model" or "sequential"
+    offload: str = os.getenv("IMAGE_GEN_OFFLOAD", "auto").lower()
+    # Fraction of device memory to keep free when placing pipelines
+    memory_headroom: float = float(os.getenv("IMAGE_GEN_MEMORY_HEADROOM", "0.1"))
+    # Seconds an idle pipeline stays on the device before moving to host memory
+    # (0 = never); unloading idle backends entirely is ``idle_timeout``
+    idle_offload: float = float(os.getenv("IMAGE_GEN_IDLE_OFFLOAD", "0"))
 
 
 def get_settings() -> Settings:
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+"""Bounded executors that keep blocking backend work off the asyncio loop.
+
+Each backend gets its own pool (threads by default) plus a concurrency limit, so a
+50-step diffusion on one backend never stalls the MCP loop or cheaper backends.
+Pools are configured per name through the environment:
+
+- ``IMAGE_GEN_<NAME>_EXECUTOR``: ``thread`` (default) or ``process``
+- ``IMAGE_GEN_<NAME>_WORKERS``: pool size
+- ``IMAGE_GEN_<NAME>_MAX_CONCURRENCY``: max calls in flight (defaults to workers)
+
+Per-device executors are named ``<name>@<device>`` (e.g. ``qwen@cuda:1``) and take
+their configuration from ``<name>``.
+
+Process pools only accept picklable callables, so they suit stateless work such as
+the shared ``encode`` pool; pipelines that live in this process need threads.
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Local pipelines are serialized per device by default; remote/CPU work fans out.
+_DEFAULT_WORKERS = {
+    "qwen": 1,
+    "hunyuan": 1,
+    "gemini": 8,
+    "mock": 4,
+    "encode": max(1, min(4, os.cpu_count() or 1)),
+    # SQLite job store; calls are serialized anyway
+    "jobs": 1,
+}
+
+
+class BackendExecutor:
+    """A named pool with an async concurrency limit in front of it."""
+
+    def __init__(
+        self,
+        name: str,
+        kind: str = "thread",
+        workers: int = 1,
+        max_concurrency: Optional[int] = None,
+    ):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unsupported executor kind: {kind!r}")
+        self.name = name
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.max_concurrency = max(1, max_concurrency or self.workers)
+        self._pool: Optional[Executor] = None
+        self._pool_lock = threading.Lock()
+        # asyncio primitives are bound to one loop; keep one semaphore per loop
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self.in_flight = 0
+        self.waiting = 0
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    if self.kind == "process":
+                        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._pool = ThreadPoolExecutor(
+                            max_workers=self.workers, thread_name_prefix=f"imagen-{self.name}"
+                        )
+        return self._pool
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        sem = self._semaphores.get(loop)
+        if sem is None:
+            sem = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = sem
+        return sem
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run ``fn(*args, **kwargs)`` in the pool once a concurrency slot is free."""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(fn, *args, **kwargs)
+        if self.kind == "thread":
+            # Carry contextvars (e.g. tracing/progress state) into the worker thread
+            call = functools.partial(contextvars.copy_context().run, call)
+        self.waiting += 1
+        try:
+            await self._semaphore().acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            return await loop.run_in_executor(self._get_pool(), call)
+        finally:
+            self.in_flight -= 1
+            self._semaphore().release()
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+_executors: Dict[str, BackendExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def _env(name: str, key: str) -> Optional[str]:
+    return os.getenv(f"IMAGE_GEN_{name.upper()}_{key}")
+
+
+def get_executor(name: str) -> BackendExecutor:
+    """Return the shared executor for ``name``, creating it from env config."""
+    ex = _executors.get(name)
+    if ex is not None:
+        return ex
+    with _executors_lock:
+        ex = _executors.get(name)
+        if ex is None:
+            base = name.split("@", 1)[0]
+            workers = int(_env(base, "WORKERS") or _DEFAULT_WORKERS.get(base, 2))
+            max_conc = _env(base, "MAX_CONCURRENCY")
+            ex = BackendExecutor(
+                name,
+                kind=(_env(base, "EXECUTOR") or "thread").lower(),
+                workers=workers,
+                max_concurrency=int(max_conc) if max_conc else None,
+            )
+            _executors[name] = ex
+    return ex
+
+
+async def run_blocking(name: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking call on the executor named ``name``."""
+    return await get_executor(name).run(fn, *args, **kwargs)
+
+
+def executor_stats() -> Dict[str, Dict[str, int]]:
+    """Queue depth (calls waiting for a slot) and in-flight calls per executor."""
+    with _executors_lock:
+        executors = list(_executors.values())
+    return {ex.name: {"waiting": ex.waiting, "in_flight": ex.in_flight} for ex in executors}
+
+
+def shutdown_executors(wait: bool = True) -> None:
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for ex in executors:
+        ex.shutdown(wait=wait)
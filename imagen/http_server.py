@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+
+"""Minimal asyncio HTTP/1.1 transport for image generation.
+
+Serves many concurrent clients against the shared, warm backend instances, with
+persistent (keep-alive) connections, request size limits and binary ``image/*``
+responses.
+
+Endpoints:
+
+- ``POST /generate`` with a JSON body ``{"prompt", "size", "fmt", "seed",
+  "negative_prompt", "backend", "profile", "timeout"}`` returns the image bytes.
+  Metadata is in the ``Content-Type`` and ``Content-Disposition`` headers. When the
+  backend is saturated the server answers 503 with ``Retry-After`` at once; requests
+  whose ``timeout`` (seconds) passes are dropped with 504.
+- ``GET /health`` returns ``{"status": "ok"}``.
+- ``GET /metrics`` returns counters and stage timings in Prometheus text format.
+  Per-request stage timings are also sent in the ``Server-Timing`` header.
+"""
+
+import asyncio
+import json
+import logging
+from http import HTTPStatus
+from typing import Any, Dict, Optional, Tuple
+
+from .admission import AdmissionError, DeadlineExceeded, admit
+from .backends import get_backend
+from .config import get_settings
+from .metrics import metrics, render_prometheus, run_log_reporter
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 64 * 1024
+KEEPALIVE_TIMEOUT = 15.0
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+class ImageHTTPServer:
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        max_body_bytes: int = MAX_BODY_BYTES,
+        keepalive_timeout: float = KEEPALIVE_TIMEOUT,
+    ):
+        self.host = host
+        self.port = port
+        self.max_body_bytes = max_body_bytes
+        self.keepalive_timeout = keepalive_timeout
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, limit=MAX_HEADER_BYTES
+        )
+        sock = self._server.sockets[0]
+        self.port = sock.getsockname()[1]
+        logger.info("HTTP server listening on %s:%s", self.host, self.port)
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        assert self._server is not None
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    # Connection handling -------------------------------------------------------------
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.keepalive_timeout)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except HTTPError as e:
+                    # Framing is unreliable after a bad request, so close afterwards
+                    await self._send_error(writer, e, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    status, resp_headers, payload = await self._dispatch(method, path, body)
+                except HTTPError as e:
+                    await self._send_error(writer, e, keep_alive)
+                except Exception:
+                    logger.exception("Unhandled error serving %s %s", method, path)
+                    await self._send_error(writer, HTTPError(500, "Internal server error"), keep_alive)
+                else:
+                    await self._send(writer, status, resp_headers, payload, keep_alive)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _read_request(
+        self, reader: asyncio.StreamReader
+    ) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as e:
+            if not e.partial:
+                return None
+            raise
+        except asyncio.LimitOverrunError:
+            raise HTTPError(431, "Request headers too large")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _version = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers: Dict[str, str] = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HTTPError(411, "Chunked request bodies are not supported; send Content-Length")
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > self.max_body_bytes:
+            raise HTTPError(413, f"Request body exceeds {self.max_body_bytes} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target.split("?", 1)[0], headers, body
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        if path == "/health":
+            if method != "GET":
+                raise HTTPError(405, "Method not allowed", {"Allow": "GET"})
+            return 200, {"Content-Type": "application/json"}, b'{"status":"ok"}'
+        if path == "/metrics":
+            if method != "GET":
+                raise HTTPError(405, "Method not allowed", {"Allow": "GET"})
+            return 200, {"Content-Type": "text/plain; version=0.0.4"}, render_prometheus().encode("utf-8")
+        if path == "/generate":
+            if method != "POST":
+                raise HTTPError(405, "Method not allowed", {"Allow": "POST"})
+            return await self._generate(body)
+        raise HTTPError(404, "Not found")
+
+    async def _generate(self, body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        try:
+            params: Dict[str, Any] = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Body must be JSON")
+        if not isinstance(params, dict) or not isinstance(params.get("prompt"), str) or not params["prompt"]:
+            raise HTTPError(400, "Field 'prompt' is required")
+        fmt = str(params.get("fmt", "png")).lower()
+        if fmt not in ("png", "jpg", "jpeg", "webp"):
+            raise HTTPError(400, f"Unsupported format: {fmt}")
+        seed = params.get("seed")
+        if seed is not None and not isinstance(seed, int):
+            raise HTTPError(400, "Field 'seed' must be an integer")
+        size = str(params.get("size", "1024x1024"))
+        profile = params.get("profile")
+        if profile is not None and not isinstance(profile, str):
+            raise HTTPError(400, "Field 'profile' must be a string")
+        timeout = params.get("timeout", get_settings().request_timeout)
+        if not isinstance(timeout, (int, float)) or isinstance(timeout, bool):
+            raise HTTPError(400, "Field 'timeout' must be a number of seconds")
+        try:
+            backend = get_backend(params.get("backend"), size=size, fmt=fmt, profile=profile)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        try:
+            async with admit(backend.name, timeout):
+                result = await backend.generate_image(
+                    prompt=params["prompt"],
+                    size=size,
+                    fmt=fmt,
+                    seed=seed,
+                    negative_prompt=params.get("negative_prompt"),
+                    profile=profile,
+                )
+        except AdmissionError as e:
+            retry = {"Retry-After": str(int(e.retry_after))}
+            raise HTTPError(504 if isinstance(e, DeadlineExceeded) else 503, str(e), retry)
+        headers = {
+            "Content-Type": result.content_type,
+            "Content-Disposition": f'inline; filename="{result.filename}"',
+        }
+        if result.timings:
+            headers["Server-Timing"] = ", ".join(
+                f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in result.timings.items()
+            )
+        metrics.inc("imagen_bytes_out_total", len(result.content), transport="http")
+        return 200, headers, result.content
+
+    # Responses -------------------------------------------------------------------
+
+    async def _send(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        headers: Dict[str, str],
+        payload: bytes,
+        keep_alive: bool,
+    ) -> None:
+        reason = HTTPStatus(status).phrase
+        head = [f"HTTP/1.1 {status} {reason}", f"Content-Length: {len(payload)}"]
+        head.append("Connection: keep-alive" if keep_alive else "Connection: close")
+        head.extend(f"{k}: {v}" for k, v in headers.items())
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+        writer.write(payload)
+        await writer.drain()
+
+    async def _send_error(self, writer: asyncio.StreamWriter, error: HTTPError, keep_alive: bool) -> None:
+        payload = json.dumps({"error": error.message}).encode("utf-8")
+        headers = {"Content-Type": "application/json", **error.headers}
+        try:
+            await self._send(writer, error.status, headers, payload, keep_alive)
+        except ConnectionError:
+            pass
+
+
+async def run_http(host: str, port: int, warmup: Optional[str] = None) -> None:
+    from .backends import get_registry, get_residency, warm_up
+    from .config import get_settings
+
+    settings = get_settings()
+    await warm_up((warmup if warmup is not None else settings.warmup).split(","))
+    background = [
+        asyncio.create_task(get_registry().run_idle_evictor()),
+        asyncio.create_task(get_residency().run_idle_evictor()),
+        asyncio.create_task(get_registry().run_health_checks(settings.health_interval)),
+        asyncio.create_task(run_log_reporter(settings.metrics_log_interval)),
+    ]
+    server = ImageHTTPServer(host=host, port=port)
+    try:
+        await server.serve_forever()
+    finally:
+        for task in background:
+            task.cancel()
@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+
+"""Durable job queue for long-running generations.
+
+Clients submit a request and get a job id back immediately; workers drain the
+queue in priority order (higher first, then oldest) with a fixed concurrency, so
+local GPUs stay busy regardless of client timeouts or disconnects.
+
+Jobs live in a SQLite database in WAL mode. Finished results are written next to
+it as files and expire, together with their rows, ``ttl`` seconds after the job
+finishes. On start, jobs left ``running`` by a previous process are re-queued.
+All database calls run on the ``jobs`` executor.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .backends.base import ImageResult
+from .executor import run_blocking
+from .metrics import metrics
+from .progress import GenerationCancelled
+from .sinks import LocalDirSink
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    params TEXT NOT NULL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    expires REAL,
+    error TEXT,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created);
+CREATE INDEX IF NOT EXISTS jobs_expires ON jobs (expires);
+"""
+
+Runner = Callable[[Dict[str, Any]], Awaitable[ImageResult]]
+
+
+async def generate(params: Dict[str, Any]) -> ImageResult:
+    """Default runner: one ``generate_image`` call on the shared backend."""
+    from .backends import get_backend
+    from .postprocess import parse_renditions
+
+    backend = get_backend(
+        params.get("backend"), size=params.get("size"), fmt=params.get("fmt"), profile=params.get("profile")
+    )
+    return await backend.generate_image(
+        prompt=params["prompt"],
+        size=params.get("size", "1024x1024"),
+        fmt=params.get("fmt", "png"),
+        seed=params.get("seed"),
+        negative_prompt=params.get("negative_prompt"),
+        profile=params.get("profile"),
+        renditions=parse_renditions(params.get("renditions")),
+    )
+
+
+class JobStore:
+    """Synchronous SQLite access; every method is called through ``run_blocking``."""
+
+    def __init__(self, path: str):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def insert(self, job_id: str, params: Dict[str, Any], priority: int, now: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, priority, params, created) VALUES (?, 'queued', ?, ?, ?)",
+                (job_id, priority, json.dumps(params), now),
+            )
+
+    def claim(self, now: float) -> Optional[sqlite3.Row]:
+        """Atomically move the next queued job to ``running``."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' ORDER BY priority DESC, created LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', started = ? WHERE id = ?", (now, row["id"])
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return row
+
+    def finish(
+        self,
+        job_id: str,
+        status: str,
+        now: float,
+        expires: Optional[float],
+        error: Optional[str] = None,
+        result: Optional[List[Dict[str, Any]]] = None,
+    ) -> bool:
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = ?, finished = ?, expires = ?, error = ?, result = ? "
+                "WHERE id = ? AND status IN ('queued', 'running')",
+                (status, now, expires, error, json.dumps(result) if result is not None else None, job_id),
+            )
+        return cur.rowcount > 0
+
+    def cancel_queued(self, job_id: str, now: float, expires: Optional[float]) -> bool:
+        """Cancel a job no worker has claimed yet."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished = ?, expires = ? WHERE id = ? AND status = 'queued'",
+                (now, expires, job_id),
+            )
+        return cur.rowcount > 0
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            if job["status"] == "queued":
+                job["position"] = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND "
+                    "(priority > ? OR (priority = ? AND created < ?))",
+                    (job["priority"], job["priority"], job["created"]),
+                ).fetchone()[0]
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def requeue_running(self) -> int:
+        with self._lock:
+            cur = self._conn.execute("UPDATE jobs SET status = 'queued', started = NULL WHERE status = 'running'")
+        return cur.rowcount
+
+    def expired(self, now: float) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, result FROM jobs WHERE expires IS NOT NULL AND expires <= ?", (now,)
+            ).fetchall()
+            self._conn.execute("DELETE FROM jobs WHERE expires IS NOT NULL AND expires <= ?", (now,))
+        return [{"id": r["id"], "result": json.loads(r["result"]) if r["result"] else None} for r in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+
+async def _write_results(result_dir: Path, job_id: str, result: ImageResult) -> List[Dict[str, Any]]:
+    outputs = [result, *result.renditions]
+    names = [f"{job_id}.{r.format}" if i == 0 else f"{job_id}-{i}.{r.format}" for i, r in enumerate(outputs)]
+    stored = await LocalDirSink(result_dir).write_result(result, names)
+    return [
+        {
+            "content_type": r.content_type,
+            "format": r.format,
+            "filename": r.filename,
+            "bytes": s.bytes,
+            "path": s.path,
+            "uri": s.uri,
+        }
+        for r, s in zip(outputs, stored)
+    ]
+
+
+def _remove_results(entries: Optional[List[Dict[str, Any]]]) -> None:
+    for entry in entries or []:
+        try:
+            os.unlink(entry["path"])
+        except OSError:
+            pass
+
+
+def load_result(entries: List[Dict[str, Any]]) -> ImageResult:
+    """Rebuild an ``ImageResult`` (with renditions) from a finished job's files."""
+    results = [
+        ImageResult(Path(e["path"]).read_bytes(), e["content_type"], e["format"], e["filename"]) for e in entries
+    ]
+    results[0].renditions = results[1:]
+    return results[0]
+
+
+class JobQueue:
+    """Async front end over ``JobStore`` with a pool of generation workers."""
+
+    def __init__(
+        self,
+        path: str,
+        result_dir: Optional[str] = None,
+        concurrency: int = 2,
+        ttl: float = 24 * 3600,
+        runner: Optional[Runner] = None,
+        poll_interval: float = 1.0,
+    ):
+        self.path = path
+        self.result_dir = Path(result_dir) if result_dir else Path(path).parent / "jobs"
+        self.concurrency = max(1, concurrency)
+        # ttl <= 0 keeps finished jobs forever
+        self.ttl = ttl
+        self.runner = runner or generate
+        self.poll_interval = poll_interval
+        self._store: Optional[JobStore] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._workers: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+
+    @property
+    def store(self) -> JobStore:
+        if self._store is None:
+            raise RuntimeError("JobQueue is not started")
+        return self._store
+
+    async def start(self) -> None:
+        self._store = await run_blocking("jobs", JobStore, self.path)
+        requeued = await run_blocking("jobs", self.store.requeue_running)
+        if requeued:
+            logger.info("Re-queued %d interrupted job(s)", requeued)
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._workers.append(asyncio.create_task(self._reaper()))
+
+    async def close(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._store is not None:
+            # Jobs interrupted by shutdown go back to the queue
+            await run_blocking("jobs", self._store.requeue_running)
+            await run_blocking("jobs", self._store.close)
+            self._store = None
+
+    # Public API ------------------------------------------------------------------
+
+    async def submit(self, params: Dict[str, Any], priority: int = 0) -> str:
+        job_id = uuid.uuid4().hex
+        await run_blocking("jobs", self.store.insert, job_id, params, int(priority), time.time())
+        metrics.inc("imagen_jobs_submitted_total")
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await run_blocking("jobs", self.store.get, job_id)
+
+    async def cancel(self, job_id: str) -> bool:
+        """Cancel a queued job, or one running in this process.
+
+        False if it already finished, is unknown, or runs in another process.
+        """
+        task = self._running.get(job_id)
+        if task is not None:
+            # The worker records the cancellation once the backend has stopped
+            task.cancel()
+            return True
+        return await run_blocking("jobs", self.store.cancel_queued, job_id, time.time(), self._expires())
+
+    async def purge_expired(self, now: Optional[float] = None) -> int:
+        expired = await run_blocking("jobs", self.store.expired, time.time() if now is None else now)
+        for job in expired:
+            await run_blocking("io", _remove_results, job["result"])
+        return len(expired)
+
+    async def stats(self) -> Dict[str, int]:
+        return await run_blocking("jobs", self.store.counts)
+
+    # Workers ---------------------------------------------------------------------
+
+    def _expires(self) -> Optional[float]:
+        return time.time() + self.ttl if self.ttl > 0 else None
+
+    async def _next(self) -> Optional[sqlite3.Row]:
+        assert self._wakeup is not None
+        while True:
+            row = await run_blocking("jobs", self.store.claim, time.time())
+            if row is not None:
+                return row
+            self._wakeup.clear()
+            try:
+                # Also poll, so jobs submitted by other processes are picked up
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                row = await self._next()
+                await self._run(row["id"], json.loads(row["params"]))
+            except Exception:
+                # A database error must not take the worker down for good
+                logger.exception("Job worker failed")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _run(self, job_id: str, params: Dict[str, Any]) -> None:
+        task = asyncio.create_task(self.runner(params))
+        self._running[job_id] = task
+        try:
+            # wait() rather than await, so cancelling the job and stopping the worker differ
+            await asyncio.wait({task})
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            self._running.pop(job_id, None)
+        status, error, entries = "succeeded", None, None
+        # Backends that stop cooperatively raise GenerationCancelled instead
+        if task.cancelled() or isinstance(task.exception(), GenerationCancelled):
+            status = "cancelled"
+        elif task.exception() is not None:
+            exc = task.exception()
+            status, error = "failed", f"{type(exc).__name__}: {exc}"
+        else:
+            try:
+                entries = await _write_results(self.result_dir, job_id, task.result())
+            except Exception as e:
+                status, error = "failed", f"{type(e).__name__}: {e}"
+        now = time.time()
+        recorded = await run_blocking("jobs", self.store.finish, job_id, status, now, self._expires(), error, entries)
+        if not recorded:
+            # The row was finished elsewhere meanwhile; nothing would point at these files
+            await run_blocking("io", _remove_results, entries)
+            return
+        metrics.inc("imagen_jobs_total", status=status)
+
+    async def _reaper(self) -> None:
+        if self.ttl <= 0:
+            return
+        while True:
+            await asyncio.sleep(min(self.ttl, 60.0))
+            try:
+                await self.purge_expired()
+            except Exception:
+                logger.exception("Failed to purge expired jobs")
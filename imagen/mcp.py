@@ -3,12 +3,176 @@
 import argparse
 import asyncio
 import base64
-from typing import Optional
+import json
+import os
+import tempfile
+import time
+from contextlib import aclosing
+from pathlib import Path
+from typing import Any, Dict, List, Optional
 
-from .backends import get_backend
+from .admission import admit
+from .backends import ImageResult, available_backends, get_backend, get_registry, get_residency, warm_up
+from .config import get_settings
+from .executor import run_blocking
+from .jobs import JobQueue, load_result
+from .metrics import metrics, run_log_reporter
+from .postprocess import parse_renditions
+from .progress import ProgressEvent, stream_generation
+from .sinks import ContentAddressedSink
 
+RETURN_MODES = ("base64", "image", "file", "chunked")
+DEFAULT_CHUNK_SIZE = 1024 * 1024
 
-async def run_stdio():
+
+def _output_dir() -> Path:
+    return Path(get_settings().output_dir or os.path.join(tempfile.gettempdir(), "imagen-mcp"))
+
+
+def _describe(result: ImageResult) -> Dict[str, Any]:
+    return {
+        "content_type": result.content_type,
+        "format": result.format,
+        "filename": result.filename,
+        "bytes": len(result.content),
+    }
+
+
+async def format_result(
+    result: ImageResult,
+    return_mode: str = "base64",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    output_dir: Optional[Path] = None,
+) -> Any:
+    """Shape a generation result for the MCP tool response.
+
+    - ``base64``: JSON dict with the base64-encoded image (default)
+    - ``image``: MCP image content block plus a JSON metadata text block
+    - ``file``: write to the output dir and return only a file reference
+    - ``chunked``: like ``file``, plus a chunk count for ``read_image_chunk``
+
+    Renditions are listed under ``"renditions"`` in the same shape as the main
+    image (and, in ``image`` mode, as additional image blocks).
+    """
+    if return_mode not in RETURN_MODES:
+        raise ValueError(f"Unsupported return_mode: {return_mode!r} (expected one of {', '.join(RETURN_MODES)})")
+    outputs = [result, *result.renditions]
+    entries = [_describe(r) for r in outputs]
+    meta: Dict[str, Any] = dict(entries[0], timings=result.timings)
+    if result.renditions:
+        meta["renditions"] = entries[1:]
+    t0 = time.perf_counter()
+    if return_mode == "base64":
+        for entry, r in zip(entries, outputs):
+            entry["base64"] = base64.b64encode(r.content).decode("ascii")
+        meta["base64"] = entries[0]["base64"]
+        _record_transport(result, t0, sum(len(e["base64"]) for e in entries))
+        return meta
+    if return_mode == "image":
+        from mcp.types import ImageContent, TextContent  # type: ignore
+
+        images = [
+            ImageContent(type="image", data=base64.b64encode(r.content).decode("ascii"), mimeType=r.content_type)
+            for r in outputs
+        ]
+        _record_transport(result, t0, sum(len(i.data) for i in images))
+        return [*images, TextContent(type="text", text=json.dumps(meta))]
+    # Content-addressed names: identical images are written once
+    sink = ContentAddressedSink(output_dir or _output_dir())
+    stored = await sink.write_result(result, names=[f"image.{r.format}" for r in outputs])
+    _record_transport(result, t0, 0)
+    for entry, s, r in zip(entries, stored, outputs):
+        entry["path"] = s.path
+        entry["uri"] = s.uri
+        if return_mode == "chunked":
+            entry["chunk_size"] = chunk_size
+            entry["chunks"] = max(1, -(-len(r.content) // chunk_size))
+    meta.update({k: v for k, v in entries[0].items() if k not in meta})
+    return meta
+
+
+def _record_transport(result: ImageResult, t0: float, bytes_out: int) -> None:
+    dt = time.perf_counter() - t0
+    result.timings["transport"] = dt
+    metrics.observe("transport", dt)
+    metrics.inc("imagen_bytes_out_total", bytes_out, transport="mcp")
+
+
+def read_chunk(
+    path: str, index: int, chunk_size: int = DEFAULT_CHUNK_SIZE, output_dir: Optional[Path] = None
+) -> Dict[str, Any]:
+    """Read one chunk of a previously written output file."""
+    root = (output_dir or _output_dir()).resolve()
+    target = Path(path).resolve()
+    if root not in target.parents:
+        raise ValueError("Path is outside the server output directory")
+    total = target.stat().st_size
+    with open(target, "rb") as f:
+        f.seek(index * chunk_size)
+        data = f.read(chunk_size)
+    return {
+        "index": index,
+        "offset": index * chunk_size,
+        "total_bytes": total,
+        "eof": index * chunk_size + len(data) >= total,
+        "base64": base64.b64encode(data).decode("ascii"),
+    }
+
+
+def _progress_token(server: Any) -> Any:
+    """Progress token of the MCP request being handled, if the client sent one."""
+    try:
+        meta = server.request_context.meta
+    except (LookupError, AttributeError):
+        return None
+    return getattr(meta, "progressToken", None) if meta is not None else None
+
+
+async def generate(
+    prompt: str,
+    size: str = "1024x1024",
+    fmt: str = "png",
+    seed: Optional[int] = None,
+    negative_prompt: Optional[str] = None,
+    backend: Optional[str] = None,
+    profile: Optional[str] = None,
+    renditions: Optional[List[Any]] = None,
+    return_mode: str = "base64",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    timeout: Optional[float] = None,
+    server: Any = None,
+) -> Any:
+    """Body of the ``generate_image`` tool; ``server`` is used for progress notifications."""
+    b = get_backend(backend, size=size, fmt=fmt, profile=profile)
+    params = dict(
+        prompt=prompt,
+        size=size,
+        fmt=fmt,
+        seed=seed,
+        negative_prompt=negative_prompt,
+        profile=profile,
+        renditions=parse_renditions(renditions),
+    )
+    token = _progress_token(server)
+    # Rejects at once (with a retry-after hint) when the backend is saturated
+    async with admit(b.name, timeout if timeout is not None else get_settings().request_timeout):
+        if token is None:
+            result = await b.generate_image(**params)
+        else:
+            # Forward step progress; if the client cancels, closing the stream
+            # stops the pipeline between steps.
+            async with aclosing(stream_generation(b, **params)) as events:
+                async for event in events:
+                    if isinstance(event, ProgressEvent):
+                        await server.request_context.session.send_progress_notification(
+                            token, event.step, event.total
+                        )
+                    else:
+                        result = event
+    return await format_result(result, return_mode, chunk_size=chunk_size)
+
+
+async def run_stdio(warmup: Optional[str] = None):
     try:
         from mcp.server import Server  # type: ignore
         from mcp.server.stdio import stdio_server  # type: ignore
@@ -18,36 +182,187 @@ async def run_stdio():
         ) from e
 
     server = Server("imagen-mcp")
+    settings = get_settings()
 
     @server.tool()
-    async def generate_image(prompt: str, size: str = "1024x1024", fmt: str = "png", backend: Optional[str] = None) -> dict:
-        """Generate an image from a prompt. Returns JSON with base64-encoded image.
+    async def generate_image(
+        prompt: str,
+        size: str = "1024x1024",
+        fmt: str = "png",
+        seed: Optional[int] = None,
+        negative_prompt: Optional[str] = None,
+        backend: Optional[str] = None,
+        profile: Optional[str] = None,
+        renditions: Optional[List[Any]] = None,
+        return_mode: str = "base64",
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """Generate an image from a prompt.
 
         Args:
             prompt: Text prompt for image generation
             size: Image size string like "1024x1024"
             fmt: Output image format (png|jpg|jpeg|webp)
+            seed: Random seed; seeded requests are reproducible, so repeats are
+                served from the cache or share an identical in-flight generation
+            negative_prompt: What the image should not contain
             backend: Which backend to use (gemini|qwen|hunyuan|mock|auto)
+            profile: Inference profile (draft|standard|final); trades quality for speed
+            renditions: Extra outputs of the same image, e.g. ["webp:512x512", "jpg:128x128"]
+                or [{"fmt": "webp", "size": "512x512"}]; inference runs once
+            return_mode: base64 (JSON with base64 image), image (MCP image content),
+                file (file reference only) or chunked (file reference read via read_image_chunk)
+            chunk_size: Chunk size in bytes for the chunked mode
+            timeout: Seconds the request may queue and run before it is dropped
+                (default IMAGE_GEN_REQUEST_TIMEOUT); set it to the client's timeout
+        """
+        return await generate(
+            prompt,
+            size=size,
+            fmt=fmt,
+            seed=seed,
+            negative_prompt=negative_prompt,
+            backend=backend,
+            profile=profile,
+            renditions=renditions,
+            return_mode=return_mode,
+            chunk_size=chunk_size,
+            timeout=timeout,
+            server=server,
+        )
+
+    jobs = JobQueue(
+        settings.jobs_db or str(_output_dir() / "jobs.sqlite3"),
+        result_dir=str(_output_dir() / "jobs"),
+        concurrency=settings.job_workers,
+        ttl=settings.job_ttl,
+    )
+
+    @server.tool()
+    async def submit_generation(
+        prompt: str,
+        size: str = "1024x1024",
+        fmt: str = "png",
+        seed: Optional[int] = None,
+        negative_prompt: Optional[str] = None,
+        backend: Optional[str] = None,
+        profile: Optional[str] = None,
+        renditions: Optional[List[Any]] = None,
+        priority: int = 0,
+    ) -> dict:
+        """Queue a generation and return its job id immediately.
+
+        Jobs survive client disconnects and server restarts. Poll with get_job.
+
+        Args:
+            prompt, size, fmt, seed, negative_prompt, backend, profile, renditions: As for generate_image
+            priority: Higher runs first; equal priorities run in submission order
+        """
+        # Fail fast on unknown backends, profiles and renditions
+        get_backend(backend, size=size, fmt=fmt, profile=profile)
+        parse_renditions(renditions)
+        params = dict(
+            prompt=prompt,
+            size=size,
+            fmt=fmt,
+            seed=seed,
+            negative_prompt=negative_prompt,
+            backend=backend,
+            profile=profile,
+            renditions=renditions,
+        )
+        job_id = await jobs.submit(params, priority=priority)
+        job = await jobs.get(job_id)
+        return {"job_id": job_id, "status": job["status"], "position": job.get("position")}
+
+    @server.tool()
+    async def get_job(job_id: str, return_mode: str = "file", chunk_size: int = DEFAULT_CHUNK_SIZE) -> Any:
+        """Status of a submitted job, with its image once it has succeeded.
+
+        Args:
+            job_id: The id returned by submit_generation
+            return_mode: How to return a finished image (file|chunked|base64|image)
+            chunk_size: Chunk size in bytes for the chunked mode
+        """
+        job = await jobs.get(job_id)
+        if job is None:
+            raise ValueError(f"Unknown job: {job_id}")
+        status = {k: job.get(k) for k in ("status", "priority", "position", "created", "started", "finished", "error")}
+        status["job_id"] = job_id
+        if job["status"] != "succeeded":
+            return status
+        if return_mode == "file":
+            # Result files already live under the output dir; no need to reload them
+            status["result"] = dict(job["result"][0], renditions=job["result"][1:])
+            return status
+        result = await run_blocking("io", load_result, job["result"])
+        formatted = await format_result(result, return_mode, chunk_size=chunk_size)
+        if isinstance(formatted, dict):
+            status["result"] = formatted
+            return status
+        # "image" mode: image blocks, then the status with the metadata block folded in
+        from mcp.types import TextContent  # type: ignore
+
+        status["result"] = json.loads(formatted[-1].text)
+        return [*formatted[:-1], TextContent(type="text", text=json.dumps(status))]
+
+    @server.tool()
+    async def cancel_job(job_id: str) -> dict:
+        """Cancel a queued or running job.
+
+        Args:
+            job_id: The id returned by submit_generation
         """
-        b = get_backend(backend)
-        result = await b.generate_image(prompt=prompt, size=size, fmt=fmt)
-        return {
-            "content_type": result.content_type,
-            "format": result.format,
-            "filename": result.filename,
-            "base64": base64.b64encode(result.content).decode("utf-8"),
-        }
+        cancelled = await jobs.cancel(job_id)
+        return {"job_id": job_id, "cancelled": cancelled}
 
-    async with stdio_server() as (read, write):
-        await server.run(read, write)
+    @server.tool()
+    async def read_image_chunk(path: str, index: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+        """Read one base64 chunk of an image returned with return_mode="chunked".
+
+        Args:
+            path: The "path" returned by generate_image
+            index: Zero-based chunk index
+            chunk_size: Must match the chunk_size used in generate_image
+        """
+        return await run_blocking("io", read_chunk, path, index, chunk_size)
+
+    await warm_up((warmup if warmup is not None else settings.warmup).split(","))
+    await jobs.start()
+    background = [
+        asyncio.create_task(get_registry().run_idle_evictor()),
+        asyncio.create_task(get_residency().run_idle_evictor()),
+        asyncio.create_task(get_registry().run_health_checks(settings.health_interval)),
+        asyncio.create_task(run_log_reporter(settings.metrics_log_interval)),
+    ]
+    try:
+        async with stdio_server() as (read, write):
+            await server.run(read, write)
+    finally:
+        for task in background:
+            task.cancel()
+        await jobs.close()
 
 
 def main():
     parser = argparse.ArgumentParser(description="Imagen MCP Server")
-    parser.add_argument("--transport", choices=["stdio"], default="stdio")
+    parser.add_argument("--transport", choices=["stdio", "http"], default="stdio")
+    parser.add_argument("--host", default=None, help="HTTP bind host (env IMAGE_GEN_HOST)")
+    parser.add_argument("--port", type=int, default=None, help="HTTP port (env IMAGE_GEN_PORT)")
+    parser.add_argument("--warmup", default=None, help="Comma-separated backends to load at start (env IMAGE_GEN_WARMUP)")
+    parser.add_argument("--list-backends", action="store_true", help="Print backend availability as JSON and exit")
     args = parser.parse_args()
+    if args.list_backends:
+        print(json.dumps(available_backends(), indent=2))
+        return
     if args.transport == "stdio":
-        asyncio.run(run_stdio())
+        asyncio.run(run_stdio(warmup=args.warmup))
+    elif args.transport == "http":
+        from .http_server import run_http
+
+        settings = get_settings()
+        asyncio.run(run_http(args.host or settings.host, args.port or settings.port, warmup=args.warmup))
     else:  # pragma: no cover
         raise SystemExit("Unsupported transport")
 
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+"""Lightweight per-stage timing and counters for generations.
+
+Backends wrap each request in ``track_request`` and time stages with ``span``.
+Span durations land in the request's ``ImageResult.timings`` and in process-wide
+aggregates that can be exported as Prometheus text (``render_prometheus``, also
+served at ``GET /metrics`` by the HTTP transport) or as a periodic log line.
+
+Set ``IMAGE_GEN_METRICS=0`` to disable; spans then cost one flag check.
+Spans inside process-pool workers are not recorded (contextvars do not cross
+process boundaries).
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_current: "contextvars.ContextVar[Optional[Dict[str, float]]]" = contextvars.ContextVar(
+    "imagen_timings", default=None
+)
+
+
+class Metrics:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        # stage -> [sum, count]
+        self._stages: Dict[str, List[float]] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, stage: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            agg = self._stages.setdefault(stage, [0.0, 0])
+            agg[0] += seconds
+            agg[1] += 1
+
+    def counter(self, name: str, **labels: str) -> float:
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0.0)
+
+    def stage(self, stage: str) -> Tuple[float, int]:
+        with self._lock:
+            total, count = self._stages.get(stage, (0.0, 0))
+            return total, int(count)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._stages.clear()
+
+    def snapshot(self) -> Tuple[Dict[Tuple[str, Labels], float], Dict[str, Tuple[float, int]]]:
+        with self._lock:
+            return dict(self._counters), {k: (v[0], int(v[1])) for k, v in self._stages.items()}
+
+
+metrics = Metrics(enabled=os.getenv("IMAGE_GEN_METRICS", "1").lower() not in ("0", "false", "no"))
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a stage of the current request (no-op when metrics are disabled)."""
+    if not metrics.enabled:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - t0
+        timings = _current.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + dt
+        metrics.observe(stage, dt)
+
+
+@contextmanager
+def track_request(backend: str) -> Iterator[Dict[str, float]]:
+    """Scope one generation: counts requests/errors and collects its stage timings."""
+    timings: Dict[str, float] = {}
+    if not metrics.enabled:
+        yield timings
+        return
+    token = _current.set(timings)
+    metrics.inc("imagen_requests_total", backend=backend)
+    t0 = time.perf_counter()
+    try:
+        yield timings
+    except BaseException:
+        metrics.inc("imagen_errors_total", backend=backend)
+        raise
+    finally:
+        timings["total"] = time.perf_counter() - t0
+        metrics.observe("total", timings["total"])
+        _current.reset(token)
+
+
+def _fmt_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    inner = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in labels)
+    return "{" + inner + "}"
+
+
+def render_prometheus() -> str:
+    """Render all metrics in the Prometheus text exposition format."""
+    from .admission import admission_stats
+    from .backends.residency import get_residency
+    from .executor import executor_stats
+
+    counters, stages = metrics.snapshot()
+    lines: List[str] = []
+    seen = set()
+    for (name, labels), value in sorted(counters.items()):
+        if name not in seen:
+            lines.append(f"# TYPE {name} counter")
+            seen.add(name)
+        lines.append(f"{name}{_fmt_labels(labels)} {value:g}")
+    if stages:
+        lines.append("# TYPE imagen_stage_seconds summary")
+        for stage, (total, count) in sorted(stages.items()):
+            lines.append(f'imagen_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'imagen_stage_seconds_count{{stage="{stage}"}} {count}')
+    stats = executor_stats()
+    if stats:
+        lines.append("# TYPE imagen_executor_queue_depth gauge")
+        for name, st in sorted(stats.items()):
+            lines.append(f'imagen_executor_queue_depth{{executor="{name}"}} {st["waiting"]}')
+        lines.append("# TYPE imagen_executor_in_flight gauge")
+        for name, st in sorted(stats.items()):
+            lines.append(f'imagen_executor_in_flight{{executor="{name}"}} {st["in_flight"]}')
+    admission = admission_stats()
+    if admission:
+        lines.append("# TYPE imagen_admission_queued gauge")
+        for name, st in sorted(admission.items()):
+            lines.append(f'imagen_admission_queued{{backend="{name}"}} {st["queued"]:g}')
+        lines.append("# TYPE imagen_admission_in_flight gauge")
+        for name, st in sorted(admission.items()):
+            lines.append(f'imagen_admission_in_flight{{backend="{name}"}} {st["in_flight"]:g}')
+    resident = get_residency().report()
+    if resident:
+        lines.append("# TYPE imagen_model_resident_bytes gauge")
+        for key, info in sorted(resident.items()):
+            for location in ("device", "host"):
+                lines.append(
+                    f'imagen_model_resident_bytes{{model="{key}",location="{location}"}} {info[location + "_bytes"]}'
+                )
+    return "\n".join(lines) + "\n"
+
+
+def summary_line() -> str:
+    """Compact one-line summary for periodic logging."""
+    counters, stages = metrics.snapshot()
+    totals: Dict[str, float] = {}
+    for (name, _), value in counters.items():
+        totals[name] = totals.get(name, 0.0) + value
+    parts = [f"{name.replace('imagen_', '')}={value:g}" for name, value in sorted(totals.items())]
+    parts += [f"{stage}_avg={total / count:.3f}s" for stage, (total, count) in sorted(stages.items()) if count]
+    return " ".join(parts)
+
+
+async def run_log_reporter(interval: float) -> None:
+    """Log ``summary_line()`` every ``interval`` seconds; run as a background task."""
+    if interval <= 0:
+        return
+    while True:
+        await asyncio.sleep(interval)
+        logger.info("metrics %s", summary_line())
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+"""Shared image post-processing: resize, format conversion and encoding.
+
+All backends encode through here so tuning applies everywhere:
+
+- ``encode_image`` encodes a PIL image with the configured encoder options
+  (``encode_to`` writes into a file object instead).
+- ``convert_bytes`` turns already-encoded bytes (e.g. a Gemini response) into the
+  requested format and size. It returns the input untouched when format and size
+  already match (only the header is read), and uses JPEG draft decoding plus
+  ``reducing_gap`` to shrink large sources cheaply before the final resample.
+- ``encode_async``/``convert_async`` run these on the shared "encode" executor
+  (``IMAGE_GEN_ENCODE_EXECUTOR=process`` moves them off the GIL).
+- ``render_renditions`` produces extra outputs (``Rendition``: format plus
+  optional size) from one decoded image, encoding them in parallel.
+
+Encoder options come from the environment (defaults are Pillow's):
+``IMAGE_GEN_PNG_COMPRESS_LEVEL`` (0-9, default 6; 1 is several times faster on
+large images), ``IMAGE_GEN_JPEG_QUALITY`` (default 75), ``IMAGE_GEN_JPEG_OPTIMIZE``
+(default off), ``IMAGE_GEN_WEBP_QUALITY`` (default 80) and
+``IMAGE_GEN_WEBP_METHOD`` (0-6, default 4; lower is faster).
+"""
+
+import asyncio
+import io
+import os
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from .executor import run_blocking
+from .metrics import span
+
+# Requested format -> Pillow format name
+_PIL_FORMATS = {"png": "PNG", "jpg": "JPEG", "jpeg": "JPEG", "webp": "WEBP"}
+
+
+@dataclass(frozen=True)
+class EncodeOptions:
+    png_compress_level: int = 6
+    jpeg_quality: int = 75
+    jpeg_optimize: bool = False
+    webp_quality: int = 80
+    webp_method: int = 4
+
+    @classmethod
+    def from_env(cls) -> "EncodeOptions":
+        return cls(
+            png_compress_level=int(os.getenv("IMAGE_GEN_PNG_COMPRESS_LEVEL", "6")),
+            jpeg_quality=int(os.getenv("IMAGE_GEN_JPEG_QUALITY", "75")),
+            jpeg_optimize=os.getenv("IMAGE_GEN_JPEG_OPTIMIZE", "0").lower() in ("1", "true", "yes"),
+            webp_quality=int(os.getenv("IMAGE_GEN_WEBP_QUALITY", "80")),
+            webp_method=int(os.getenv("IMAGE_GEN_WEBP_METHOD", "4")),
+        )
+
+    def save_kwargs(self, pil_format: str) -> dict:
+        if pil_format == "PNG":
+            return {"compress_level": self.png_compress_level}
+        if pil_format == "JPEG":
+            return {"quality": self.jpeg_quality, "optimize": self.jpeg_optimize}
+        if pil_format == "WEBP":
+            return {"quality": self.webp_quality, "method": self.webp_method}
+        return {}
+
+
+DEFAULT_OPTIONS = EncodeOptions.from_env()
+
+
+def normalize_format(fmt: str) -> str:
+    """Lower-case format with "jpeg" folded into "jpg"."""
+    f = fmt.lower()
+    return "jpg" if f == "jpeg" else f
+
+
+def content_type(fmt: str) -> str:
+    f = normalize_format(fmt)
+    return f"image/{'jpeg' if f == 'jpg' else f}"
+
+
+def _pil_format(fmt: str) -> str:
+    return _PIL_FORMATS.get(fmt.lower(), fmt.upper())
+
+
+def parse_size(size: str) -> Tuple[int, int]:
+    """Strict "WxH" parser (ValueError on malformed input)."""
+    w_s, h_s = size.lower().split("x", 1)
+    w, h = int(w_s), int(h_s)
+    if w <= 0 or h <= 0:
+        raise ValueError(f"Invalid size: {size!r}")
+    return w, h
+
+
+@dataclass(frozen=True)
+class Rendition:
+    """An extra output of a generation: ``fmt`` at ``size`` (None keeps the generated size)."""
+
+    fmt: str
+    size: Optional[str] = None
+
+    @classmethod
+    def parse(cls, spec: Union[str, Dict[str, Any], "Rendition"]) -> "Rendition":
+        """Accept ``"webp"``, ``"webp:512x512"`` or ``{"fmt": "webp", "size": "512x512"}``."""
+        if isinstance(spec, Rendition):
+            return spec
+        if isinstance(spec, dict):
+            fmt, size = spec.get("fmt"), spec.get("size")
+        elif isinstance(spec, str):
+            fmt, _, size = spec.partition(":")
+        else:
+            raise ValueError(f"Invalid rendition: {spec!r}")
+        if not isinstance(fmt, str) or fmt.lower() not in _PIL_FORMATS:
+            raise ValueError(f"Unsupported rendition format: {fmt!r}")
+        if size:
+            try:
+                parse_size(str(size))
+            except ValueError:
+                raise ValueError(f"Invalid rendition size: {size!r}") from None
+        return cls(normalize_format(fmt), str(size).lower() if size else None)
+
+    @property
+    def suffix(self) -> str:
+        """Filename suffix, e.g. ``"-256x256.webp"``."""
+        return f"-{self.size or 'full'}.{self.fmt}"
+
+
+def parse_renditions(specs: Optional[Iterable[Union[str, Dict[str, Any], Rendition]]]) -> List[Rendition]:
+    return [Rendition.parse(spec) for spec in specs or ()]
+
+
+def encode_to(image: Any, fmt: str, fp: BinaryIO, options: Optional[EncodeOptions] = None) -> None:
+    """Encode a PIL image straight into a writable binary file object."""
+    pil_format = _pil_format(fmt)
+    if pil_format == "JPEG" and image.mode not in ("RGB", "L", "CMYK"):
+        image = image.convert("RGB")
+    image.save(fp, format=pil_format, **(options or DEFAULT_OPTIONS).save_kwargs(pil_format))
+
+
+def encode_image(image: Any, fmt: str, options: Optional[EncodeOptions] = None) -> bytes:
+    """Encode a PIL image to bytes; top-level so it can run in a process pool."""
+    buffer = io.BytesIO()
+    encode_to(image, fmt, buffer, options)
+    return buffer.getvalue()
+
+
+def resize_image(image: Any, size: Tuple[int, int]) -> Any:
+    """Resize with a quality filter; large reductions go through cheap integer reduce first."""
+    if image.size == size:
+        return image
+    from PIL import Image  # type: ignore
+
+    resampling = getattr(Image, "Resampling", Image)
+    if size[0] <= image.size[0] and size[1] <= image.size[1]:
+        return image.resize(size, resampling.LANCZOS, reducing_gap=3.0)
+    return image.resize(size, resampling.BICUBIC)
+
+
+def convert_bytes(
+    data: bytes, fmt: str, size: Optional[Tuple[int, int]] = None, options: Optional[EncodeOptions] = None
+) -> bytes:
+    """Re-encode ``data`` as ``fmt`` at ``size``, skipping work that is not needed."""
+    from PIL import Image  # type: ignore
+
+    with span("resize"):
+        img = Image.open(io.BytesIO(data))  # reads the header only
+        if img.format == _pil_format(fmt) and (size is None or img.size == size):
+            return data
+        if size is not None and img.size != size:
+            # JPEG draft mode decodes at 1/2, 1/4 or 1/8 scale directly from the DCT
+            img.draft("RGB", size)
+            img = resize_image(img, size)
+
+    with span("encode"):
+        return encode_image(img, fmt, options)
+
+
+def decode_image(data: bytes) -> Any:
+    from PIL import Image  # type: ignore
+
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+def render_rendition(image: Any, rendition: Rendition, options: Optional[EncodeOptions] = None) -> bytes:
+    if rendition.size:
+        image = resize_image(image, parse_size(rendition.size))
+    return encode_image(image, rendition.fmt, options)
+
+
+async def render_renditions(
+    source: Any, renditions: Sequence[Rendition], options: Optional[EncodeOptions] = None
+) -> List[bytes]:
+    """Encode every rendition of ``source`` (a PIL image, or encoded bytes decoded
+    once) concurrently on the encode executor."""
+    if not renditions:
+        return []
+    if isinstance(source, (bytes, bytearray)):
+        source = await run_blocking("encode", decode_image, bytes(source))
+    return list(
+        await asyncio.gather(*(run_blocking("encode", render_rendition, source, r, options) for r in renditions))
+    )
+
+
+async def encode_async(image: Any, fmt: str, options: Optional[EncodeOptions] = None) -> bytes:
+    return await run_blocking("encode", encode_image, image, fmt, options)
+
+
+async def convert_async(
+    data: bytes, fmt: str, size: Optional[Tuple[int, int]] = None, options: Optional[EncodeOptions] = None
+) -> bytes:
+    return await run_blocking("encode", convert_bytes, data, fmt, size, options)
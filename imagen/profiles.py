@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+"""Named speed/quality profiles for local inference.
+
+A profile maps to step count, guidance, scheduler and model variant for a
+backend. Callers pick one per request (``profile="draft"``) through the MCP tool,
+HTTP API and CLI; ``IMAGE_GEN_PROFILE`` sets the default (``standard``, which
+matches the historical settings).
+
+Model variants are constructor arguments, so ``get_backend`` routes a profile
+with a ``model_variant`` to a separate (shared) backend instance.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+DEFAULT_PROFILE = os.getenv("IMAGE_GEN_PROFILE", "standard")
+
+
+@dataclass(frozen=True)
+class InferenceProfile:
+    name: str
+    steps: Optional[int] = None
+    guidance: Optional[float] = None
+    # diffusers scheduler class name, e.g. "FlowMatchEulerDiscreteScheduler"
+    scheduler: Optional[str] = None
+    # Model id/name to load instead of the backend default (e.g. a distilled model)
+    model_variant: Optional[str] = None
+    use_reprompt: Optional[bool] = None
+    use_refiner: Optional[bool] = None
+
+
+_PROFILES: Dict[str, Dict[str, InferenceProfile]] = {
+    "qwen": {
+        # true_cfg_scale <= 1 skips the negative-prompt pass, halving per-step cost
+        "draft": InferenceProfile("draft", steps=12, guidance=1.0),
+        "standard": InferenceProfile("standard", steps=50, guidance=4.0),
+        "final": InferenceProfile("final", steps=80, guidance=4.0),
+    },
+    "hunyuan": {
+        "draft": InferenceProfile(
+            "draft",
+            steps=8,
+            guidance=3.25,
+            model_variant="hunyuanimage-v2.1-distilled",
+            use_reprompt=False,
+            use_refiner=False,
+        ),
+        "standard": InferenceProfile("standard"),
+        "final": InferenceProfile("final", use_reprompt=True, use_refiner=True),
+    },
+}
+
+
+def register_profile(backend: str, profile: InferenceProfile) -> None:
+    """Add or replace a profile for ``backend``."""
+    _PROFILES.setdefault(backend, {})[profile.name] = profile
+
+
+def profile_names(backend: Optional[str] = None) -> List[str]:
+    if backend is not None:
+        return sorted(_PROFILES.get(backend, {}))
+    return sorted({name for table in _PROFILES.values() for name in table})
+
+
+def get_profile(backend: str, name: Optional[str] = None) -> Optional[InferenceProfile]:
+    """Resolve ``name`` (or the default) for ``backend``.
+
+    Returns None for backends without profiles. Raises ValueError for a profile
+    name no backend defines.
+    """
+    name = (name or DEFAULT_PROFILE).lower()
+    table = _PROFILES.get(backend)
+    if table is not None and name in table:
+        return table[name]
+    if name not in profile_names():
+        raise ValueError(f"Unknown profile {name!r} (known: {', '.join(profile_names())})")
+    return None
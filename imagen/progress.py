@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+"""Step progress, previews and cooperative cancellation for generations.
+
+A ``GenerationControl`` travels with a request through a contextvar (and into
+executor threads, which copy the context). Backends call ``report()`` between
+diffusion steps and stop early once ``cancelled`` is set. ``stream_generation``
+wraps any backend call as an async iterator of ``ProgressEvent`` followed by the
+final ``ImageResult``; closing the iterator early cancels the generation.
+"""
+
+import asyncio
+import contextvars
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Iterator, Optional, Union
+
+from .backends.base import ImageBackend, ImageResult
+
+
+class GenerationCancelled(Exception):
+    """Raised by a backend that stopped because its request was cancelled."""
+
+
+@dataclass
+class ProgressEvent:
+    step: int
+    total: int
+    # Optional low-res PNG preview of the current latents
+    preview: Optional[bytes] = None
+
+
+class GenerationControl:
+    """Per-request progress sink and cancellation flag (thread-safe)."""
+
+    def __init__(
+        self,
+        on_progress: Optional[Callable[[ProgressEvent], None]] = None,
+        previews: bool = False,
+        preview_every: int = 5,
+    ):
+        self.on_progress = on_progress
+        self.previews = previews
+        self.preview_every = max(1, preview_every)
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise GenerationCancelled("Generation was cancelled")
+
+    def wants_preview(self, step: int, total: int) -> bool:
+        return self.previews and (step % self.preview_every == 0 or step == total)
+
+    def report(self, step: int, total: int, preview: Optional[bytes] = None) -> None:
+        if self.on_progress is not None:
+            self.on_progress(ProgressEvent(step=step, total=total, preview=preview))
+
+
+_current: "contextvars.ContextVar[Optional[GenerationControl]]" = contextvars.ContextVar(
+    "imagen_generation_control", default=None
+)
+
+
+def current_control() -> Optional[GenerationControl]:
+    return _current.get()
+
+
+@contextmanager
+def controlled(control: GenerationControl) -> Iterator[GenerationControl]:
+    token = _current.set(control)
+    try:
+        yield control
+    finally:
+        _current.reset(token)
+
+
+async def stream_generation(
+    backend: ImageBackend,
+    previews: bool = False,
+    preview_every: int = 5,
+    **kwargs: Any,
+) -> AsyncIterator[Union[ProgressEvent, ImageResult]]:
+    """Run ``backend.generate_image(**kwargs)``, yielding progress then the result."""
+    loop = asyncio.get_running_loop()
+    queue: "asyncio.Queue[ProgressEvent]" = asyncio.Queue()
+
+    def on_progress(event: ProgressEvent) -> None:
+        # Called from executor threads; hand the event to the loop
+        loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    control = GenerationControl(on_progress=on_progress, previews=previews, preview_every=preview_every)
+    ctx = contextvars.copy_context()
+    ctx.run(_current.set, control)
+    task = asyncio.create_task(backend.generate_image(**kwargs), context=ctx)
+    try:
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield getter.result()
+                continue
+            getter.cancel()
+            while not queue.empty():
+                yield queue.get_nowait()
+            yield task.result()
+            return
+    finally:
+        if not task.done():
+            control.cancel()
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, GenerationCancelled):
+                pass
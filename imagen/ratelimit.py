@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+"""Client-side rate limiting and retry helpers for remote backends."""
+
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """Async token bucket: ``rate`` tokens/second, bursts up to ``capacity``.
+
+    A non-positive rate disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return
+            await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 20.0) -> float:
+    """Exponential backoff with full jitter for the given zero-based attempt."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+async def retry_async(
+    fn: Callable[[], Awaitable[T]],
+    is_retryable: Callable[[BaseException], bool],
+    max_retries: int = 4,
+    base: float = 0.5,
+    cap: float = 20.0,
+) -> T:
+    """Call ``fn`` and retry retryable failures with jittered exponential backoff."""
+    attempt = 0
+    while True:
+        try:
+            return await fn()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            await asyncio.sleep(backoff_delay(attempt, base, cap))
+            attempt += 1
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+"""Single-flight coalescing of identical in-flight generations.
+
+Clients retry after timeouts and several agents often ask for the same seeded
+image at once. ``SingleFlightBackend`` runs each distinct request (keyed like the
+result cache: backend, model, prompt, negative prompt, size, seed, format and
+options) once; identical requests arriving while it runs attach to it and share
+its result. It is independent of ``ResultCache`` and works with caching off.
+
+The shared run has its own ``GenerationControl`` that fans progress out to every
+waiter. A waiter that goes away only detaches; the run is cancelled once the last
+waiter has left. Unseeded requests are not reproducible, so they are never
+coalesced.
+"""
+
+import asyncio
+import dataclasses
+import threading
+import weakref
+from typing import Any, Dict, List, Optional
+
+from .backends.base import ImageBackend, ImageResult, WrappedBackend
+from .cache import request_key
+from .metrics import metrics
+from .progress import GenerationControl, ProgressEvent, controlled, current_control
+
+
+class _Flight:
+    """One shared generation and the requests waiting on it."""
+
+    def __init__(self) -> None:
+        self.waiters = 0
+        self.task: Optional["asyncio.Task[ImageResult]"] = None
+        self.control = GenerationControl(on_progress=self._fan_out)
+        self._controls: List[GenerationControl] = []
+        # Progress arrives on executor threads while waiters join on the loop
+        self._lock = threading.Lock()
+
+    def join(self, control: Optional[GenerationControl]) -> None:
+        self.waiters += 1
+        if control is None:
+            return
+        with self._lock:
+            self._controls.append(control)
+        if control.previews:
+            self.control.previews = True
+            self.control.preview_every = min(c.preview_every for c in self._controls if c.previews)
+
+    def leave(self, control: Optional[GenerationControl]) -> bool:
+        """Detach a waiter; True if it was the last one."""
+        self.waiters -= 1
+        if control is not None:
+            with self._lock:
+                self._controls = [c for c in self._controls if c is not control]
+        return self.waiters == 0
+
+    def _fan_out(self, event: ProgressEvent) -> None:
+        with self._lock:
+            controls = list(self._controls)
+        for control in controls:
+            preview = event.preview if control.wants_preview(event.step, event.total) else None
+            control.report(event.step, event.total, preview)
+
+
+class SingleFlightBackend(WrappedBackend):
+    """Wrap a backend so identical concurrent seeded requests run once."""
+
+    def __init__(self, inner: ImageBackend):
+        super().__init__(inner)
+        # In-flight tasks are bound to their event loop
+        self._flights: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, _Flight]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def in_flight(self) -> int:
+        """Distinct generations currently running on this loop."""
+        return len(self._flights.get(asyncio.get_running_loop(), {}))
+
+    def _start(self, flights: Dict[str, _Flight], key: str, call: Dict[str, Any]) -> _Flight:
+        flight = _Flight()
+        with controlled(flight.control):
+            # The task copies the current context, including the shared control
+            flight.task = asyncio.ensure_future(self.inner.generate_image(**call))
+
+        def done(_: "asyncio.Task[ImageResult]") -> None:
+            if flights.get(key) is flight:
+                del flights[key]
+
+        flight.task.add_done_callback(done)
+        flights[key] = flight
+        return flight
+
+    async def generate_image(
+        self,
+        prompt: str,
+        size: str = "1024x1024",
+        fmt: str = "png",
+        seed: Optional[int] = None,
+        negative_prompt: Optional[str] = None,
+        **kwargs: Any,
+    ) -> ImageResult:
+        call = dict(prompt=prompt, size=size, fmt=fmt, seed=seed, negative_prompt=negative_prompt, **kwargs)
+        if seed is None:
+            return await self.inner.generate_image(**call)
+        key = request_key(self.name, self.model_id, prompt, negative_prompt, size, seed, fmt, **kwargs)
+        flights = self._flights.setdefault(asyncio.get_running_loop(), {})
+        flight = flights.get(key)
+        if flight is None:
+            flight = self._start(flights, key, call)
+        else:
+            metrics.inc("imagen_singleflight_shared_total", backend=self.name)
+        control = current_control()
+        flight.join(control)
+        assert flight.task is not None
+        try:
+            result = await asyncio.shield(flight.task)
+        finally:
+            if flight.leave(control) and not flight.task.done():
+                # The last waiter went away: stop the generation, and detach it at
+                # once so a retry of the same request starts a fresh one
+                if flights.get(key) is flight:
+                    del flights[key]
+                flight.control.cancel()
+                flight.task.cancel()
+        # Waiters annotate timings (e.g. transport), so each gets its own dict
+        return dataclasses.replace(result, timings=dict(result.timings))
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+
+"""Output sinks: where generated images are written.
+
+Every sink writes through a temporary file that is committed only once the data
+is complete, so readers never see partial images and failed writes leave nothing
+behind:
+
+- ``LocalDirSink``: files under a directory, committed with an atomic rename
+- ``ContentAddressedSink``: files named by the SHA-256 of their content; identical
+  images are stored once
+- ``ObjectStoreSink``: uploads to an ``ObjectStore`` (``LocalObjectStore`` is a
+  filesystem stand-in with the same interface as a remote bucket)
+
+``put`` writes already-encoded bytes; the async ``write``/``write_result``
+variants run on the "io" executor, so writes overlap with generations still in
+flight. ``sink_for`` builds a sink from a spec string (``main-cli.py --sink``).
+"""
+
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, List, Optional, Sequence, Union
+
+from .backends.base import ImageResult
+from .executor import run_blocking
+
+_SPOOL_BYTES = 8 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class Stored:
+    """Where a write ended up."""
+
+    key: str
+    uri: str
+    bytes: int
+    # Local filesystem path, for sinks that have one
+    path: Optional[str] = None
+
+
+class _Writer:
+    """File-like target of one write; ``commit`` publishes it, ``abort`` discards it."""
+
+    def __init__(self, fp: BinaryIO, on_commit: Callable[["_Writer"], Stored], on_abort: Callable[["_Writer"], None]):
+        self.fp = fp
+        self.size = 0
+        self._hash: Optional[Any] = None
+        self._on_commit = on_commit
+        self._on_abort = on_abort
+
+    def hash_content(self) -> None:
+        self._hash = hashlib.sha256()
+
+    @property
+    def digest(self) -> str:
+        assert self._hash is not None
+        return self._hash.hexdigest()
+
+    def write(self, data: bytes) -> int:
+        if self._hash is not None:
+            self._hash.update(data)
+        self.size += len(data)
+        return self.fp.write(data)
+
+    def flush(self) -> None:
+        self.fp.flush()
+
+    def commit(self) -> Stored:
+        return self._on_commit(self)
+
+    def abort(self) -> None:
+        self._on_abort(self)
+
+
+def _temp_writer(directory: Path, on_commit: Callable[[_Writer, str], Stored]) -> _Writer:
+    """Writer backed by a hidden temp file in ``directory`` (same filesystem as the target)."""
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+
+    def commit(writer: _Writer) -> Stored:
+        writer.fp.close()
+        try:
+            return on_commit(writer, tmp)
+        except BaseException:
+            abort(writer)
+            raise
+
+    def abort(writer: _Writer) -> None:
+        writer.fp.close()
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+    return _Writer(os.fdopen(fd, "wb"), commit, abort)
+
+
+def _stored_file(path: Path, size: int, key: str) -> Stored:
+    return Stored(key=key, uri=path.resolve().as_uri(), bytes=size, path=str(path))
+
+
+class OutputSink:
+    """Base class; subclasses implement ``_open(name)`` returning a ``_Writer``."""
+
+    def _open(self, name: str) -> _Writer:
+        raise NotImplementedError
+
+    def _write_with(self, name: str, fill: Callable[[_Writer], None]) -> Stored:
+        writer = self._open(name)
+        try:
+            fill(writer)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.commit()
+
+    def put(self, name: str, data: bytes) -> Stored:
+        return self._write_with(name, lambda w: w.write(data))
+
+    async def write(self, name: str, data: bytes) -> Stored:
+        return await run_blocking("io", self.put, name, data)
+
+    async def write_result(self, result: ImageResult, names: Optional[Sequence[str]] = None) -> List[Stored]:
+        """Write a result and its renditions concurrently (default names: their filenames)."""
+        outputs = [result, *result.renditions]
+        names = list(names) if names is not None else [r.filename for r in outputs]
+        return list(await asyncio.gather(*(self.write(n, r.content) for n, r in zip(names, outputs))))
+
+
+class LocalDirSink(OutputSink):
+    """Files under ``root``; names may contain subdirectories but must stay inside it."""
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+
+    def _path(self, name: str) -> Path:
+        root = self.root.resolve()
+        path = (root / name).resolve()
+        if path != root and root not in path.parents:
+            raise ValueError(f"Output name {name!r} escapes the sink directory")
+        return path
+
+    def _open(self, name: str) -> _Writer:
+        path = self._path(name)
+
+        def commit(writer: _Writer, tmp: str) -> Stored:
+            os.replace(tmp, path)
+            return _stored_file(path, writer.size, name)
+
+        return _temp_writer(path.parent, commit)
+
+
+class ContentAddressedSink(OutputSink):
+    """Files named ``<sha256[:digest_chars]><ext>``; the requested name only supplies the extension."""
+
+    def __init__(self, root: Union[str, Path], digest_chars: int = 16):
+        self.root = Path(root)
+        self.digest_chars = digest_chars
+
+    def _target(self, digest: str, name: str) -> Path:
+        return self.root / f"{digest[: self.digest_chars]}{Path(name).suffix}"
+
+    def put(self, name: str, data: bytes) -> Stored:
+        # The digest is known up front: skip the write entirely for stored content
+        path = self._target(hashlib.sha256(data).hexdigest(), name)
+        if path.exists():
+            return _stored_file(path, len(data), path.name)
+        return super().put(name, data)
+
+    def _open(self, name: str) -> _Writer:
+        def commit(writer: _Writer, tmp: str) -> Stored:
+            path = self._target(writer.digest, name)
+            if path.exists():
+                os.unlink(tmp)
+            else:
+                os.replace(tmp, path)
+            return _stored_file(path, writer.size, path.name)
+
+        writer = _temp_writer(self.root, commit)
+        writer.hash_content()
+        return writer
+
+
+class ObjectStore:
+    """Minimal blob-store interface (e.g. an S3 or GCS bucket)."""
+
+    def put_object(self, key: str, fp: BinaryIO, size: int) -> str:
+        """Upload ``size`` bytes from ``fp`` under ``key``; returns the object's URI."""
+        raise NotImplementedError
+
+    def get_object(self, key: str) -> bytes:
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+
+class LocalObjectStore(ObjectStore):
+    """Filesystem stand-in for an object store: keys map to files under ``root``."""
+
+    def __init__(self, root: Union[str, Path]):
+        self._dir = LocalDirSink(root)
+
+    def put_object(self, key: str, fp: BinaryIO, size: int) -> str:
+        return self._dir._write_with(key, lambda w: shutil.copyfileobj(fp, w)).uri  # type: ignore[arg-type]
+
+    def get_object(self, key: str) -> bytes:
+        return self._dir._path(key).read_bytes()
+
+    def exists(self, key: str) -> bool:
+        return self._dir._path(key).exists()
+
+
+class ObjectStoreSink(OutputSink):
+    """Stages each write in a spooled temp file, then uploads it as one object."""
+
+    def __init__(self, store: ObjectStore, prefix: str = ""):
+        self.store = store
+        self.prefix = prefix
+
+    def _open(self, name: str) -> _Writer:
+        key = self.prefix + name
+        spool = tempfile.SpooledTemporaryFile(max_size=_SPOOL_BYTES)
+
+        def commit(writer: _Writer) -> Stored:
+            try:
+                spool.seek(0)
+                uri = self.store.put_object(key, spool, writer.size)  # type: ignore[arg-type]
+            finally:
+                spool.close()
+            return Stored(key=key, uri=uri, bytes=writer.size)
+
+        return _Writer(spool, commit, lambda writer: spool.close())  # type: ignore[arg-type]
+
+
+def sink_for(spec: str) -> OutputSink:
+    """Build a sink from ``dir:PATH`` (or a bare path), ``cas:PATH`` or ``object:PATH``."""
+    kind, sep, path = spec.partition(":")
+    if not sep or len(kind) == 1:  # bare path, or a Windows drive letter
+        return LocalDirSink(spec)
+    if kind == "dir":
+        return LocalDirSink(path)
+    if kind == "cas":
+        return ContentAddressedSink(path)
+    if kind == "object":
+        return ObjectStoreSink(LocalObjectStore(path))
+    raise ValueError(f"Unknown sink {spec!r} (expected dir:, cas: or object:)")
+
+
+async def save(path: Union[str, Path], data: bytes) -> Stored:
+    """Atomically write ``data`` to ``path`` off the event loop."""
+    path = Path(path)
+    return await LocalDirSink(path.parent).write(path.name, data)
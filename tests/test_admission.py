@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+import pytest
+
+from imagen.admission import AdmissionController, DeadlineExceeded, Overloaded, admit, get_controller
+
+
+async def _hold(controller: AdmissionController, release: asyncio.Event, deadline=None):
+    async with controller.slot(deadline):
+        await release.wait()
+
+
+@pytest.mark.asyncio
+async def test_rejects_fast_when_queue_is_full_and_hands_slots_over_in_order():
+    controller = AdmissionController("t", max_in_flight=1, max_queued=1)
+    release = asyncio.Event()
+    running = asyncio.create_task(_hold(controller, release))
+    await asyncio.sleep(0)
+    waiting = asyncio.create_task(_hold(controller, release))
+    await asyncio.sleep(0)
+    assert (controller.in_flight, controller.queued) == (1, 1)
+
+    with pytest.raises(Overloaded) as exc:
+        async with controller.slot():
+            pass
+    assert exc.value.retry_after >= 1
+
+    release.set()
+    await asyncio.gather(running, waiting)
+    assert (controller.in_flight, controller.queued, controller.rejected) == (0, 0, 1)
+
+
+@pytest.mark.asyncio
+async def test_queued_requests_past_their_deadline_are_dropped():
+    loop = asyncio.get_running_loop()
+    controller = AdmissionController("t", max_in_flight=1, max_queued=4)
+    release = asyncio.Event()
+    running = asyncio.create_task(_hold(controller, release))
+    await asyncio.sleep(0)
+    with pytest.raises(DeadlineExceeded):
+        await _hold(controller, release, deadline=loop.time() + 0.05)
+    assert controller.queued == 0 and controller.expired == 1
+    release.set()
+    await running
+    assert controller.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_admit_cancels_generation_that_outlives_its_timeout():
+    with pytest.raises(DeadlineExceeded):
+        async with admit("mock", timeout=0.05):
+            await asyncio.sleep(5)
+    assert get_controller("mock").in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_http_returns_503_with_retry_after_when_saturated(monkeypatch):
+    pytest.importorskip("PIL")
+    from imagen.http_server import HTTPError, ImageHTTPServer
+
+    monkeypatch.setenv("IMAGE_GEN_MOCK_MAX_IN_FLIGHT", "1")
+    monkeypatch.setenv("IMAGE_GEN_MOCK_MAX_QUEUED", "1")
+    controller = get_controller("mock")
+    release = asyncio.Event()
+    holders = [asyncio.create_task(_hold(controller, release)) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    try:
+        with pytest.raises(HTTPError) as exc:
+            await ImageHTTPServer()._dispatch("POST", "/generate", b'{"prompt": "p", "backend": "mock"}')
+    finally:
+        release.set()
+        await asyncio.gather(*holders)
+    assert exc.value.status == 503 and int(exc.value.headers["Retry-After"]) >= 1
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import time
+
+import pytest
+
+from imagen.backends import ImageBackend, InstanceRegistry, get_backend, unload_backend
+
+
+class _Heavy(ImageBackend):
+    name = "heavy"
+    built = 0
+
+    def __init__(self, model_id: str = "m"):
+        type(self).built += 1
+        self.model_id = model_id
+        self.loaded = False
+
+    async def load(self) -> None:
+        self.loaded = True
+
+    def unload(self) -> None:
+        self.loaded = False
+
+
+def test_get_backend_reuses_instance():
+    unload_backend("mock")
+    a = get_backend("mock")
+    b = get_backend("mock")
+    assert a is b
+    assert unload_backend("mock") == 1
+    assert get_backend("mock") is not a
+
+
+def test_registry_keys_by_constructor_args():
+    reg = InstanceRegistry()
+    a = reg.get("heavy", _Heavy, {"model_id": "a"})
+    assert reg.get("heavy", _Heavy, {"model_id": "a"}) is a
+    assert reg.get("heavy", _Heavy, {"model_id": "b"}) is not a
+    assert len(reg.keys()) == 2
+
+
+@pytest.mark.asyncio
+async def test_registry_idle_eviction_unloads():
+    reg = InstanceRegistry(idle_timeout=10)
+    b = reg.get("heavy", _Heavy)
+    await b.load()
+    assert await reg.evict_idle() == 0
+    assert await reg.evict_idle(now=time.monotonic() + 11) == 1
+    assert b.loaded is False
+    assert reg.keys() == []
+
+
+@pytest.mark.asyncio
+async def test_running_generations_keep_their_instance_loaded():
+    release = asyncio.Event()
+
+    class _Slow(_Heavy):
+        async def generate_image(self, prompt, **kwargs):
+            await release.wait()
+            return prompt
+
+    reg = InstanceRegistry(idle_timeout=10)
+    b = reg.get("slow", _Slow)
+    await b.load()
+    running = asyncio.ensure_future(b.generate_image("p"))
+    await asyncio.sleep(0)
+    # Longer than the idle timeout, but a generation is still running
+    assert await reg.evict_idle(now=time.monotonic() + 60) == 0
+    assert b.loaded and not running.done()
+
+    release.set()
+    assert await running == "p"
+    assert await reg.evict_idle(now=time.monotonic() + 11) == 1
+    assert b.loaded is False
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 
+import sys
+
 import pytest
 from imagen.backends import get_backend
 
@@ -16,3 +18,109 @@ def test_get_backend_hunyuan_instance():
     pytest.importorskip("torch")
     b = get_backend("hunyuan")
     assert getattr(b, "name", "") == "hunyuan"
+
+
+def test_backend_modules_import_without_heavy_frameworks():
+    from imagen.bench import import_times
+
+    report = import_times(["imagen.mcp", "imagen.backends.qwen", "imagen.backends.hunyuan"])
+    for module, info in report.items():
+        assert "error" not in info, module
+        assert info["heavy_modules"] == [], module
+
+
+def test_available_backends_reports_mock():
+    from imagen.backends import available_backends
+
+    torch_loaded = "torch" in sys.modules
+    report = available_backends()
+    assert set(report) >= {"mock", "gemini", "qwen", "hunyuan"}
+    assert all("available" in info for info in report.values())
+    # The probe must not import the frameworks it checks for
+    assert ("torch" in sys.modules) == torch_loaded
+
+
+def _registry(*specs):
+    from imagen.backends import BackendRegistry
+
+    return BackendRegistry(list(specs), load_entry_points=False)
+
+
+def test_auto_routes_to_fastest_backend_supporting_request():
+    from imagen.backends import BackendSpec, Capabilities
+    from imagen.backends.mock import MockBackend
+
+    reg = _registry(
+        BackendSpec("fallback", MockBackend, Capabilities(latency_class="realtime"), auto=False),
+        BackendSpec("slow", MockBackend, Capabilities(latency_class="slow")),
+        BackendSpec("fast-small", MockBackend, Capabilities(latency_class="fast", max_size=512, formats=("png",))),
+    )
+    assert reg.route(size="256x256", fmt="png").name == "fast-small"
+    assert reg.route(size="1024x1024", fmt="png").name == "slow"
+    assert reg.route(size="256x256", fmt="webp").name == "slow"
+
+
+def test_auto_falls_back_to_non_auto_backends():
+    from imagen.backends import BackendSpec, Capabilities
+    from imagen.backends.mock import MockBackend
+
+    reg = _registry(
+        BackendSpec("fallback", MockBackend, auto=False),
+        BackendSpec("missing", MockBackend, requires=("surely_not_installed_module",)),
+    )
+    assert reg.route().name == "fallback"
+    assert "surely_not_installed_module" in reg.describe()["missing"]["reason"]
+
+
+def test_lookup_aliases_and_unknown_names():
+    from imagen.backends import get_backend_registry
+
+    reg = get_backend_registry()
+    assert reg.lookup("Qwen-Image").name == "qwen"
+    with pytest.raises(ValueError):
+        reg.lookup("no-such-backend")
+
+
+def test_entry_point_plugins_are_discovered(monkeypatch):
+    import importlib.metadata
+
+    from imagen.backends import BackendRegistry, Capabilities
+    from imagen.backends.mock import MockBackend
+
+    class PluginBackend(MockBackend):
+        name = "plugin"
+        capabilities = Capabilities(latency_class="fast")
+
+    class _EP:
+        name = "plugin"
+
+        def load(self):
+            return PluginBackend
+
+    monkeypatch.setattr(importlib.metadata, "entry_points", lambda group: [_EP()] if group == "imagen.backends" else [])
+    reg = BackendRegistry()
+    spec = reg.lookup("plugin")
+    assert spec.capabilities.latency_class == "fast"
+    assert isinstance(spec.build(), PluginBackend)
+
+
+def test_entry_point_plugins_without_a_name_use_the_entry_point_name(monkeypatch):
+    import importlib.metadata
+
+    from imagen.backends import BackendRegistry, BackendSpec
+    from imagen.backends.mock import MockBackend
+
+    class Unnamed(MockBackend):
+        pass
+
+    class _EP:
+        name = "unnamed"
+
+        def load(self):
+            return Unnamed
+
+    monkeypatch.setattr(importlib.metadata, "entry_points", lambda group: [_EP()] if group == "imagen.backends" else [])
+    reg = BackendRegistry([BackendSpec(name="mock", factory=MockBackend)])
+    assert isinstance(reg.lookup("unnamed").build(), Unnamed)
+    # The built-in mock backend is not shadowed by the subclass
+    assert reg.lookup("mock").factory is MockBackend
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+import pytest
+
+from imagen.batching import MicroBatcher
+
+
+@pytest.mark.asyncio
+async def test_compatible_requests_share_a_batch():
+    calls = []
+
+    async def run_batch(key, items):
+        calls.append((key, list(items)))
+        return [f"{key}:{item}" for item in items]
+
+    batcher = MicroBatcher(run_batch, max_batch_size=8, window=0.05)
+    results = await asyncio.gather(
+        batcher.submit((512, 512), "a"),
+        batcher.submit((512, 512), "b"),
+        batcher.submit((1024, 1024), "c"),
+    )
+    assert results == ["(512, 512):a", "(512, 512):b", "(1024, 1024):c"]
+    assert sorted(len(items) for _, items in calls) == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_without_waiting():
+    async def run_batch(key, items):
+        return items
+
+    batcher = MicroBatcher(run_batch, max_batch_size=2, window=10)
+    results = await asyncio.wait_for(
+        asyncio.gather(batcher.submit("k", 1), batcher.submit("k", 2)), timeout=1
+    )
+    assert results == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_batch_errors_reach_every_caller():
+    async def run_batch(key, items):
+        raise RuntimeError("boom")
+
+    batcher = MicroBatcher(run_batch, max_batch_size=2, window=0.01)
+    results = await asyncio.gather(
+        batcher.submit("k", 1), batcher.submit("k", 2), return_exceptions=True
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_running_batches_are_referenced_until_done():
+    release = asyncio.Event()
+
+    async def run_batch(key, items):
+        await release.wait()
+        return items
+
+    batcher = MicroBatcher(run_batch, max_batch_size=1)
+    pending = asyncio.ensure_future(batcher.submit("k", 1))
+    await asyncio.sleep(0)
+    assert len(batcher._tasks) == 1
+    release.set()
+    assert await pending == 1
+    await asyncio.sleep(0)
+    assert not batcher._tasks
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+import pytest
+
+from imagen import bench
+
+
+def test_percentile_nearest_rank():
+    values = [float(i) for i in range(1, 101)]
+    assert bench.percentile(values, 50) == 50.0
+    assert bench.percentile(values, 99) == 99.0
+    assert bench.percentile([], 50) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_mock_benchmark_report_shape():
+    pytest.importorskip("PIL")
+    report = await bench.run_benchmark(backend="mock", requests=4, concurrency=[1, 2], size="32x32")
+    json.dumps(report)
+    assert report["backend"] == "mock"
+    assert report["cold_start_seconds"]["total"] > 0
+    assert [lvl["concurrency"] for lvl in report["levels"]] == [1, 2]
+    level = report["levels"][1]
+    assert level["errors"] == 0 and level["images_per_sec"] > 0
+    assert set(level["stages_seconds"]) >= {"generate", "transport"}
+    assert report["peak_rss_bytes"] > 0
+
+
+@pytest.mark.asyncio
+async def test_every_request_gets_a_distinct_seed(monkeypatch):
+    from imagen.backends.base import ImageBackend, ImageResult
+
+    seeds = []
+
+    class Recording(ImageBackend):
+        name = "recording"
+
+        async def generate_image(self, prompt, size="1024x1024", fmt="png", seed=None, **kwargs):
+            seeds.append(seed)
+            return ImageResult(b"x", "image/png", "png", "x.png")
+
+    monkeypatch.setattr(bench, "get_backend", lambda *args, **kwargs: Recording())
+    monkeypatch.setattr(bench, "unload_backend", lambda name: None)
+    await bench.run_benchmark(backend="recording", requests=3, concurrency=[1, 2, 4], seed=10)
+    assert len(seeds) == 10 and len(set(seeds)) == 10
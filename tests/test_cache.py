@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from imagen.backends.base import ImageBackend, ImageResult
+from imagen.cache import CachedBackend, ResultCache, request_key
+
+
+class _Counting(ImageBackend):
+    name = "counting"
+    model_id = "m1"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def generate_image(self, prompt, size="1024x1024", fmt="png", seed=None, negative_prompt=None):
+        self.calls += 1
+        return ImageResult(content=b"x" * 10, content_type="image/png", format=fmt, filename=f"{prompt}.{fmt}")
+
+
+def test_request_key_is_stable_and_sensitive():
+    k = request_key("mock", None, "a cat", None, "512x512", 1, "png")
+    assert k == request_key("mock", None, "a cat", "", "512X512", 1, "png")
+    assert k != request_key("mock", None, "a cat", None, "512x512", 2, "png")
+    assert request_key("m", None, "p", None, "1x1", 1, "jpeg") == request_key("m", None, "p", None, "1x1", 1, "jpg")
+
+
+def test_request_key_ignores_options_left_at_their_defaults():
+    base = request_key("qwen", "m", "p", None, "1x1", 1, "png")
+    assert base == request_key("qwen", "m", "p", None, "1x1", 1, "png", profile=None, renditions=[])
+    assert base == request_key("qwen", "m", "p", None, "1x1", 1, "png", profile="Standard")
+    assert base != request_key("qwen", "m", "p", None, "1x1", 1, "png", profile="draft")
+    # Backends without profiles ignore them
+    assert request_key("mock", None, "p", None, "1x1", 1, "png", profile="draft") == request_key(
+        "mock", None, "p", None, "1x1", 1, "png"
+    )
+
+
+@pytest.mark.asyncio
+async def test_seeded_requests_hit_cache_and_unseeded_bypass():
+    inner = _Counting()
+    backend = CachedBackend(inner, ResultCache())
+    await backend.generate_image("a", seed=1)
+    await backend.generate_image("a", seed=1)
+    await backend.generate_image("a")
+    await backend.generate_image("a")
+    assert inner.calls == 3
+    assert backend.cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_memory_tier_respects_byte_budget_and_disk_tier_persists(tmp_path):
+    cache = ResultCache(max_bytes=25, directory=str(tmp_path))
+    for i in range(3):
+        await cache.put(f"{i:02d}" * 32, ImageResult(b"y" * 10, "image/png", "png", f"{i}.png"))
+    assert cache.stats()["entries"] == 2
+    fresh = ResultCache(directory=str(tmp_path))
+    result = await fresh.get("00" * 32)
+    assert result is not None and result.filename == "0.png"
+    assert fresh.stats()["disk_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_keeps_renditions(tmp_path):
+    thumb = ImageResult(b"t" * 4, "image/webp", "webp", "r-8x8.webp")
+    original = ImageResult(b"y" * 10, "image/png", "png", "r.png", renditions=[thumb])
+    await ResultCache(directory=str(tmp_path)).put("ab" * 32, original)
+    result = await ResultCache(directory=str(tmp_path)).get("ab" * 32)
+    assert result is not None and result.renditions == [thumb]
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import json
 import os
 import sys
 from pathlib import Path
@@ -36,3 +37,29 @@ def test_cli_mock(tmp_path: Path, monkeypatch):
     gen_image.main(argv)
     assert out_file.exists()
     assert out_file.stat().st_size > 100
+
+
+def test_cli_batch_resumes_and_logs(tmp_path: Path):
+    manifest = tmp_path / "requests.jsonl"
+    lines = [
+        {"prompt": "one", "size": "64x64", "backend": "mock"},
+        {"prompt": "two", "size": "64x64", "fmt": "jpg", "backend": "mock", "output": str(tmp_path / "two.jpg")},
+    ]
+    manifest.write_text("\n".join(json.dumps(x) for x in lines) + "\n")
+    results = tmp_path / "results.jsonl"
+    argv = ["--batch", str(manifest), "--output-dir", str(tmp_path / "out"), "--results", str(results)]
+    gen_image.main(argv)
+    assert (tmp_path / "out" / "00001.png").exists()
+    assert (tmp_path / "two.jpg").exists()
+    gen_image.main(argv)
+    records = [json.loads(x) for x in results.read_text().splitlines()]
+    assert [r["status"] for r in records[:2]] == ["ok", "ok"]
+    assert all("seconds" in r for r in records[:2])
+    assert [r["status"] for r in records[2:]] == ["skipped", "skipped"]
+
+
+def test_cli_writes_to_a_sink(tmp_path: Path, capsys):
+    bucket = tmp_path / "bucket"
+    gen_image.main(["A test prompt", "--backend", "mock", "--sink", f"object:{bucket}", "--output", "renders/out.png"])
+    assert (bucket / "renders" / "out.png").stat().st_size > 0
+    assert capsys.readouterr().out.strip() == (bucket / "renders" / "out.png").resolve().as_uri()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+from imagen.backends import available_backends
+from imagen.backends.compile import CompileOptions, compile_pipeline, record, warm_up
+
+
+class FakeVAE:
+    def decode(self, latents):
+        return latents
+
+
+class FakePipe:
+    def __init__(self):
+        self.transformer = object()
+        self.vae = FakeVAE()
+
+
+def test_options_from_env(monkeypatch, tmp_path):
+    monkeypatch.setenv("IMAGE_GEN_COMPILE", "1")
+    monkeypatch.setenv("IMAGE_GEN_COMPILE_MODE", "max-autotune")
+    monkeypatch.setenv("IMAGE_GEN_COMPILE_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("IMAGE_GEN_WARMUP_SIZES", "1024x1024, 768x1344")
+    options = CompileOptions.from_env()
+    assert options.enabled and options.mode == "max-autotune"
+    assert options.warmup_shapes() == ((1024, 1024), (768, 1344))
+
+
+def test_compile_wraps_denoiser_and_vae_decoder(monkeypatch, tmp_path):
+    monkeypatch.delenv("TORCHINDUCTOR_CACHE_DIR", raising=False)
+    compiled = []
+
+    def fake_compile(fn, mode):
+        compiled.append((fn, mode))
+        return ("compiled", fn)
+
+    pipe = FakePipe()
+    transformer, decode = pipe.transformer, pipe.vae.decode
+    options = CompileOptions(enabled=True, mode="reduce-overhead", cache_dir=str(tmp_path / "cache"))
+    assert compile_pipeline(pipe, options, compile_fn=fake_compile) >= 0
+    assert pipe.transformer == ("compiled", transformer)
+    assert pipe.vae.decode == ("compiled", decode)
+    assert [mode for _, mode in compiled] == ["reduce-overhead"] * 2
+    assert os.environ["TORCHINDUCTOR_CACHE_DIR"] == str(tmp_path / "cache")
+    assert (tmp_path / "cache").is_dir()
+
+
+def test_warm_up_runs_each_size_and_reports():
+    calls = []
+    options = CompileOptions(warmup_sizes=("512x512", "768x1344"), warmup_steps=3)
+    timings = warm_up(lambda w, h, steps: calls.append((w, h, steps)), options)
+    assert calls == [(512, 512, 3), (768, 1344, 3)]
+    assert set(timings) == {"512x512", "768x1344"}
+
+    record("qwen:test@cpu", compile_seconds=0.5, warmup_seconds=timings)
+    assert available_backends()["qwen"]["compiled"]["qwen:test@cpu"]["compile_seconds"] == 0.5
+
+
+def test_compiles_and_warms_up_on_cpu(monkeypatch, tmp_path):
+    torch = pytest.importorskip("torch")
+    monkeypatch.delenv("TORCHINDUCTOR_CACHE_DIR", raising=False)
+
+    class TinyVAE(torch.nn.Module):
+        def decode(self, latents):
+            return latents.clamp(-1, 1)
+
+    class TinyPipe:
+        def __init__(self):
+            self.transformer = torch.nn.Linear(8, 8)
+            self.vae = TinyVAE()
+
+        def __call__(self, width, height, steps):
+            x = torch.randn(1, height // 64, width // 64, 8)
+            for _ in range(steps):
+                x = self.transformer(x)
+            return self.vae.decode(x)
+
+    pipe = TinyPipe()
+    options = CompileOptions(enabled=True, cache_dir=str(tmp_path), warmup_sizes=("128x128",), warmup_steps=2)
+    compile_pipeline(pipe, options)
+    timings = warm_up(pipe, options)
+    assert timings["128x128"] > 0
+
+
+@pytest.mark.asyncio
+async def test_local_backend_loads_once_and_warms_up(monkeypatch):
+    from imagen.backends import compile as compile_mod
+    from imagen.backends.local import LocalPipelineBackend
+
+    monkeypatch.setattr(
+        compile_mod, "_options", CompileOptions(enabled=True, warmup_sizes=("64x64",), warmup_steps=1)
+    )
+    runs = []
+
+    class _Local(LocalPipelineBackend):
+        name = "local-test"
+        model_id = "m"
+
+        def _load_pipe_inner(self):
+            self._device = "cpu"
+            self._pipe = FakePipe()
+
+        def _warm_up_once(self, width, height, steps):
+            runs.append((width, height, steps))
+
+    backend = _Local()
+    await backend.load()
+    await backend.load()
+    assert runs == [(64, 64, 1)]
+    assert backend._residency_key == "local-test:m@cpu"
+    assert await backend.health()
+    backend.unload()
+    assert backend._pipe is None and not backend._warmed
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+from imagen.backends.embeddings import EmbeddingCache, supports_embeds
+
+
+class FakeTensor:
+    def __init__(self, text: str, nbytes: int = 100):
+        self.text = text
+        self.nbytes = nbytes
+
+    def numel(self) -> int:
+        return self.nbytes
+
+    def element_size(self) -> int:
+        return 1
+
+
+class Encoder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [(FakeTensor(t), None) for t in texts]
+
+
+def test_encodes_each_distinct_text_once_and_counts_hits():
+    cache = EmbeddingCache(max_bytes=10_000)
+    encoder = Encoder()
+
+    first = cache.encode("m", ["a cat", "a cat", " "], encoder)
+    assert [e[0].text for e in first] == ["a cat", "a cat", " "]
+    assert encoder.calls == [["a cat", " "]]
+
+    # Same texts in a later batch, with one new prompt: only that one is encoded
+    cache.encode("m", ["a dog", "a cat", " "], encoder)
+    assert encoder.calls[-1] == ["a dog"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (3, 3, 3)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_bounded_by_bytes_and_keyed_by_model():
+    cache = EmbeddingCache(max_bytes=250)
+    encoder = Encoder()
+    cache.encode("m", ["a", "b"], encoder)
+    cache.encode("m", ["a"], encoder)  # refresh "a"
+    cache.encode("m", ["c"], encoder)  # evicts "b"
+    assert cache.stats()["bytes"] == 200
+    cache.encode("m", ["a", "b"], encoder)
+    assert encoder.calls[-1] == ["b"]
+
+    cache.encode("other", ["a"], encoder)
+    assert encoder.calls[-1] == ["a"]
+    cache.drop("other")
+    assert all(model == "m" for model, _ in cache._items)
+
+
+def test_disabled_cache_still_encodes():
+    cache = EmbeddingCache(max_bytes=0)
+    encoder = Encoder()
+    cache.encode("m", ["a"], encoder)
+    cache.encode("m", ["a"], encoder)
+    assert len(encoder.calls) == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_supports_embeds_checks_call_signature():
+    class WithEmbeds:
+        def encode_prompt(self, prompt):
+            return None
+
+        def __call__(self, prompt=None, prompt_embeds=None):
+            return None
+
+    class PromptOnly:
+        def encode_prompt(self, prompt):
+            return None
+
+        def __call__(self, prompt=None):
+            return None
+
+    assert supports_embeds(WithEmbeds())
+    assert not supports_embeds(PromptOnly())
+    assert not supports_embeds(object())
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from imagen.executor import BackendExecutor
+from imagen.postprocess import encode_image
+
+
+@pytest.mark.asyncio
+async def test_blocking_call_does_not_stall_loop():
+    ex = BackendExecutor("slow", workers=1)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    await ex.run(time.sleep, 0.2)
+    task.cancel()
+    ex.shutdown()
+    assert ticks >= 5
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_is_enforced():
+    ex = BackendExecutor("limited", workers=4, max_concurrency=2)
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def work():
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+
+    await asyncio.gather(*(ex.run(work) for _ in range(6)))
+    ex.shutdown()
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_process_pool_encodes_image():
+    Image = pytest.importorskip("PIL.Image")
+    ex = BackendExecutor("encode-proc", kind="process", workers=1)
+    data = await ex.run(encode_image, Image.new("RGB", (8, 8)), "jpg")
+    ex.shutdown()
+    assert data[:2] == b"\xff\xd8"
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import base64
+import io
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("google.genai")
+Image = pytest.importorskip("PIL.Image")
+
+from imagen.backends.gemini import GeminiBackend
+
+
+def _png(w=32, h=32):
+    buf = io.BytesIO()
+    Image.new("RGB", (w, h), (200, 10, 10)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class _Stub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fail_first = 0
+    requests = 0
+    connections = set()
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", "0")))
+        with self.lock:
+            type(self).requests += 1
+            type(self).connections.add(self.client_address)
+            fail = type(self).fail_first > 0
+            if fail:
+                type(self).fail_first -= 1
+        if fail:
+            body = json.dumps({"error": {"code": 429, "message": "slow down", "status": "RESOURCE_EXHAUSTED"}})
+            status = 429
+        else:
+            part = {"inlineData": {"mimeType": "image/png", "data": base64.b64encode(_png()).decode()}}
+            body = json.dumps({"candidates": [{"content": {"parts": [part], "role": "model"}}]})
+            status = 200
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    _Stub.fail_first, _Stub.requests, _Stub.connections = 0, 0, set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Stub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield _Stub, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_retries_429_then_succeeds(stub):
+    handler, url = stub
+    handler.fail_first = 2
+    backend = GeminiBackend(api_key="k", base_url=url, max_retries=3)
+    result = await backend.generate_image("a red square", size="16x16")
+    assert handler.requests == 3
+    assert result.content_type == "image/png"
+    assert Image.open(io.BytesIO(result.content)).size == (16, 16)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_reuse_one_client(stub):
+    handler, url = stub
+    backend = GeminiBackend(api_key="k", base_url=url, max_concurrency=2)
+    await asyncio.gather(*(backend.generate_image("p", size="32x32") for _ in range(6)))
+    assert handler.requests == 6
+    assert len(backend._states) == 1
+    # Keep-alive: far fewer connections than requests
+    assert len(handler.connections) <= 2
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import json
+
+import pytest
+import pytest_asyncio
+
+from imagen.http_server import ImageHTTPServer
+
+
+async def _request(reader, writer, method, path, body=b"", headers=None):
+    lines = [f"{method} {path} HTTP/1.1", "Host: test", f"Content-Length: {len(body)}"]
+    lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").strip().split("\r\n")
+    resp_headers = {k.lower(): v.strip() for k, _, v in (h.partition(":") for h in header_lines)}
+    payload = await reader.readexactly(int(resp_headers["content-length"]))
+    return int(status_line.split()[1]), resp_headers, payload
+
+
+@pytest_asyncio.fixture
+async def server():
+    pytest.importorskip("PIL")
+    srv = ImageHTTPServer(host="127.0.0.1", port=0, max_body_bytes=1024)
+    await srv.start()
+    yield srv
+    await srv.close()
+
+
+@pytest.mark.asyncio
+async def test_generate_returns_binary_image_over_keepalive(server):
+    reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+    body = json.dumps({"prompt": "a cat", "size": "64x64", "backend": "mock"}).encode()
+    for _ in range(2):
+        status, headers, payload = await _request(reader, writer, "POST", "/generate", body)
+        assert status == 200
+        assert headers["content-type"] == "image/png"
+        assert headers["connection"] == "keep-alive"
+        assert payload.startswith(b"\x89PNG")
+    writer.close()
+
+
+@pytest.mark.asyncio
+async def test_rejects_oversized_and_invalid_requests(server):
+    reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+    status, _, payload = await _request(reader, writer, "POST", "/generate", b"{}")
+    assert status == 400 and b"prompt" in payload
+    status, _, _ = await _request(reader, writer, "POST", "/generate", b"x" * 2048)
+    assert status == 413
+    writer.close()
+
+
+@pytest.mark.asyncio
+async def test_serves_concurrent_clients(server):
+    async def one():
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        body = json.dumps({"prompt": "p", "size": "32x32", "fmt": "jpg", "backend": "mock"}).encode()
+        status, headers, _ = await _request(reader, writer, "POST", "/generate", body, {"Connection": "close"})
+        writer.close()
+        return status, headers["content-type"]
+
+    results = await asyncio.gather(*(one() for _ in range(8)))
+    assert results == [(200, "image/jpeg")] * 8
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_and_server_timing(server):
+    reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+    body = json.dumps({"prompt": "m", "size": "32x32", "backend": "mock"}).encode()
+    _, headers, _ = await _request(reader, writer, "POST", "/generate", body)
+    assert "inference;dur=" in headers["server-timing"]
+    status, headers, payload = await _request(reader, writer, "GET", "/metrics")
+    assert status == 200 and headers["content-type"].startswith("text/plain")
+    assert b'imagen_bytes_out_total{transport="http"}' in payload
+    writer.close()
+
+
+@pytest.mark.asyncio
+async def test_http_and_mcp_map_a_request_to_the_same_key(server, monkeypatch):
+    from imagen import http_server, mcp
+    from imagen.backends.base import ImageBackend, ImageResult
+    from imagen.cache import request_key
+
+    keys = []
+
+    class KeyRecorder(ImageBackend):
+        name = "qwen"
+
+        async def generate_image(self, prompt, size="1024x1024", fmt="png", seed=None, negative_prompt=None, **kwargs):
+            keys.append(request_key(self.name, "m", prompt, negative_prompt, size, seed, fmt, **kwargs))
+            return ImageResult(b"img", "image/png", "png", "x.png")
+
+    recorder = KeyRecorder()
+    monkeypatch.setattr(http_server, "get_backend", lambda *args, **kwargs: recorder)
+    monkeypatch.setattr(mcp, "get_backend", lambda *args, **kwargs: recorder)
+
+    reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+    body = json.dumps({"prompt": "a cat", "size": "64x64", "seed": 3}).encode()
+    status, _, _ = await _request(reader, writer, "POST", "/generate", body)
+    writer.close()
+    assert status == 200
+    await mcp.generate("a cat", size="64x64", seed=3)
+    assert len(keys) == 2 and keys[0] == keys[1]
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import os
+import sqlite3
+import time
+
+import pytest
+
+from imagen.backends.base import ImageResult
+from imagen.jobs import JobQueue, JobStore, load_result
+from imagen.progress import GenerationCancelled
+
+
+async def _wait_for(queue: JobQueue, job_id: str, *statuses: str) -> dict:
+    for _ in range(500):
+        job = await queue.get(job_id)
+        if job["status"] in statuses:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} stuck in {job['status']}")
+
+
+@pytest.mark.asyncio
+async def test_jobs_run_by_priority_and_keep_results(tmp_path):
+    gate = asyncio.Event()
+    order = []
+
+    async def runner(params):
+        if params["prompt"] == "gate":
+            await gate.wait()
+        order.append(params["prompt"])
+        return ImageResult(params["prompt"].encode(), "image/png", "png", "x.png")
+
+    queue = JobQueue(str(tmp_path / "jobs.db"), concurrency=1, runner=runner, poll_interval=0.05)
+    await queue.start()
+    try:
+        first = await queue.submit({"prompt": "gate"})
+        await _wait_for(queue, first, "running")
+        low = await queue.submit({"prompt": "low"})
+        high = await queue.submit({"prompt": "high"}, priority=5)
+        assert (await queue.get(low))["position"] == 1
+        gate.set()
+        job = await _wait_for(queue, low, "succeeded")
+        assert order == ["gate", "high", "low"]
+        assert load_result(job["result"]).content == b"low"
+    finally:
+        await queue.close()
+
+
+@pytest.mark.asyncio
+async def test_cancel_queued_and_running_jobs(tmp_path):
+    started = asyncio.Event()
+
+    async def runner(params):
+        started.set()
+        await asyncio.sleep(30)
+
+    queue = JobQueue(str(tmp_path / "jobs.db"), concurrency=1, runner=runner, poll_interval=0.05)
+    await queue.start()
+    try:
+        running = await queue.submit({"prompt": "a"})
+        queued = await queue.submit({"prompt": "b"})
+        await started.wait()
+        assert await queue.cancel(queued)
+        assert (await queue.get(queued))["status"] == "cancelled"
+        assert await queue.cancel(running)
+        await _wait_for(queue, running, "cancelled")
+        assert not await queue.cancel(running)
+    finally:
+        await queue.close()
+
+
+@pytest.mark.asyncio
+async def test_cooperative_cancellation_is_recorded_as_cancelled(tmp_path):
+    started = asyncio.Event()
+
+    async def runner(params):
+        started.set()
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            # Like a backend that stops between diffusion steps
+            raise GenerationCancelled("Generation cancelled") from None
+
+    queue = JobQueue(str(tmp_path / "jobs.db"), concurrency=1, runner=runner, poll_interval=0.05)
+    await queue.start()
+    try:
+        job_id = await queue.submit({"prompt": "a"})
+        await started.wait()
+        await queue.cancel(job_id)
+        job = await _wait_for(queue, job_id, "cancelled", "failed")
+        assert job["status"] == "cancelled" and job["error"] is None
+    finally:
+        await queue.close()
+
+
+@pytest.mark.asyncio
+async def test_workers_survive_database_errors(tmp_path):
+    async def runner(params):
+        return ImageResult(b"x", "image/png", "png", "x.png")
+
+    queue = JobQueue(str(tmp_path / "jobs.db"), concurrency=1, runner=runner, poll_interval=0.01)
+    await queue.start()
+    claim, failures = queue.store.claim, []
+
+    def flaky_claim(now):
+        if not failures:
+            failures.append(now)
+            raise sqlite3.OperationalError("database is locked")
+        return claim(now)
+
+    queue.store.claim = flaky_claim
+    try:
+        job_id = await queue.submit({"prompt": "a"})
+        await _wait_for(queue, job_id, "succeeded")
+        assert failures
+    finally:
+        await queue.close()
+
+
+@pytest.mark.asyncio
+async def test_jobs_claimed_elsewhere_are_not_cancelled_and_leave_no_orphans(tmp_path):
+    gate = asyncio.Event()
+
+    async def runner(params):
+        await gate.wait()
+        return ImageResult(b"x", "image/png", "png", "x.png")
+
+    queue = JobQueue(str(tmp_path / "jobs.db"), concurrency=1, runner=runner, poll_interval=0.05)
+    await queue.start()
+    try:
+        # Claimed by a worker in another process: this one cannot stop it
+        other = JobStore(str(tmp_path / "jobs.db"))
+        remote = await queue.submit({"prompt": "remote"}, priority=9)
+        assert other.claim(time.time())["id"] == remote
+        assert not await queue.cancel(remote)
+        assert (await queue.get(remote))["status"] == "running"
+
+        # A row finished elsewhere while the local worker ran: its files are dropped
+        local = await queue.submit({"prompt": "local"})
+        await _wait_for(queue, local, "running")
+        assert other.finish(local, "cancelled", time.time(), None)
+        after = await queue.submit({"prompt": "after"})
+        gate.set()
+        # One worker: once the next job is done, the local one has been handled
+        await _wait_for(queue, after, "succeeded")
+        assert (await queue.get(local))["status"] == "cancelled"
+        assert not list(queue.result_dir.glob(f"{local}*"))
+        other.close()
+    finally:
+        await queue.close()
+
+
+@pytest.mark.asyncio
+async def test_interrupted_jobs_resume_after_restart(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    store = JobStore(path)
+    store.insert("j1", {"prompt": "a", "backend": "mock", "size": "32x32"}, 0, 0.0)
+    assert store.claim(1.0)["id"] == "j1"
+    store.close()
+
+    # Default runner: the shared mock backend
+    queue = JobQueue(path, result_dir=str(tmp_path / "out"), concurrency=1, poll_interval=0.05)
+    await queue.start()
+    try:
+        job = await _wait_for(queue, "j1", "succeeded", "failed")
+        assert job["status"] == "succeeded", job["error"]
+        assert os.path.exists(job["result"][0]["path"])
+    finally:
+        await queue.close()
+
+
+@pytest.mark.asyncio
+async def test_finished_jobs_expire_with_their_files(tmp_path):
+    async def runner(params):
+        return ImageResult(b"img", "image/png", "png", "x.png")
+
+    queue = JobQueue(str(tmp_path / "jobs.db"), ttl=60, runner=runner, poll_interval=0.05)
+    await queue.start()
+    try:
+        job_id = await queue.submit({"prompt": "a"})
+        job = await _wait_for(queue, job_id, "succeeded")
+        assert await queue.purge_expired() == 0
+        assert await queue.purge_expired(now=job["finished"] + 61) == 1
+        assert await queue.get(job_id) is None
+        assert not os.path.exists(job["result"][0]["path"])
+    finally:
+        await queue.close()
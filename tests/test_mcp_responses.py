@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+import base64
+
+import pytest
+
+from imagen.backends.base import ImageResult
+from imagen.mcp import format_result, read_chunk
+
+RESULT = ImageResult(content=b"\x89PNG" + bytes(range(256)) * 10, content_type="image/png", format="png", filename="x.png")
+
+
+@pytest.mark.asyncio
+async def test_base64_mode_is_default():
+    out = await format_result(RESULT)
+    assert base64.b64decode(out["base64"]) == RESULT.content
+
+
+@pytest.mark.asyncio
+async def test_image_mode_returns_content_blocks():
+    pytest.importorskip("mcp")
+    image, text = await format_result(RESULT, "image")
+    assert image.type == "image" and base64.b64decode(image.data) == RESULT.content
+    assert '"filename": "x.png"' in text.text
+
+
+@pytest.mark.asyncio
+async def test_file_mode_returns_reference_only(tmp_path):
+    out = await format_result(RESULT, "file", output_dir=tmp_path)
+    assert "base64" not in out
+    assert out["uri"].startswith("file://")
+    assert open(out["path"], "rb").read() == RESULT.content
+
+
+@pytest.mark.asyncio
+async def test_chunked_mode_round_trips(tmp_path):
+    out = await format_result(RESULT, "chunked", chunk_size=1000, output_dir=tmp_path)
+    assert out["chunks"] == 3
+    data = b"".join(
+        base64.b64decode(read_chunk(out["path"], i, 1000, output_dir=tmp_path)["base64"]) for i in range(out["chunks"])
+    )
+    assert data == RESULT.content
+    with pytest.raises(ValueError):
+        read_chunk(__file__, 0, output_dir=tmp_path)
+
+
+@pytest.mark.asyncio
+async def test_renditions_are_returned_with_the_main_image(tmp_path):
+    thumb = ImageResult(content=b"RIFFthumb", content_type="image/webp", format="webp", filename="x-64x64.webp")
+    result = ImageResult(RESULT.content, RESULT.content_type, RESULT.format, RESULT.filename, renditions=[thumb])
+    out = await format_result(result)
+    assert base64.b64decode(out["renditions"][0]["base64"]) == thumb.content
+    out = await format_result(result, "file", output_dir=tmp_path)
+    assert out["renditions"][0]["path"].endswith(".webp") and out["path"].endswith(".png")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_seeded_calls_run_once(monkeypatch):
+    import asyncio
+
+    from imagen import mcp
+    from imagen.backends.base import ImageBackend
+    from imagen.singleflight import SingleFlightBackend
+
+    class Counting(ImageBackend):
+        name = "mock"
+        calls = []
+
+        async def generate_image(self, prompt, size="1024x1024", fmt="png", seed=None, negative_prompt=None, **kwargs):
+            self.calls.append((prompt, seed, negative_prompt))
+            await asyncio.sleep(0.01)
+            return ImageResult(b"img", "image/png", "png", "x.png")
+
+    inner = Counting()
+    backend = SingleFlightBackend(inner)
+    monkeypatch.setattr(mcp, "get_backend", lambda *args, **kwargs: backend)
+    results = await asyncio.gather(
+        *(mcp.generate("a cat", seed=5, negative_prompt="blur", timeout=5) for _ in range(2))
+    )
+    assert inner.calls == [("a cat", 5, "blur")]
+    assert [r["base64"] for r in results] == [base64.b64encode(b"img").decode("ascii")] * 2
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from imagen.metrics import Metrics, metrics, render_prometheus, span, summary_line, track_request
+
+
+def test_spans_accumulate_into_request_timings():
+    with track_request("unit") as timings:
+        with span("encode"):
+            pass
+        with span("encode"):
+            pass
+    assert set(timings) == {"encode", "total"}
+    assert metrics.counter("imagen_requests_total", backend="unit") >= 1
+
+
+def test_errors_are_counted():
+    before = metrics.counter("imagen_errors_total", backend="unit-err")
+    with pytest.raises(ValueError):
+        with track_request("unit-err"):
+            raise ValueError("boom")
+    assert metrics.counter("imagen_errors_total", backend="unit-err") == before + 1
+
+
+def test_disabled_metrics_record_nothing():
+    m = Metrics(enabled=False)
+    m.inc("x")
+    m.observe("stage", 1.0)
+    assert m.snapshot() == ({}, {})
+
+
+def test_prometheus_text_and_summary():
+    with track_request("prom"):
+        with span("inference"):
+            pass
+    text = render_prometheus()
+    assert 'imagen_requests_total{backend="prom"}' in text
+    assert 'imagen_stage_seconds_count{stage="inference"}' in text
+    assert "requests_total=" in summary_line()
+
+
+@pytest.mark.asyncio
+async def test_mock_result_carries_stage_timings():
+    pytest.importorskip("PIL")
+    from imagen.backends.mock import MockBackend
+
+    result = await MockBackend().generate_image("p", size="32x32")
+    assert {"inference", "encode", "total"} <= set(result.timings)
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import io
+import random
+import time
+
+import pytest
+
+pytest.importorskip("PIL")
+
+from PIL import Image  # noqa: E402
+
+from imagen.backends.mock import Latency, MockBackend, MockFailure  # noqa: E402
+
+
+def test_latency_specs():
+    assert Latency.parse(None).sample(random.Random()) == 0.0
+    assert Latency.parse("25").sample(random.Random()) == 0.025
+    assert Latency.parse("fixed:25") == Latency("fixed", 25.0)
+    assert Latency.parse("normal:50,10") == Latency("normal", 50.0, 10.0)
+    assert Latency.parse("longtail:40") == Latency("longtail", 40.0, 1.0)
+    for bad in ("normal:50", "gamma:1,2", "fixed:abc"):
+        with pytest.raises(ValueError):
+            Latency.parse(bad)
+
+    rng = random.Random(0)
+    samples = sorted(Latency.parse("longtail:10,1.5").sample(rng) for _ in range(2000))
+    assert all(s >= 0 for s in samples)
+    # Median near 10ms, with a tail far beyond it
+    assert 0.008 < samples[1000] < 0.012
+    assert samples[-20] > 0.1
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_queues_requests():
+    backend = MockBackend(latency="fixed:30", concurrency=2, render="canvas")
+    t0 = time.perf_counter()
+    await asyncio.gather(*(backend.generate_image("p", size="32x32", seed=i) for i in range(4)))
+    # Two waves of 30ms
+    assert time.perf_counter() - t0 >= 0.06
+
+
+@pytest.mark.asyncio
+async def test_failure_injection_and_memory_footprint():
+    backend = MockBackend(failure_rate=1.0, memory_mb=1)
+    with pytest.raises(MockFailure):
+        await backend.generate_image("p", size="32x32")
+    assert backend.resident_bytes == 1024 * 1024
+    backend.unload()
+    assert backend.resident_bytes == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("render", ["canvas", "numpy"])
+async def test_fast_render_modes(render):
+    if render == "numpy":
+        pytest.importorskip("numpy")
+    backend = MockBackend(render=render)
+    first = await backend.generate_image("p", size="64x48", fmt="png", seed=3)
+    again = await backend.generate_image("other prompt", size="64x48", fmt="png", seed=3)
+    assert first.content == again.content
+    assert Image.open(io.BytesIO(first.content)).size == (64, 48)
+
+
+@pytest.mark.asyncio
+async def test_canvas_cache_is_bounded_by_bytes(monkeypatch):
+    from imagen.backends import mock
+    from imagen.backends.base import Rendition
+
+    monkeypatch.setattr(mock, "CANVAS_CACHE_BYTES", 4096)
+    backend = MockBackend(render="canvas")
+    for width in range(64, 1024, 64):
+        await backend.generate_image("p", size=f"{width}x{width}", fmt="jpg", seed=1)
+    assert 0 < mock._canvas_cache_bytes <= 4096
+    assert len(mock._canvas_cache) < 15
+
+    result = await backend.generate_image("p", size="64x64", seed=1, renditions=[Rendition("webp", "16x16")])
+    assert Image.open(io.BytesIO(result.renditions[0].content)).size == (16, 16)
+
+
+def test_unknown_render_mode():
+    with pytest.raises(ValueError):
+        MockBackend(render="raytrace")
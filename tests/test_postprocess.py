@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+import io
+
+import pytest
+from PIL import Image
+
+from imagen.postprocess import (
+    EncodeOptions,
+    content_type,
+    convert_async,
+    convert_bytes,
+    encode_image,
+    parse_renditions,
+)
+
+
+def _encoded(size=(64, 64), fmt="PNG", mode="RGB") -> bytes:
+    buf = io.BytesIO()
+    Image.new(mode, size, (200, 30, 30)).save(buf, format=fmt)
+    return buf.getvalue()
+
+
+def test_convert_skips_matching_format_and_size():
+    data = _encoded()
+    assert convert_bytes(data, "png", (64, 64)) is data
+    assert convert_bytes(data, "png") is data
+
+
+def test_convert_resizes_and_changes_format():
+    out = Image.open(io.BytesIO(convert_bytes(_encoded((256, 256), "JPEG"), "webp", (32, 48))))
+    assert (out.format, out.size) == ("WEBP", (32, 48))
+    out = Image.open(io.BytesIO(convert_bytes(_encoded((16, 16)), "jpeg", (40, 40))))
+    assert (out.format, out.size) == ("JPEG", (40, 40))
+
+
+def test_encode_options_and_alpha_to_jpeg():
+    img = Image.effect_noise((128, 128), 40).convert("RGB")
+    fast = encode_image(img, "png", EncodeOptions(png_compress_level=0))
+    small = encode_image(img, "png", EncodeOptions(png_compress_level=9))
+    assert len(fast) > len(small)
+    data = encode_image(Image.new("RGBA", (8, 8)), "jpg")
+    assert Image.open(io.BytesIO(data)).format == "JPEG"
+    assert content_type("jpg") == content_type("JPEG") == "image/jpeg"
+
+
+@pytest.mark.asyncio
+async def test_convert_async_runs_on_encode_pool():
+    data = await convert_async(_encoded(), "jpg", (20, 10))
+    assert Image.open(io.BytesIO(data)).size == (20, 10)
+
+
+@pytest.mark.asyncio
+async def test_backend_returns_renditions_from_one_generation():
+    from imagen.backends.mock import MockBackend
+
+    renditions = parse_renditions(["webp:32x32", {"fmt": "jpeg"}])
+    result = await MockBackend().generate_image("a cat", size="64x64", seed=1, renditions=renditions)
+    thumb, full = (Image.open(io.BytesIO(r.content)) for r in result.renditions)
+    assert (thumb.format, thumb.size) == ("WEBP", (32, 32))
+    assert (full.format, full.size) == ("JPEG", (64, 64))
+    assert result.renditions[0].filename.endswith("-32x32.webp")
+    with pytest.raises(ValueError):
+        parse_renditions(["gif"])
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+from PIL import Image
+
+from imagen import profiles
+from imagen.backends import BackendSpec, get_backend, register_backend
+from imagen.backends.mock import MockBackend
+from imagen.profiles import InferenceProfile, get_profile
+
+
+def test_get_profile_resolves_per_backend():
+    assert get_profile("qwen", "draft").steps < get_profile("qwen").steps
+    assert get_profile("hunyuan", "draft").model_variant
+    # Backends without profiles accept any known name
+    assert get_profile("mock", "final") is None
+    with pytest.raises(ValueError):
+        get_profile("qwen", "turbo")
+
+
+def test_get_backend_rejects_unknown_profile():
+    with pytest.raises(ValueError):
+        get_backend("mock", profile="turbo")
+
+
+def test_model_variant_selects_separate_instance(monkeypatch):
+    class VariantBackend(MockBackend):
+        def __init__(self, model_id: str = "base"):
+            self.model_id = model_id
+
+    register_backend(BackendSpec("variant-test", VariantBackend, variant_arg="model_id"), replace=True)
+    monkeypatch.setitem(
+        profiles._PROFILES,
+        "variant-test",
+        {"draft": InferenceProfile("draft", model_variant="distilled"), "standard": InferenceProfile("standard")},
+    )
+    default = get_backend("variant-test")
+    draft = get_backend("variant-test", profile="draft")
+    assert getattr(default, "model_id", None) == "base"
+    assert getattr(draft, "model_id", None) == "distilled"
+    assert get_backend("variant-test", profile="standard") is default
+
+
+@pytest.mark.asyncio
+async def test_qwen_batch_key_follows_profile(monkeypatch, tmp_path):
+    from imagen.backends.qwen import QwenImageBackend
+
+    monkeypatch.chdir(tmp_path)
+    backend = QwenImageBackend(max_batch_size=1)
+    backend._pipe = object()
+    monkeypatch.setattr(backend, "_ensure_pipe", lambda: None)
+    keys = []
+
+    async def submit(key, item):
+        keys.append(key)
+        return Image.new("RGB", (key[0], key[1]))
+
+    monkeypatch.setattr(backend._batcher, "submit", submit)
+    await backend.generate_image("a cat", size="64x64", profile="draft")
+    await backend.generate_image("a cat", size="64x64")
+    draft, standard = get_profile("qwen", "draft"), get_profile("qwen", "standard")
+    assert keys[0] == (64, 64, draft.steps, draft.guidance, None)
+    assert keys[1] == (64, 64, standard.steps, standard.guidance, None)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import time
+from contextlib import aclosing
+
+import pytest
+
+from imagen.backends.base import ImageBackend, ImageResult
+from imagen.executor import run_blocking
+from imagen.progress import GenerationCancelled, ProgressEvent, current_control, stream_generation
+
+
+class _Stepping(ImageBackend):
+    name = "stepping"
+
+    def __init__(self, steps: int = 50):
+        self.steps = steps
+        self.completed = 0
+
+    async def generate_image(self, prompt, size="1024x1024", fmt="png", seed=None, negative_prompt=None):
+        def run():
+            control = current_control()
+            for i in range(self.steps):
+                control.check()
+                time.sleep(0.005)
+                self.completed = i + 1
+                control.report(i + 1, self.steps)
+
+        await run_blocking("stepping", run)
+        return ImageResult(content=b"img", content_type="image/png", format="png", filename="x.png")
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_progress_then_result():
+    events = [e async for e in stream_generation(_Stepping(steps=5), prompt="p")]
+    assert [e.step for e in events[:-1]] == [1, 2, 3, 4, 5]
+    assert all(isinstance(e, ProgressEvent) and e.total == 5 for e in events[:-1])
+    assert isinstance(events[-1], ImageResult)
+
+
+@pytest.mark.asyncio
+async def test_closing_stream_cancels_between_steps():
+    backend = _Stepping(steps=200)
+    async with aclosing(stream_generation(backend, prompt="p")) as events:
+        async for event in events:
+            if event.step >= 3:
+                break
+    await asyncio.sleep(0.05)
+    stopped_at = backend.completed
+    await asyncio.sleep(0.05)
+    assert stopped_at < 200
+    assert backend.completed == stopped_at
+
+
+@pytest.mark.asyncio
+async def test_mock_reports_progress():
+    pytest.importorskip("PIL")
+    from imagen.backends.mock import MockBackend
+
+    events = [e async for e in stream_generation(MockBackend(), prompt="p", size="32x32")]
+    assert isinstance(events[0], ProgressEvent) and isinstance(events[-1], ImageResult)
+
+
+def test_control_check_raises_after_cancel():
+    from imagen.progress import GenerationControl
+
+    control = GenerationControl()
+    control.check()
+    control.cancel()
+    with pytest.raises(GenerationCancelled):
+        control.check()
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+import pytest
+
+from imagen.admission import DeadlineExceeded
+from imagen.backends import ImageBackend, ImageResult, ReplicaPool
+from imagen.backends.replicas import resolve_devices
+from imagen.progress import GenerationCancelled
+
+
+class _DeviceBackend(ImageBackend):
+    name = "fake"
+
+    def __init__(self, device: str, delay: float = 0.02, fail: bool = False):
+        self.device = device
+        self.delay = delay
+        self.fail = fail
+        self.healthy = True
+        self.unloaded = False
+
+    async def generate_image(self, prompt, size="1024x1024", fmt="png", seed=None, negative_prompt=None):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("device error")
+        return ImageResult(content=self.device.encode(), content_type="image/png", format="png", filename="x.png")
+
+    async def health(self) -> bool:
+        return self.healthy
+
+    def unload(self) -> None:
+        self.unloaded = True
+
+
+@pytest.mark.asyncio
+async def test_requests_spread_across_devices():
+    pool = ReplicaPool(_DeviceBackend, ["cpu:0", "cpu:1", "cpu:2"])
+    results = await asyncio.gather(*(pool.generate_image("p") for _ in range(9)))
+    assert sorted({r.content for r in results}) == [b"cpu:0", b"cpu:1", b"cpu:2"]
+    assert [s["served"] for s in pool.stats()] == [3, 3, 3]
+
+
+@pytest.mark.asyncio
+async def test_failing_replica_is_restarted():
+    built = []
+
+    def factory(device):
+        backend = _DeviceBackend(device, delay=0, fail=not built)
+        built.append(backend)
+        return backend
+
+    pool = ReplicaPool(factory, ["cpu"], max_failures=2)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            await pool.generate_image("p")
+    assert built[0].unloaded and pool.stats()[0]["restarts"] == 1
+    assert (await pool.generate_image("p")).content == b"cpu"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "error", [GenerationCancelled("cancelled"), DeadlineExceeded("fake", "late", 1.0), ValueError("bad size")]
+)
+async def test_request_errors_do_not_restart_replicas(error):
+    class Rejecting(_DeviceBackend):
+        async def generate_image(self, *args, **kwargs):
+            raise error
+
+    pool = ReplicaPool(Rejecting, ["cpu"], max_failures=2)
+    live = pool.replicas[0].backend
+    for _ in range(3):
+        with pytest.raises(type(error)):
+            await pool.generate_image("p")
+    assert pool.replicas[0].backend is live and not live.unloaded
+    assert pool.stats()[0]["consecutive_failures"] == 0
+
+
+@pytest.mark.asyncio
+async def test_failing_replica_drains_before_restarting():
+    release = asyncio.Event()
+
+    class Flaky(_DeviceBackend):
+        async def generate_image(self, prompt, **kwargs):
+            if prompt == "slow":
+                await release.wait()
+                return ImageResult(b"ok", "image/png", "png", "x.png")
+            raise RuntimeError("device error")
+
+    pool = ReplicaPool(Flaky, ["cpu"], max_failures=2)
+    live = pool.replicas[0].backend
+    slow = asyncio.ensure_future(pool.generate_image("slow"))
+    await asyncio.sleep(0)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            await pool.generate_image("p")
+    # Still serving the slow request: not unloaded under it
+    assert pool.replicas[0].backend is live and not live.unloaded
+    release.set()
+    assert (await slow).content == b"ok"
+    assert live.unloaded and pool.stats()[0]["restarts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_health_check_restarts_unhealthy_replicas():
+    pool = ReplicaPool(_DeviceBackend, ["cpu:0", "cpu:1"])
+    sick = pool.replicas[1].backend
+    sick.healthy = False
+    report = await pool.check_health()
+    assert report == {"cpu:0": True, "cpu:1": False}
+    assert pool.replicas[1].backend is not sick
+
+
+@pytest.mark.asyncio
+async def test_pool_works_with_mock_backend():
+    pytest.importorskip("PIL")
+    from imagen.backends.mock import MockBackend
+
+    pool = ReplicaPool(lambda device: MockBackend(), ["cpu", "cpu"])
+    result = await pool.generate_image("hello", size="32x32")
+    assert result.content_type == "image/png"
+
+
+def test_resolve_devices():
+    assert resolve_devices("cuda:0, cuda:1") == ["cuda:0", "cuda:1"]
+    assert resolve_devices("") == []
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+import pytest
+
+from imagen.backends.residency import ResidencyManager, pipeline_bytes
+
+GB = 1024**3
+
+
+class FakeTensor:
+    def __init__(self, nbytes: int):
+        self.nbytes = nbytes
+
+    def numel(self) -> int:
+        return self.nbytes
+
+    def element_size(self) -> int:
+        return 1
+
+
+class FakeModule:
+    def __init__(self, nbytes: int):
+        self._params = [FakeTensor(nbytes)]
+
+    def parameters(self):
+        return iter(self._params)
+
+
+class FakePipe:
+    """Records placement calls like a diffusers pipeline would receive them."""
+
+    def __init__(self, transformer: int, vae: int = GB):
+        self.components = {"transformer": FakeModule(transformer), "vae": FakeModule(vae), "scheduler": object()}
+        self.calls = []
+
+    def to(self, device):
+        self.calls.append(("to", device))
+        return self
+
+    def enable_model_cpu_offload(self, device=None):
+        self.calls.append(("model_offload", device))
+
+    def enable_sequential_cpu_offload(self, device=None):
+        self.calls.append(("sequential_offload", device))
+
+    def enable_vae_tiling(self):
+        self.calls.append(("vae_tiling", None))
+
+
+def _roomy_host():
+    return 512 * GB, 512 * GB
+
+
+def _manager(free: int, total: int = 24 * GB, **kwargs) -> ResidencyManager:
+    kwargs.setdefault("host_probe", _roomy_host)
+    return ResidencyManager(memory_probe=lambda device: (free, total), **kwargs)
+
+
+def test_pipeline_bytes_sums_modules():
+    assert pipeline_bytes(FakePipe(4 * GB))[:2] == (5 * GB, 4 * GB)
+
+
+@pytest.mark.parametrize(
+    "free, placement",
+    [(20 * GB, "device"), (14 * GB, "model_offload"), (3 * GB, "sequential_offload")],
+)
+def test_placement_follows_free_memory(free, placement):
+    pipe = FakePipe(10 * GB)
+    manager = _manager(free, headroom=0.05)
+    assert manager.place("qwen:m@cuda", pipe, "cuda", unload=lambda: None) == placement
+    report = manager.report()["qwen:m@cuda"]
+    assert report["placement"] == placement
+    assert report["bytes"] == 11 * GB
+    # Tiling only when the pipeline does not fit entirely
+    assert report["vae_tiling"] is (placement != "device")
+    assert ("vae_tiling", None) in pipe.calls or placement == "device"
+
+
+def test_forced_policy_and_cpu_devices():
+    pipe = FakePipe(GB)
+    assert _manager(100 * GB, policy="sequential").place("a", pipe, "cuda:1", lambda: None) == "sequential_offload"
+    assert _manager(100 * GB).place("b", FakePipe(GB), "cpu", lambda: None) == "cpu"
+
+
+def test_lru_idle_pipelines_are_parked_to_make_room():
+    free = {"bytes": 14 * GB}
+    manager = ResidencyManager(
+        memory_probe=lambda device: (free["bytes"], 24 * GB), headroom=0.0, host_probe=_roomy_host
+    )
+    old, recent = FakePipe(5 * GB), FakePipe(5 * GB)
+    manager.place("old", old, "cuda", lambda: None)
+    manager.place("recent", recent, "cuda", lambda: None)
+    with manager.use("recent"):
+        pass
+    free["bytes"] = 2 * GB
+
+    assert manager.place("new", FakePipe(5 * GB), "cuda", lambda: None) == "device"
+    report = manager.report()
+    assert report["old"]["placement"] == "cpu"
+    assert report["old"]["device_bytes"] == 0
+    assert report["recent"]["placement"] == "device"
+
+    # Using a parked pipeline moves it back, parking the next idle one to make room
+    with manager.use("old"):
+        assert manager.report()["old"]["busy"] == 1
+    assert old.calls[-1] == ("to", "cuda")
+    report = manager.report()
+    assert report["old"]["placement"] == "device"
+    assert report["recent"]["placement"] == "cpu"
+
+
+class SimulatedDevice:
+    """Memory probe whose free bytes follow where the fake pipelines are."""
+
+    def __init__(self, manager: ResidencyManager, capacity: int):
+        self.manager = manager
+        self.capacity = capacity
+
+    def __call__(self, device):
+        used = sum(r["device_bytes"] for r in self.manager.report().values())
+        return self.capacity - used, self.capacity
+
+
+def test_restoring_a_parked_pipeline_respects_free_memory():
+    manager = ResidencyManager(headroom=0.0, host_probe=_roomy_host)
+    manager.memory_probe = SimulatedDevice(manager, 24 * GB)
+    qwen, hunyuan = FakePipe(10 * GB), FakePipe(10 * GB)
+    manager.place("qwen", qwen, "cuda", lambda: None)
+    manager._park_lru("cuda", 1)
+    assert manager.place("hunyuan", hunyuan, "cuda", lambda: None) == "device"
+
+    # Idle Hunyuan is parked so Qwen fits again
+    with manager.use("qwen"):
+        pass
+    report = manager.report()
+    assert (report["qwen"]["placement"], report["hunyuan"]["placement"]) == ("device", "cpu")
+
+    # While Qwen is busy it stays put, and Hunyuan comes back offloaded instead
+    with manager.use("qwen"):
+        with manager.use("hunyuan"):
+            assert hunyuan.calls[-2:] == [("model_offload", "cuda"), ("vae_tiling", None)]
+    report = manager.report()
+    assert (report["qwen"]["placement"], report["hunyuan"]["placement"]) == ("device", "model_offload")
+    assert report["hunyuan"]["device_bytes"] + report["qwen"]["device_bytes"] <= 24 * GB
+
+
+def test_weight_moves_do_not_block_other_pipelines():
+    manager = _manager(100 * GB)
+    reported = []
+
+    class SlowPipe(FakePipe):
+        def to(self, device):
+            # Another backend's thread can still use the manager during the move
+            other = threading.Thread(target=lambda: reported.append(manager.report()))
+            other.start()
+            other.join(timeout=5)
+            return super().to(device)
+
+    manager.place("slow", SlowPipe(GB), "cuda", lambda: None)
+    assert len(reported) == 1
+
+
+@pytest.mark.asyncio
+async def test_idle_pipelines_are_parked():
+    manager = _manager(100 * GB, idle_offload=10)
+    pipe = FakePipe(GB)
+    manager.place("a", pipe, "cuda", lambda: None)
+    now = manager._residents["a"].last_used
+
+    assert await manager.evict_idle(now + 5) == 0
+    assert await manager.evict_idle(now + 20) == 1
+    assert pipe.calls[-1] == ("to", "cpu")
+    assert manager.report()["a"]["placement"] == "cpu"
+    # Already parked: nothing more to do
+    assert await manager.evict_idle(now + 120) == 0
+
+
+@pytest.mark.asyncio
+async def test_pipelines_are_unloaded_instead_of_parked_when_host_memory_is_short():
+    unloaded = []
+    manager = _manager(100 * GB, idle_offload=10, headroom=0.0, host_probe=lambda: (4 * GB, 64 * GB))
+    small, large = FakePipe(GB), FakePipe(8 * GB)
+    manager.place("small", small, "cuda", lambda: unloaded.append("small"))
+    manager.place("large", large, "cuda", lambda: unloaded.append("large"))
+    now = max(r.last_used for r in manager._residents.values())
+
+    assert await manager.evict_idle(now + 20) == 2
+    # 2 GB fits in the 4 GB of free host RAM, 9 GB does not
+    assert small.calls[-1] == ("to", "cpu")
+    assert ("to", "cpu") not in large.calls
+    assert unloaded == ["large"]
+    assert list(manager.report()) == ["small"]
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+import pytest
+
+from imagen.backends import get_backend
+from imagen.backends.base import ImageBackend, ImageResult
+from imagen.progress import GenerationControl, controlled, current_control
+from imagen.singleflight import SingleFlightBackend
+
+
+class GatedBackend(ImageBackend):
+    name = "gated"
+
+    def __init__(self):
+        self.calls = 0
+        self.cancelled = 0
+        self.release = asyncio.Event()
+
+    async def generate_image(self, prompt, size="1024x1024", fmt="png", seed=None, negative_prompt=None, **kwargs):
+        self.calls += 1
+        control = current_control()
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if control is not None:
+            control.report(1, 1)
+        return ImageResult(f"{prompt}:{seed}".encode(), "image/png", "png", "x.png", timings={"inference": 1.0})
+
+
+async def _settle():
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_identical_seeded_requests_share_one_run():
+    inner = GatedBackend()
+    backend = SingleFlightBackend(inner)
+    tasks = [asyncio.create_task(backend.generate_image("a cat", seed=7)) for _ in range(3)]
+    other = asyncio.create_task(backend.generate_image("a cat", seed=8))
+    unseeded = [asyncio.create_task(backend.generate_image("a cat")) for _ in range(2)]
+    await _settle()
+    assert inner.calls == 4  # one shared run, one for seed 8, two unseeded
+    assert backend.in_flight() == 2
+
+    inner.release.set()
+    results = await asyncio.gather(*tasks, other, *unseeded)
+    assert {r.content for r in results[:3]} == {b"a cat:7"}
+    assert results[3].content == b"a cat:8"
+    # Each waiter gets its own timings dict
+    results[0].timings["transport"] = 0.1
+    assert "transport" not in results[1].timings
+    assert backend.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_run_is_cancelled_only_when_every_waiter_leaves():
+    inner = GatedBackend()
+    backend = SingleFlightBackend(inner)
+    first = asyncio.create_task(backend.generate_image("p", seed=1))
+    second = asyncio.create_task(backend.generate_image("p", seed=1))
+    await _settle()
+
+    first.cancel()
+    await _settle()
+    assert first.cancelled() and inner.cancelled == 0
+
+    third = asyncio.create_task(backend.generate_image("p", seed=1))
+    await _settle()
+    second.cancel()
+    third.cancel()
+    await _settle()
+    assert inner.cancelled == 1
+    assert inner.calls == 1
+    assert backend.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_progress_reaches_every_waiter():
+    inner = GatedBackend()
+    backend = SingleFlightBackend(inner)
+    events = {"a": [], "b": []}
+
+    async def call(name):
+        with controlled(GenerationControl(on_progress=events[name].append)):
+            return await backend.generate_image("p", seed=1)
+
+    tasks = [asyncio.create_task(call("a")), asyncio.create_task(call("b"))]
+    await _settle()
+    inner.release.set()
+    await asyncio.gather(*tasks)
+    assert inner.calls == 1
+    assert [e.step for e in events["a"]] == [e.step for e in events["b"]] == [1]
+
+
+def test_shared_backends_are_coalesced_without_the_cache():
+    assert isinstance(get_backend("mock"), SingleFlightBackend)
+
+
+@pytest.mark.asyncio
+async def test_stacked_wrappers_are_transparent():
+    from imagen.backends import Capabilities, ReplicaPool
+    from imagen.cache import CachedBackend, ResultCache
+
+    class Replica(GatedBackend):
+        capabilities = Capabilities(device="gpu", latency_class="slow")
+        model_id = "m1"
+        resident_bytes = 100
+
+        async def health(self):
+            return False
+
+    pool = ReplicaPool(lambda device: Replica(), ["cuda:0", "cuda:1"])
+    cached = CachedBackend(pool, ResultCache())
+    backend = SingleFlightBackend(cached)
+    assert pool.model_id == cached.model_id == backend.model_id == "m1"
+    assert backend.capabilities == Replica.capabilities
+    assert backend.resident_bytes == 200
+    assert await backend.health() is False
+
+
+@pytest.mark.asyncio
+async def test_retry_right_after_a_client_timeout_starts_a_fresh_run():
+    inner = GatedBackend()
+    backend = SingleFlightBackend(inner)
+    first = asyncio.create_task(backend.generate_image("p", seed=1))
+    await _settle()
+    # The client times out and retries at once, before the abandoned run has unwound
+    first.cancel()
+    retry = asyncio.create_task(backend.generate_image("p", seed=1))
+    await _settle()
+    inner.release.set()
+    assert (await retry).content == b"p:1"
+    assert first.cancelled()
+    assert inner.calls == 2 and inner.cancelled == 1
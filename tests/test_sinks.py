@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+
+import pytest
+
+from imagen.backends.base import ImageResult
+from imagen.sinks import (
+    ContentAddressedSink,
+    LocalDirSink,
+    LocalObjectStore,
+    ObjectStoreSink,
+    save,
+    sink_for,
+)
+
+
+def test_local_dir_writes_atomically_and_stays_inside_root(tmp_path):
+    sink = LocalDirSink(tmp_path)
+    stored = sink.put("a/b.png", b"data")
+    assert (tmp_path / "a" / "b.png").read_bytes() == b"data"
+    assert stored.bytes == 4 and stored.uri.startswith("file://")
+
+    def explode(writer):
+        writer.write(b"partial")
+        raise RuntimeError("encoder failed")
+
+    with pytest.raises(RuntimeError):
+        sink._write_with("broken.png", explode)
+    # Neither the target nor the temp file is left behind
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a"]
+
+    with pytest.raises(ValueError):
+        sink.put("../escape.png", b"x")
+
+
+def test_content_addressed_sink_deduplicates(tmp_path):
+    sink = ContentAddressedSink(tmp_path)
+    first = sink.put("one.png", b"same")
+    second = sink.put("two.png", b"same")
+    assert first.path == second.path
+    assert first.key == hashlib.sha256(b"same").hexdigest()[:16] + ".png"
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+@pytest.mark.asyncio
+async def test_object_store_sink_and_write_result(tmp_path):
+    store = LocalObjectStore(tmp_path / "bucket")
+    sink = ObjectStoreSink(store, prefix="renders/")
+    result = ImageResult(b"main", "image/png", "png", "main.png")
+    result.renditions = [ImageResult(b"thumb", "image/webp", "webp", "main-256x256.webp")]
+    stored = await sink.write_result(result)
+    assert [s.key for s in stored] == ["renders/main.png", "renders/main-256x256.webp"]
+    assert store.get_object("renders/main-256x256.webp") == b"thumb"
+    assert store.exists("renders/main.png")
+
+
+@pytest.mark.asyncio
+async def test_sink_specs_and_save(tmp_path):
+    assert isinstance(sink_for(str(tmp_path)), LocalDirSink)
+    assert isinstance(sink_for(f"cas:{tmp_path}"), ContentAddressedSink)
+    assert isinstance(sink_for(f"object:{tmp_path}"), ObjectStoreSink)
+    with pytest.raises(ValueError):
+        sink_for("ftp:somewhere")
+
+    stored = await save(tmp_path / "out" / "x.jpg", b"jpeg")
+    assert (tmp_path / "out" / "x.jpg").read_bytes() == b"jpeg"
+    assert stored.path == str((tmp_path / "out" / "x.jpg").resolve())